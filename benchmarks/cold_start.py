@@ -0,0 +1,90 @@
+"""Cold-start benchmark for AmogOS Notes.
+
+Launches main.py in a fresh process with QT_QPA_PLATFORM=offscreen and an
+empty temporary home directory, waits until the notes grid has been filled,
+and reports wall-clock time plus the --profile-startup phases as JSON:
+
+    python benchmarks/cold_start.py --runs 5 --output cold_start.json
+
+It also checks that the network/HTML stack (requests, bs4) was not imported
+during startup.
+"""
+import argparse
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import REPO_ROOT, base_result, offscreen_env, summarize, write_result
+
+PHASE_LINE = re.compile(r"^\s{2}(.+?)\s+([\d.]+) ms$")
+
+LAUNCHER = """
+import atexit, runpy, sys
+atexit.register(lambda: print("WEB_STACK_LOADED", any(m in sys.modules for m in ("requests", "bs4"))))
+sys.argv = [sys.argv[1], "--profile-startup", "--quit-after-startup"]
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+def run_once(entry_point, home_dir):
+    env = offscreen_env(home_dir)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", LAUNCHER, str(entry_point)],
+                            cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=120)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"{entry_point} exited with {result.returncode}:\n{result.stderr}")
+
+    phases = {}
+    web_stack_loaded = None
+    in_profile = False
+    for line in result.stdout.splitlines():
+        if line.startswith("Startup profile:"):
+            in_profile = True
+            continue
+        if line.startswith("WEB_STACK_LOADED"):
+            web_stack_loaded = line.split()[-1] == "True"
+            continue
+        match = PHASE_LINE.match(line) if in_profile else None
+        if match:
+            phases[match.group(1)] = float(match.group(2))
+        else:
+            in_profile = False
+    return wall_ms, phases, web_stack_loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--entry-point", default="main.py")
+    parser.add_argument("--output", help="write the JSON result to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    wall_times = []
+    phase_times = {}
+    web_stack_loaded = False
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as home_dir:
+            wall_ms, phases, loaded = run_once(REPO_ROOT / args.entry_point, Path(home_dir))
+        wall_times.append(wall_ms)
+        web_stack_loaded = web_stack_loaded or bool(loaded)
+        for name, ms in phases.items():
+            phase_times.setdefault(name, []).append(ms)
+
+    result = base_result("cold_start")
+    result.update({
+        "entry_point": args.entry_point,
+        "runs": args.runs,
+        "wall_ms": summarize(wall_times),
+        "phases_ms": {name: summarize(values) for name, values in phase_times.items()},
+        "web_stack_loaded_at_startup": web_stack_loaded
+    })
+    write_result(result, args.output)
+    return 1 if web_stack_loaded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
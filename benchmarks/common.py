@@ -0,0 +1,46 @@
+"""Helpers shared by the benchmark scripts."""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def offscreen_env(home_dir):
+    """Environment for running the app headless against an isolated data directory"""
+    return dict(os.environ, QT_QPA_PLATFORM="offscreen", HOME=str(home_dir), USERPROFILE=str(home_dir))
+
+
+def summarize(values):
+    return {
+        "median": round(statistics.median(values), 2),
+        "min": round(min(values), 2),
+        "max": round(max(values), 2)
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def base_result(name):
+    return {
+        "benchmark": name,
+        "revision": git_revision(),
+        "python": sys.version.split()[0]
+    }
+
+
+def write_result(result, output=None):
+    text = json.dumps(result, indent=2)
+    if output:
+        Path(output).write_text(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,163 @@
+"""Opening, editing and saving very large notes.
+
+For each size a note of that many characters is generated and a worker
+process times, with QT_QPA_PLATFORM=offscreen:
+
+- opening it in a plain QTextEdit (how every note used to open) against the
+  note popup, which uses LargeNoteEditor and loads the text in chunks; for the
+  popup both the time until it is shown and until the last chunk is in
+- reading the text back after a one-character edit, with toPlainText() against
+  LargeNoteEditor.text(), which splices only the edited span into the original
+- saving the edited note the way the app does, through NotesStore.record()
+  (journal a text diff, store the body, record a history revision), and how
+  many bytes the note body files grow by per save
+
+    python benchmarks/large_note.py --sizes 1000000 10000000 --repeat 3 --output large_note.json
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import REPO_ROOT, base_result, offscreen_env, summarize, write_result
+
+WORDS = ["reactor", "budget", "meeting", "amogus", "notes", "shopping", "list", "deadline", "idea", "review"]
+
+
+def generate_text(size, seed):
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 16)))
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)[:size]
+
+
+def run_worker(size, repeat, seed):
+    """Time the large note operations; runs inside an offscreen worker process"""
+    os.chdir(REPO_ROOT)
+    sys.path.insert(0, str(REPO_ROOT))
+
+    import main as app_module
+    from notes_store import NotesStore
+    from PyQt6.QtGui import QTextCursor
+    from PyQt6.QtWidgets import QApplication, QTextEdit, QWidget
+
+    app = QApplication(sys.argv[:1])
+    parent = QWidget()
+    parent.resize(1200, 800)
+    parent.show()
+    app.processEvents()
+
+    text = generate_text(size, seed)
+    timings = {}
+
+    def add(name, started):
+        timings.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+
+    def edit_middle(editor):
+        cursor = QTextCursor(editor.document())
+        cursor.setPosition(editor.document().characterCount() // 2)
+        cursor.insertText("x")
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        plain = QTextEdit(text)
+        plain.show()
+        app.processEvents()
+        add("open_qtextedit", started)
+        edit_middle(plain)
+        started = time.perf_counter()
+        plain.toPlainText()
+        add("read_back_toplaintext", started)
+        plain.deleteLater()
+        app.processEvents()
+
+        started = time.perf_counter()
+        popup = app_module.CategoryNotePopup(parent, lambda *args: None, "bench", "Large note", text)
+        popup.show()
+        app.processEvents()
+        add("open_popup_shown", started)
+        editor = popup.content_edit
+        while getattr(editor, "loading", False):
+            app.processEvents()
+        add("open_popup_loaded", started)
+        edit_middle(editor)
+        started = time.perf_counter()
+        edited = app_module.editor_text(editor)
+        add("read_back_editor_text", started)
+        popup.overlay.deleteLater()
+        popup.deleteLater()
+        app.processEvents()
+
+    def bodies_size(data_dir):
+        return sum(os.path.getsize(path) for path in glob.glob(os.path.join(data_dir, "notes_bodies*.dat")))
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = NotesStore(data_dir)
+        store.load()
+        note_id = store.generate_id()
+        store.record("New note 'Large note'", [note_id],
+                     lambda: store.add_or_update(note_id, title="Large note", content=text))
+        growth = []
+        for i in range(repeat):
+            content = edited if i % 2 == 0 else text
+            size_before = bodies_size(data_dir)
+            started = time.perf_counter()
+            store.record("Edit 'Large note'", [note_id],
+                         lambda: store.add_or_update(note_id, title="Large note", content=content))
+            add("store_record_edit", started)
+            growth.append(bodies_size(data_dir) - size_before)
+        store.close()
+
+    parent.close()
+    return {
+        "chars": size,
+        "editor": type(editor).__name__,
+        "bodies_growth_bytes_per_save": summarize(growth),
+        "timings_ms": {name: summarize(values) for name, values in timings.items()}
+    }
+
+
+def run_size(size, repeat, seed):
+    with tempfile.TemporaryDirectory() as home_dir:
+        result = subprocess.run(
+            [sys.executable, __file__, "--worker", "--sizes", str(size), "--repeat", str(repeat), "--seed", str(seed)],
+            cwd=REPO_ROOT, env=offscreen_env(home_dir), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark worker for a {size} character note failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000000, 10000000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON result to this file instead of stdout")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(args.sizes[0], args.repeat, args.seed)))
+        return 0
+
+    result = base_result("large_note")
+    result.update({
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": [run_size(size, args.repeat, args.seed) for size in args.sizes]
+    })
+    write_result(result, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
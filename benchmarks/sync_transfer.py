@@ -0,0 +1,109 @@
+"""Bytes on the wire for syncing through notes_sync_server, against shipping the whole store.
+
+A notes_sync_server runs in this process on a free port. A synthetic store
+is uploaded to it, downloaded into an empty second store, then a few notes
+are edited and synced across again, and finally a sync with nothing to do is
+made. Each step reports the request and response bytes (gzip-compressed, as
+sent) next to the size of the store as an archive, raw and gzipped:
+
+    python benchmarks/sync_transfer.py --sizes 1000 10000 --changed 10 --output sync.json
+"""
+import argparse
+import gzip
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from common import REPO_ROOT, base_result, write_result
+from synthetic import generate_store
+
+sys.path.insert(0, str(REPO_ROOT))
+from notes_store import NotesStore  # noqa: E402
+from notes_sync import SyncEngine  # noqa: E402
+from notes_sync_server import make_server  # noqa: E402
+
+
+def archive_sizes(data_dir):
+    """notes.json plus the body data file, as-is and gzip-compressed"""
+    raw = b"".join(path.read_bytes() for path in sorted(data_dir.iterdir())
+                   if path.name == "notes.json" or path.name.startswith("notes_bodies"))
+    return {"raw_bytes": len(raw), "gzip_bytes": len(gzip.compress(raw))}
+
+
+def measured_sync(store, url):
+    engine = SyncEngine(store, url)
+    started = time.perf_counter()
+    stats = engine.sync()
+    target = engine.target
+    return {
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+        "requests": target.requests,
+        "bytes_sent": target.bytes_sent,
+        "bytes_received": target.bytes_received,
+        "notes_pulled": stats["pulled"],
+        "notes_pushed": stats["pushed"]
+    }
+
+
+def run_size(count, changed, seed):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        dir_a = temp_dir / "a"
+        dir_a.mkdir()
+        generate_store(dir_a, count, seed)
+        archive = archive_sizes(dir_a)
+
+        server = make_server(temp_dir / "server", port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/"
+        store_a = NotesStore(dir_a)
+        store_b = NotesStore(temp_dir / "b")
+        try:
+            store_a.load()
+            store_b.load()
+            steps = {"initial_upload": measured_sync(store_a, url),
+                     "initial_download": measured_sync(store_b, url)}
+
+            rng = random.Random(seed)
+            live = sorted(note_id for note_id, note_data in store_a.notes.items() if not note_data.get("deleted"))
+            for note_id in rng.sample(live, min(changed, len(live))):
+                store_a.add_or_update(note_id, title=store_a.notes[note_id]["title"],
+                                      content=store_a.get_content(note_id) + "\nedited on a")
+            store_a.save()
+            steps["incremental_upload"] = measured_sync(store_a, url)
+            steps["incremental_download"] = measured_sync(store_b, url)
+            steps["no_op"] = measured_sync(store_b, url)
+        finally:
+            store_a.close()
+            store_b.close()
+            server.shutdown()
+            server.server_close()
+
+    for step in steps.values():
+        transferred = step["bytes_sent"] + step["bytes_received"]
+        step["share_of_gzip_archive"] = round(transferred / archive["gzip_bytes"], 4)
+    return {"notes": count, "changed": changed, "archive": archive, "steps": steps}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--changed", type=int, default=10, help="notes edited between the initial and incremental syncs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON result to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    result = base_result("sync_transfer")
+    result.update({
+        "seed": args.seed,
+        "results": [run_size(count, args.changed, args.seed) for count in args.sizes]
+    })
+    write_result(result, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Deterministic synthetic notes stores for the benchmarks."""
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+
+from common import REPO_ROOT
+
+sys.path.insert(0, str(REPO_ROOT))
+from notes_store import NoteBodyStore, hashed_ulid  # noqa: E402
+
+WORDS = ("amogus meeting todo groceries project idea draft sprint review budget travel recipe "
+         "lorem ipsum dolor sit amet vent task reactor electrical cafeteria medbay shields "
+         "navigation admin storage report emergency sus crewmate impostor").split()
+CATEGORIES = ["Work", "Personal", "Ideas", "Shopping", "Travel", "Recipes",
+              "Reading", "Fitness", "Finance", "Music", "Games", "Uncategorized"]
+
+# (share of notes, min words, max words): mostly short notes, a tail of long documents
+CONTENT_SIZES = [(0.73, 8, 60), (0.25, 150, 700), (0.02, 2500, 6000)]
+
+
+def random_body(rng):
+    roll = rng.random()
+    for share, low, high in CONTENT_SIZES:
+        if roll < share:
+            break
+        roll -= share
+    words = rng.choices(WORDS, k=rng.randint(low, high))
+    lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+    return "\n".join(lines)
+
+
+def generate_store(data_dir, count, seed=0):
+    """Write notes.json plus a body store with count notes into data_dir and return the notes"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    notes = {}
+    body_store = NoteBodyStore(data_dir)
+    for i in range(count):
+        created_at = now - timedelta(days=rng.uniform(0, 20))
+        note_id = hashed_ulid(int(created_at.timestamp() * 1000), f"synthetic-{seed}-{i}")
+        deleted = rng.random() < 0.05
+        notes[note_id] = {
+            "title": " ".join(rng.choices(WORDS, k=rng.randint(1, 5))).title(),
+            "created_at": created_at.isoformat(),
+            "updated_at": (created_at + timedelta(hours=rng.uniform(0, 48))).isoformat(),
+            "category": rng.choice(CATEGORIES),
+            "favorite": rng.random() < 0.1,
+            "temporary": rng.random() < 0.05,
+            "deleted": deleted,
+            "deleted_at": (now - timedelta(days=rng.uniform(0, 20))).isoformat() if deleted else None
+        }
+        body_store.put(note_id, random_body(rng))
+    body_store.flush()
+    body_store.close()
+
+    with open(data_dir / "notes.json", "w") as f:
+        json.dump(notes, f, indent=4)
+    return notes
@@ -0,0 +1,128 @@
+"""Headless benchmark suite for the notes UI.
+
+For each store size a synthetic notes store is generated in a temporary home
+directory and a worker process opens MainWindow on it with
+QT_QPA_PLATFORM=offscreen. The worker times the main window operations and the
+chat search; the results for all sizes are printed (or written) as one JSON
+document so they can be compared across commits:
+
+    python benchmarks/ui_suite.py --sizes 1000 10000 50000 --repeat 3 --output ui.json
+"""
+import argparse
+import gc
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import REPO_ROOT, base_result, offscreen_env, summarize, write_result
+
+FILTERS = ["home", "favorites", "temporary_notes", "recycle_bin", "category"]
+RESIZE_WIDTHS = [900, 1600]
+SEARCH_TERMS = "reactor budget"
+
+
+def time_call(timings, name, func, repeat, after=None):
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+        if after:
+            after()
+
+
+def run_worker(count, repeat, seed):
+    """Generate the store and time the UI operations; runs inside an offscreen worker process"""
+    import os
+    os.chdir(REPO_ROOT)
+    sys.path.insert(0, str(REPO_ROOT))
+
+    import main as app_module
+    from synthetic import generate_store
+    from PyQt6.QtCore import QEvent
+    from PyQt6.QtWidgets import QApplication
+
+    started = time.perf_counter()
+    generate_store(app_module.DATA_DIR, count, seed)
+    generate_ms = (time.perf_counter() - started) * 1000
+
+    app = QApplication(sys.argv[:1])
+    window = app_module.MainWindow()
+    window.resize(1200, 800)
+    window.show()
+    app.processEvents()
+    window.populate_initial_notes()
+
+    def settle():
+        app.processEvents()
+        app.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)
+        gc.collect()
+
+    timings = {}
+    time_call(timings, "load_notes", window.load_notes, repeat)
+    time_call(timings, "check_expired_notes", window.check_expired_notes, repeat)
+    time_call(timings, "load_categories", window.load_categories, repeat, settle)
+
+    busiest_category = max(window.category_index.categories(), key=window.category_index.count, default=None)
+    for filter_name in FILTERS:
+        window.current_filter = filter_name
+        window.current_category = busiest_category
+        time_call(timings, f"display_filtered_notes[{filter_name}]", window.display_filtered_notes, repeat, settle)
+
+    time_call(timings, "apply_theme", window.apply_theme, repeat, settle)
+
+    window.current_filter = "home"
+    window.display_filtered_notes()
+    settle()
+    for i in range(repeat):
+        window.resize(RESIZE_WIDTHS[i % 2], 800)
+        settle()
+        time_call(timings, "resize_relayout", window.relayout_notes, 1, settle)
+
+    chat = app_module.AmogusBuddyChat(window)
+    time_call(timings, "search_notes_action", lambda: chat.search_notes_action(SEARCH_TERMS), repeat, settle)
+
+    window.close()
+    return {
+        "notes": count,
+        "generate_store_ms": round(generate_ms, 2),
+        "timings_ms": {name: summarize(values) for name, values in timings.items()}
+    }
+
+
+def run_size(count, repeat, seed):
+    with tempfile.TemporaryDirectory() as home_dir:
+        result = subprocess.run(
+            [sys.executable, __file__, "--worker", "--sizes", str(count), "--repeat", str(repeat), "--seed", str(seed)],
+            cwd=REPO_ROOT, env=offscreen_env(home_dir), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark worker for {count} notes failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON result to this file instead of stdout")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(args.sizes[0], args.repeat, args.seed)))
+        return 0
+
+    result = base_result("ui_suite")
+    result.update({
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": [run_size(count, args.repeat, args.seed) for count in args.sizes]
+    })
+    write_result(result, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
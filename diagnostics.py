@@ -0,0 +1,243 @@
+"""
+Diagnostics for AmogOS Notes that do not depend on Qt: timing spans for hot
+paths (spans), a watchdog that logs the main thread's stack when it stalls
+(StallWatchdog), and memory helpers (deep_sizeof, traced_memory_by_file).
+"""
+import json
+import math
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import traceback
+from collections import deque
+from datetime import datetime
+from functools import wraps
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "started_at")
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.recorder.record(self.name, time.perf_counter() - self.started_at)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values), max(1, math.ceil(fraction * len(sorted_values)))) - 1
+    return sorted_values[rank]
+
+
+class SpanRecorder:
+    """
+    Named timing spans for hot paths. Each span name keeps its last max_samples
+    durations in a ring buffer plus a lifetime count. While disabled, span()
+    hands back a shared no-op context manager and timed() functions only pay
+    for one attribute check.
+    """
+
+    def __init__(self, max_samples=1024):
+        self.enabled = False
+        self.max_samples = max_samples
+        self.samples = {}
+        self.counts = {}
+
+    def record(self, name, seconds):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.max_samples)
+        samples.append(seconds)
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def timed(self, name=None):
+        """Decorator that records every call of the wrapped function as a span"""
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                started_at = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(span_name, time.perf_counter() - started_at)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        self.samples = {}
+        self.counts = {}
+
+    def stats(self):
+        """Per-span count and latency percentiles in milliseconds, over the samples still in the buffer"""
+        result = {}
+        for name, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            result[name] = {
+                "count": self.counts.get(name, 0),
+                "samples": len(ordered),
+                "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0
+            }
+        return result
+
+    def export_json(self, path, extra=None):
+        data = {
+            "exported_at": datetime.now().isoformat(),
+            "max_samples": self.max_samples,
+            "spans": self.stats()
+        }
+        data.update(extra or {})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+
+
+spans = SpanRecorder()
+
+
+class StallWatchdog:
+    """
+    Detects GUI event loop stalls. The GUI thread calls heartbeat() from a
+    timer; a daemon thread checks that the last heartbeat is recent and, when
+    it is older than threshold_ms, appends the main thread's Python stack to
+    log_path. Each stall is logged once when it is detected and once more with
+    its total length when the loop turns again.
+    """
+
+    MAX_LOG_BYTES = 1024 * 1024
+
+    def __init__(self, log_path, threshold_ms=500):
+        self.log_path = str(log_path)
+        self.threshold_ms = threshold_ms
+        self.main_thread_id = threading.main_thread().ident
+        self.last_beat = time.monotonic()
+        self.stall_started_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def heartbeat(self):
+        now = time.monotonic()
+        stall_started_at = self.stall_started_at
+        if stall_started_at is not None:
+            self.stall_started_at = None
+            self._write(f"{datetime.now().isoformat()} event loop resumed after {(now - stall_started_at) * 1000:.0f} ms\n")
+        self.last_beat = now
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.last_beat = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="StallWatchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(max(self.threshold_ms / 4000, 0.02)):
+            last_beat = self.last_beat
+            if self.stall_started_at is not None or self.threshold_ms <= 0:
+                continue
+            stalled_ms = (time.monotonic() - last_beat) * 1000
+            if stalled_ms >= self.threshold_ms:
+                self.stall_started_at = last_beat
+                self._write(self._describe_stall(stalled_ms))
+
+    def _describe_stall(self, stalled_ms):
+        frame = sys._current_frames().get(self.main_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "  (main thread stack unavailable)\n"
+        return (f"{datetime.now().isoformat()} event loop stalled for {stalled_ms:.0f} ms "
+                f"(threshold {self.threshold_ms} ms); main thread stack:\n{stack}")
+
+    def _write(self, text):
+        try:
+            if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > self.MAX_LOG_BYTES:
+                os.replace(self.log_path, self.log_path + ".1")
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(text)
+        except OSError as e:
+            print(f"Could not write to stall log {self.log_path}: {e}")
+
+
+def deep_sizeof(obj, seen=None):
+    """Approximate bytes held by obj and the dicts, lists, tuples, sets and strings it contains"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_sizeof(key, seen) + deep_sizeof(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        for item in obj:
+            size += deep_sizeof(item, seen)
+    return size
+
+
+def start_memory_tracing(frames=1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def traced_memory_by_file(limit=10):
+    """Current traced allocations grouped by source file, largest first; None while tracemalloc is off"""
+    if not tracemalloc.is_tracing():
+        return None
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    files = [{"file": stat.traceback[0].filename, "bytes": stat.size, "blocks": stat.count}
+             for stat in snapshot.statistics("filename")[:limit]]
+    lines = [{"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "bytes": stat.size, "blocks": stat.count}
+             for stat in snapshot.statistics("lineno")[:limit]]
+    return {"current_bytes": current, "peak_bytes": peak, "top_files": files, "top_lines": lines}
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
@@ -1,22 +1,43 @@
 import sys
 import json
 import os
+import hashlib
+import multiprocessing
 import random
+import re
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
+from urllib.parse import quote
+
+if __name__ == "__main__" and sys.argv[1:2] == ["cli"]:
+    # Scripting entry point: handled before PyQt6 is imported so it starts in milliseconds
+    from notes_cli import main as cli_main
+    sys.exit(cli_main(sys.argv[2:]))
+
 from PyQt6 import QtGui
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
-                             QHBoxLayout, QPushButton, QLabel, QScrollArea, QTextEdit,
+                             QHBoxLayout, QPushButton, QLabel, QScrollArea, QTextEdit, QPlainTextEdit,
                              QLineEdit, QMessageBox, QDialog, QDialogButtonBox, QFrame,
                              QToolButton, QGraphicsOpacityEffect, QCheckBox,
                              QGraphicsDropShadowEffect, QGridLayout, QStackedWidget, QComboBox,
-                             QColorDialog)
-from PyQt6.QtCore import Qt, QSize, QPropertyAnimation, QRect, QEasingCurve, QTimer, QByteArray, QPoint, QMimeData
+                             QColorDialog, QFileDialog, QProgressDialog, QInputDialog, QListWidget,
+                             QListWidgetItem)
+from PyQt6.QtCore import (Qt, QSize, QPropertyAnimation, QRect, QEasingCurve, QTimer, QByteArray, QPoint, QMimeData,
+                          QObject, QRunnable, QThread, QThreadPool, pyqtSignal, QFileSystemWatcher, QLockFile)
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
 from PyQt6.QtGui import (QPainter, QLinearGradient, QColor, QFont, QIcon,
-                         QPainterPath, QFontMetrics, QPalette, QPixmap, QDrag)
+                         QPainterPath, QFontMetrics, QPalette, QPixmap, QDrag,
+                         QShortcut, QKeySequence, QImage, QImageReader, QPixmapCache, QTextCursor)
+
+from notes_store import DraftStore, NotesStore, default_data_dir
+from notes_import import parse_batches
+from notes_export import ExportCancelled, safe_filename, snapshot_notes, write_export
+from notes_sync import SyncEngine, display_location, is_server_url, sync_key
+from diagnostics import spans, StallWatchdog, deep_sizeof, format_bytes, start_memory_tracing, traced_memory_by_file
 
 APP_NAME = "AmogOSNotes"
-DATA_DIR = Path.home() / f".{APP_NAME.lower()}_data"
+DATA_DIR = default_data_dir(APP_NAME)
 
 try:
     DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -26,13 +47,28 @@ except OSError as e:
     sys.exit(1)
 
 NOTES_FILE = DATA_DIR / "notes.json"
+CATEGORIES_FILE = DATA_DIR / "categories.json"
 SETTINGS_FILE = DATA_DIR / "settings.json"
 BUDDIES_FOLDER = DATA_DIR / "buddies"
+BUDDY_THUMBS_FOLDER = BUDDIES_FOLDER / ".thumbs"
+STALL_LOG_FILE = DATA_DIR / "stalls.log"
+DRAFTS_FOLDER = DATA_DIR / "drafts"
+DRAFT_AUTOSAVE_DELAY_MS = 1000
+LARGE_NOTE_CHARS = 512 * 1024
+LARGE_NOTE_CHUNK_CHARS = 256 * 1024
+# Qt counts these differently from Python strings (UTF-16 surrogates, converted line breaks)
+UNSPLICEABLE_CHARS = re.compile("[\r\u2028\u2029\U00010000-\U0010ffff]")
+INSTANCE_LOCK_FILE = DATA_DIR / "instance.lock"
+INSTANCE_SERVER_NAME = f"{APP_NAME}-{hashlib.sha1(str(DATA_DIR).encode('utf-8')).hexdigest()[:12]}"
 
 DEFAULT_ACCENT_COLOR = "#FF69B4"
 DEFAULT_THEME = "light"
 DEFAULT_AMOGUS_JOKES = True
 DEFAULT_BUDDY = ""
+DEFAULT_DIAGNOSTICS = False
+DEFAULT_STALL_THRESHOLD_MS = 500
+DEFAULT_SYNC_FOLDER = ""
+SYNC_INTERVAL_MS = 5 * 60 * 1000
 
 THEMES = {
     "light": {
@@ -97,6 +133,132 @@ current_theme_name = DEFAULT_THEME
 current_theme_colors = THEMES[DEFAULT_THEME]
 enable_amogus_jokes = DEFAULT_AMOGUS_JOKES
 current_buddy = DEFAULT_BUDDY
+category_table = None
+
+
+class StartupProfiler:
+    """Times startup phases for --profile-startup; marks are no-ops while disabled"""
+
+    def __init__(self):
+        self.enabled = False
+        self.phases = []
+        self.started_at = time.perf_counter()
+        self.last_mark = self.started_at
+
+    def enable(self):
+        self.enabled = True
+        self.phases = []
+        self.started_at = self.last_mark = time.perf_counter()
+
+    def mark(self, phase_name):
+        """Close the current phase, attributing the time since the previous mark to phase_name"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase_name, now - self.last_mark))
+        self.last_mark = now
+
+    def report(self):
+        if not self.enabled:
+            return
+        print("Startup profile:")
+        for phase_name, seconds in self.phases:
+            print(f"  {phase_name:<32}{seconds * 1000:9.1f} ms")
+        print(f"  {'total':<32}{(self.last_mark - self.started_at) * 1000:9.1f} ms")
+        self.enabled = False
+
+
+startup_profiler = StartupProfiler()
+
+
+class SingleInstance:
+    """
+    Keeps one window per data directory: a lock file under DATA_DIR decides
+    who owns it, and a local socket lets a second launch hand its arguments
+    to the owner instead of opening the notes a second time.
+    """
+
+    def __init__(self):
+        self.lock = QLockFile(str(INSTANCE_LOCK_FILE))
+        self.lock.setStaleLockTime(0)
+        self.server = None
+        self.handler = None
+        self.pending = []
+
+    def acquire(self):
+        return self.lock.tryLock(100)
+
+    def forward(self, args, timeout_ms=3000):
+        """Send args to the running instance; retries while it is still starting up"""
+        payload = (json.dumps(args) + "\n").encode("utf-8")
+        deadline = time.monotonic() + timeout_ms / 1000
+        while True:
+            socket = QLocalSocket()
+            socket.connectToServer(INSTANCE_SERVER_NAME)
+            if socket.waitForConnected(250):
+                socket.write(payload)
+                sent = socket.waitForBytesWritten(1000)
+                socket.disconnectFromServer()
+                return sent
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def listen(self):
+        QLocalServer.removeServer(INSTANCE_SERVER_NAME)
+        self.server = QLocalServer()
+        self.server.newConnection.connect(self._handle_connection)
+        if not self.server.listen(INSTANCE_SERVER_NAME):
+            print(f"Could not listen for other launches on {INSTANCE_SERVER_NAME}: {self.server.errorString()}")
+
+    def set_handler(self, handler):
+        self.handler = handler
+        pending, self.pending = self.pending, []
+        for args in pending:
+            handler(args)
+
+    def release(self):
+        if self.server is not None:
+            self.server.close()
+        self.lock.unlock()
+
+    def _handle_connection(self):
+        socket = self.server.nextPendingConnection()
+        if socket is None:
+            return
+        buffer = bytearray()
+
+        def read():
+            buffer.extend(bytes(socket.readAll()))
+            while b"\n" in buffer:
+                line, _, rest = bytes(buffer).partition(b"\n")
+                buffer[:] = rest
+                try:
+                    args = json.loads(line.decode("utf-8"))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    print("Ignoring a malformed message from another launch")
+                    continue
+                if self.handler is None:
+                    self.pending.append(args)
+                else:
+                    self.handler(args)
+
+        socket.readyRead.connect(read)
+        socket.disconnected.connect(socket.deleteLater)
+        read()
+
+
+_web_stack = None
+
+
+def load_web_stack():
+    """Import requests and BeautifulSoup on the first buddy web lookup instead of at startup"""
+    global _web_stack
+    if _web_stack is None:
+        import requests
+        from bs4 import BeautifulSoup
+        _web_stack = (requests, BeautifulSoup)
+    return _web_stack
 
 
 def get_contrasting_text_color(bg_hex_color):
@@ -120,14 +282,12 @@ AMOGUS_JOKES = [
 
 
 def get_category_color(category):
-    color_map = {
-        "Uncategorized": "#FFFFFF",
-        "Amogus": "#FF69B4",
-        "Work": "#228B22",
-        "Personal": "#1E90FF",
-        "Important": "#FF8C00"
-    }
-    return color_map.get(category, "#FFFFFF")
+    return category_table.color(category)
+
+
+def get_category_style(category):
+    """Cached (background, text) colors for a category tag"""
+    return category_table.style(category)
 
 class ModernButton(QPushButton):
     def __init__(self, text, parent=None, icon_path=None, accent=False, is_sidebar_item=False):
@@ -230,6 +390,147 @@ class OverlayWidget(QWidget):
         self.animation.finished.connect(self.hide)
         self.animation.start()
 
+class LargeNoteEditor(QPlainTextEdit):
+    """
+    Editor for notes of LARGE_NOTE_CHARS or more. The text goes in
+    LARGE_NOTE_CHUNK_CHARS at a time from the event loop, so the popup opens
+    at once and stays responsive while a multi-megabyte note loads. Edits
+    are tracked as the span between an unchanged start and an unchanged end,
+    so text() splices just that span into the original string instead of
+    converting the whole document back.
+    """
+
+    loaded = pyqtSignal()
+
+    def __init__(self, text, parent=None, read_only=False):
+        super().__init__(parent)
+        self.read_only = read_only
+        self.load_timer = QTimer(self)
+        self.load_timer.timeout.connect(self.load_next_chunk)
+        self.document().contentsChange.connect(self.track_change)
+        self.setPlainText(text)
+
+    def setPlainText(self, text):
+        self.load_timer.stop()
+        self.original = text
+        self.load_position = 0
+        self.loading = True
+        self.spliceable = UNSPLICEABLE_CHARS.search(text) is None
+        self.unchanged_prefix = len(text)
+        self.unchanged_suffix = len(text)
+        self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)
+        self.blockSignals(True)
+        super().setPlainText("")
+        self.blockSignals(False)
+        self.load_timer.start(0)
+
+    def load_next_chunk(self):
+        end = min(len(self.original), self.load_position + LARGE_NOTE_CHUNK_CHARS)
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        # Loading is not an edit: keep it out of textChanged, and so out of draft autosave
+        self.blockSignals(True)
+        cursor.insertText(self.original[self.load_position:end])
+        self.blockSignals(False)
+        self.load_position = end
+        if end < len(self.original):
+            return
+        self.load_timer.stop()
+        self.loading = False
+        self.setUndoRedoEnabled(not self.read_only)
+        self.setReadOnly(self.read_only)
+        self.moveCursor(QTextCursor.MoveOperation.Start)
+        self.loaded.emit()
+
+    def track_change(self, position, removed, added):
+        if self.loading:
+            return
+        length = self.document().characterCount() - 1
+        self.unchanged_prefix = min(self.unchanged_prefix, position)
+        self.unchanged_suffix = min(self.unchanged_suffix, length - position - added)
+
+    def text(self):
+        """The edited note text"""
+        if self.loading:
+            return self.original
+        if not self.spliceable:
+            return self.toPlainText()
+        length = self.document().characterCount() - 1
+        prefix = max(0, min(self.unchanged_prefix, length, len(self.original)))
+        suffix = max(0, min(self.unchanged_suffix, length - prefix, len(self.original) - prefix))
+        if prefix + suffix == length == len(self.original):
+            return self.original
+        cursor = QTextCursor(self.document())
+        cursor.setPosition(prefix)
+        cursor.setPosition(length - suffix, QTextCursor.MoveMode.KeepAnchor)
+        middle = cursor.selectedText().replace("\u2029", "\n")
+        return self.original[:prefix] + middle + self.original[len(self.original) - suffix:]
+
+
+def make_note_editor(content):
+    """A QTextEdit, or a LargeNoteEditor for notes of LARGE_NOTE_CHARS or more"""
+    editor = LargeNoteEditor(content) if len(content) >= LARGE_NOTE_CHARS else QTextEdit(content)
+    editor.setPlaceholderText("Start typing...")
+    editor.setFont(QFont("San Francisco", 13))
+    return editor
+
+
+def editor_text(editor):
+    return editor.text() if isinstance(editor, LargeNoteEditor) else editor.toPlainText()
+
+
+def editor_style(editor):
+    editor_class = "QPlainTextEdit" if isinstance(editor, QPlainTextEdit) else "QTextEdit"
+    return f"""
+            {editor_class} {{
+                border: none;
+                background-color: transparent;
+                color: {current_theme_colors['TEXT_PRIMARY']};
+                padding: 5px 0px;
+            }}
+        """
+
+
+class DraftAutosaver(QObject):
+    """
+    Queues an editor's draft in the DraftStore once typing pauses for
+    DRAFT_AUTOSAVE_DELAY_MS. Each keystroke only restarts a timer; the
+    DraftStore's thread does the writing.
+    """
+
+    def __init__(self, parent, key, collect, drafts):
+        super().__init__(parent)
+        self.key = key
+        self.collect = collect
+        self.drafts = drafts
+        self.dirty = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(DRAFT_AUTOSAVE_DELAY_MS)
+        self.timer.timeout.connect(self.save_now)
+
+    def watch(self, *signals):
+        for signal in signals:
+            signal.connect(self.changed)
+
+    def changed(self, *args):
+        self.dirty = True
+        self.timer.start()
+
+    def save_now(self):
+        self.timer.stop()
+        if not self.dirty:
+            return
+        self.dirty = False
+        self.drafts.put(self.key, dict(self.collect(), key=self.key, saved_at=datetime.now().isoformat()))
+
+    def discard(self):
+        self.timer.stop()
+        self.dirty = False
+        self.drafts.discard(self.key)
+
+
 class NotePopup(QFrame):
     def __init__(self, parent, on_save, note_id=None, title="", content="", is_temporary=False):
         super().__init__(parent)
@@ -281,9 +582,7 @@ class NotePopup(QFrame):
         header_layout.addWidget(self.close_btn)
         layout.addLayout(header_layout)
 
-        self.content_edit = QTextEdit(content)
-        self.content_edit.setPlaceholderText("Start typing...")
-        self.content_edit.setFont(QFont("San Francisco", 13))
+        self.content_edit = make_note_editor(content)
         layout.addWidget(self.content_edit, 1)
 
         footer_layout = QHBoxLayout()
@@ -328,14 +627,7 @@ class NotePopup(QFrame):
                 color: {current_user_accent_color};
             }}
         """)
-        self.content_edit.setStyleSheet(f"""
-            QTextEdit {{
-                border: none;
-                background-color: transparent;
-                color: {current_theme_colors['TEXT_PRIMARY']};
-                padding: 5px 0px;
-            }}
-        """)
+        self.content_edit.setStyleSheet(editor_style(self.content_edit))
         save_btn_text_color = get_contrasting_text_color(current_user_accent_color)
         self.save_btn.setStyleSheet(f"""
             QPushButton {{
@@ -365,7 +657,7 @@ class NotePopup(QFrame):
 
     def save_note(self):
         title = self.title_edit.text()
-        content = self.content_edit.toPlainText()
+        content = editor_text(self.content_edit)
         if not title and not content:
             self.close()
             return
@@ -373,10 +665,13 @@ class NotePopup(QFrame):
         self.close()
 
 class CategoryNotePopup(QFrame):
-    def __init__(self, parent, on_save, note_id=None, title="", content="", is_temporary=False, categories=None, initial_category="Uncategorized"):
+    def __init__(self, parent, on_save, note_id=None, title="", content="", is_temporary=False, categories=None,
+                 initial_category="Uncategorized", on_history=None):
         super().__init__(parent)
         self.parent = parent
         self.on_save = on_save
+        self.on_history = on_history
+        self.autosaver = None
         self.note_id = note_id
         self.is_temporary = is_temporary
         self.current_category = initial_category
@@ -452,12 +747,17 @@ class CategoryNotePopup(QFrame):
         self.temp_checkbox.setChecked(is_temporary)
         layout.addWidget(self.temp_checkbox)
 
-        self.content_edit = QTextEdit(content)
-        self.content_edit.setPlaceholderText("Start typing...")
-        self.content_edit.setFont(QFont("San Francisco", 13))
+        self.content_edit = make_note_editor(content)
         layout.addWidget(self.content_edit, 1)
 
         footer_layout = QHBoxLayout()
+        self.history_btn = None
+        if self.note_id and self.on_history:
+            self.history_btn = QPushButton("History")
+            self.history_btn.setFont(QFont("San Francisco", 13))
+            self.history_btn.setToolTip("Browse earlier versions of this note")
+            self.history_btn.clicked.connect(lambda: self.on_history(self.note_id, self))
+            footer_layout.addWidget(self.history_btn)
         footer_layout.addStretch(1)
         self.save_btn = QPushButton("Done")
         self.save_btn.setFont(QFont("San Francisco", 13, QFont.Weight.Medium))
@@ -470,6 +770,11 @@ class CategoryNotePopup(QFrame):
 
         self.apply_styles()
 
+    def load_version(self, title, content):
+        """Put an earlier version into the editor; it replaces the note when Done is pressed"""
+        self.title_edit.setText(title)
+        self.content_edit.setPlainText(content)
+
     def handle_category_selection(self, index):
         if self.category_combo.itemText(index) == "+ New Category":
 
@@ -556,14 +861,7 @@ class CategoryNotePopup(QFrame):
                 color: {current_user_accent_color};
             }}
         """)
-        self.content_edit.setStyleSheet(f"""
-            QTextEdit {{
-                border: none;
-                background-color: transparent;
-                color: {current_theme_colors['TEXT_PRIMARY']};
-                padding: 5px 0px;
-            }}
-        """)
+        self.content_edit.setStyleSheet(editor_style(self.content_edit))
 
 
         self.category_combo.setStyleSheet(f"""
@@ -619,6 +917,20 @@ class CategoryNotePopup(QFrame):
                 background-color: {QColor(current_user_accent_color).darker(110).name()};
             }}
         """)
+        if self.history_btn is not None:
+            self.history_btn.setStyleSheet(f"""
+                QPushButton {{
+                    padding: 8px 14px;
+                    background-color: transparent;
+                    color: {current_theme_colors['TEXT_SECONDARY']};
+                    border: 1px solid {current_theme_colors['BORDER_MEDIUM']};
+                    border-radius: 6px;
+                }}
+                QPushButton:hover {{
+                    color: {current_user_accent_color};
+                    border-color: {current_user_accent_color};
+                }}
+            """)
         if hasattr(self, 'graphicsEffect') and isinstance(self.graphicsEffect(), QGraphicsDropShadowEffect):
             self.graphicsEffect().setColor(QColor(current_theme_colors['SHADOW_COLOR']))
 
@@ -630,12 +942,20 @@ class CategoryNotePopup(QFrame):
         self.title_edit.setFocus()
 
     def close(self):
+        if self.autosaver is not None:
+            self.autosaver.discard()
         self.overlay.fadeOut()
         super().close()
 
+    def draft(self):
+        category = self.category_combo.currentText()
+        return {"note_id": self.note_id, "title": self.title_edit.text(), "content": editor_text(self.content_edit),
+                "temporary": self.temp_checkbox.isChecked(),
+                "category": category if category != "+ New Category" else self.current_category}
+
     def save_note(self):
         title = self.title_edit.text()
-        content = self.content_edit.toPlainText()
+        content = editor_text(self.content_edit)
         is_temporary = self.temp_checkbox.isChecked()
         category = self.category_combo.currentText()
 
@@ -727,12 +1047,12 @@ class NoteWidget(QWidget):
             tag_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
 
-            category_color = get_category_color(self.category)
+            category_color, category_text_color = get_category_style(self.category)
             category_tag = QLabel(f" {self.category} ")
             category_tag.setStyleSheet(f"""
                 QLabel {{
                     background-color: {category_color};
-                    color: {get_contrasting_text_color(category_color)};
+                    color: {category_text_color};
                     border-radius: 10px;
                     padding: 2px 8px;
                     font-size: 10px;
@@ -1038,6 +1358,14 @@ class Sidebar(QWidget):
         self.categories_layout.setSpacing(2)
         content_layout.addWidget(self.categories_container)
 
+        self.category_buttons = {}
+        self.category_button_styles = {}
+        self.active_category = None
+        self.on_category_selected = None
+
+        self.no_categories_label = QLabel("No categories yet")
+        self.categories_layout.addWidget(self.no_categories_label)
+
 
         self.add_category_btn = QPushButton("+ Add Category")
         self.add_category_btn.setCursor(Qt.CursorShape.PointingHandCursor)
@@ -1068,7 +1396,7 @@ class Sidebar(QWidget):
         ]
         for item_data in other_navs:
             btn = ModernButton(item_data["text"], icon_path=item_data["icon"], is_sidebar_item=True)
-            if item_data["id"] not in ["settings", "recycle_bin"]:
+            if item_data["id"] not in ["settings", "recycle_bin", "synced_notes"]:
                  btn.setEnabled(False)
             content_layout.addWidget(btn)
             self.nav_buttons_widgets[item_data["id"]] = btn
@@ -1106,8 +1434,11 @@ class Sidebar(QWidget):
                 color: {current_theme_colors['TEXT_PRIMARY']};
             }}
         """)
+        self.no_categories_label.setStyleSheet(f"color: {current_theme_colors['TEXT_TERTIARY']}; padding: 5px 15px; font-style: italic;")
         self.update_create_note_button_style()
         self.update_nav_button_styles()
+        self.category_button_styles.clear()
+        self.update_category_button_styles()
 
     def update_nav_button_styles(self):
         for key, btn in self.nav_buttons_widgets.items():
@@ -1115,38 +1446,52 @@ class Sidebar(QWidget):
             is_settings = (key == "settings")
             btn.setStyleSheet(self.get_modern_button_style(is_sidebar_item=True, is_checked=is_checked, is_settings_button=is_settings))
 
-    def update_category_buttons(self, categories, active_category=None):
-        """Update the category buttons based on the list of categories"""
-
-        for i in reversed(range(self.categories_layout.count())):
-            widget = self.categories_layout.itemAt(i).widget()
-            if widget:
-                self.categories_layout.removeWidget(widget)
-                widget.deleteLater()
-
-
-        if not categories:
-            empty_label = QLabel("No categories yet")
-            empty_label.setStyleSheet(f"color: {current_theme_colors['TEXT_TERTIARY']}; padding: 5px 15px; font-style: italic;")
-            self.categories_layout.addWidget(empty_label)
-            return
-
-
-        self.category_buttons = {}
-        for category in categories:
-            btn = ModernButton(category, is_sidebar_item=True)
-            btn.setObjectName(f"category_{category}")
-            btn.setCheckable(True)
-            btn.setChecked(category == active_category)
-            self.categories_layout.addWidget(btn)
-            self.category_buttons[category] = btn
-
-
-            btn.setStyleSheet(self.get_modern_button_style(is_sidebar_item=True, is_checked=(category == active_category)))
-
+    def update_category_buttons(self, categories, active_category=None, counts=None):
+        """Sync the category buttons with categories, only adding or removing buttons that changed"""
+        counts = counts or {}
+        self.active_category = active_category
+
+        for category in list(self.category_buttons):
+            if category not in categories:
+                btn = self.category_buttons.pop(category)
+                self.category_button_styles.pop(category, None)
+                self.categories_layout.removeWidget(btn)
+                btn.deleteLater()
+
+        for position, category in enumerate(categories):
+            btn = self.category_buttons.get(category)
+            if btn is None:
+                btn = ModernButton(category, is_sidebar_item=True)
+                btn.setObjectName(f"category_{category}")
+                btn.setCheckable(True)
+                btn.setAcceptDrops(True)
+                btn.clicked.connect(lambda checked, cat=category: self._handle_category_clicked(cat))
+                self.category_buttons[category] = btn
+
+            if self.categories_layout.indexOf(btn) != position:
+                self.categories_layout.removeWidget(btn)
+                self.categories_layout.insertWidget(position, btn)
+
+            text = f"{category} ({counts[category]})" if category in counts else category
+            if btn.text() != text:
+                btn.setText(text)
+
+        self.no_categories_label.setVisible(not categories)
+        self.update_category_button_styles()
+
+    def update_category_button_styles(self):
+        """Restyle category buttons whose checked state or theme changed"""
+        for category, btn in self.category_buttons.items():
+            is_active = (category == self.active_category)
+            btn.setChecked(is_active)
+            style = self.get_modern_button_style(is_sidebar_item=True, is_checked=is_active)
+            if self.category_button_styles.get(category) != style:
+                btn.setStyleSheet(style)
+                self.category_button_styles[category] = style
 
-        for btn in self.category_buttons.values():
-            btn.setAcceptDrops(True)
+    def _handle_category_clicked(self, category):
+        if self.on_category_selected:
+            self.on_category_selected(category)
 
     def update_create_note_button_style(self):
         global current_user_accent_color
@@ -1233,6 +1578,22 @@ class Sidebar(QWidget):
 
         return style
 
+def settings_button_style():
+    return f"""
+        QPushButton {{
+            background-color: {current_theme_colors['BORDER_LIGHT']};
+            color: {current_theme_colors['TEXT_PRIMARY']};
+            border: 1px solid {current_theme_colors['BORDER_MEDIUM']};
+            border-radius: 6px;
+            font-size: 13px;
+            padding: 0 15px;
+        }}
+        QPushButton:hover {{
+            background-color: {current_theme_colors['BORDER_MEDIUM']};
+        }}
+    """
+
+
 class SettingsView(QWidget):
     def __init__(self, parent_window, parent=None):
         super().__init__(parent)
@@ -1483,6 +1844,37 @@ class SettingsView(QWidget):
 
         self.populate_buddy_buttons()
 
+
+        self.data_section_header = QLabel("Your Notes:")
+        self.data_section_header.setFont(QFont("San Francisco", 14, QFont.Weight.Bold))
+        layout.addWidget(self.data_section_header)
+
+        self.data_description = QLabel("Bring in a folder of Markdown or text files (subfolders become categories), "
+                                       "or export your notes. Ctrl+E exports the notes currently shown. Choose the "
+                                       "same sync folder or sync server on each computer to keep their notes in step.")
+        self.data_description.setWordWrap(True)
+        self.data_description.setFont(QFont("San Francisco", 12))
+        layout.addWidget(self.data_description)
+
+        data_buttons = QHBoxLayout()
+        data_buttons.setAlignment(Qt.AlignmentFlag.AlignLeft)
+        self.data_buttons = []
+        for text, handler in (("Import Folder...", self.parent_window.import_notes_folder),
+                              ("Export All Notes...", lambda: self.parent_window.export_notes()),
+                              ("Sync Folder...", self.parent_window.choose_sync_folder),
+                              ("Sync Server...", self.parent_window.choose_sync_server)):
+            btn = QPushButton(text)
+            btn.setFixedHeight(32)
+            btn.clicked.connect(handler)
+            data_buttons.addWidget(btn)
+            self.data_buttons.append(btn)
+        layout.addLayout(data_buttons)
+
+
+        self.diagnostics_visible = False
+        self.diagnostics_container = None
+        self.settings_layout = layout
+
         layout.addStretch()
 
 
@@ -1747,8 +2139,140 @@ class SettingsView(QWidget):
             for button in self.buddy_buttons:
                 button.setSelected(button.buddy_file == current_buddy)
 
+
+        if hasattr(self, 'data_section_header'):
+            self.data_section_header.setStyleSheet(f"color: {header_color}; background-color: transparent; padding-top: 20px; font-weight: bold;")
+            self.data_description.setStyleSheet(f"color: {current_theme_colors['TEXT_SECONDARY']}; background-color: transparent;")
+            for btn in self.data_buttons:
+                btn.setStyleSheet(settings_button_style())
+
+
+        if getattr(self, 'diagnostics_container', None) is not None:
+            self.apply_diagnostics_styles()
+
+    def set_diagnostics_visible(self, visible):
+        """Reveal the Diagnostics section (built on first use); it stays out of the page until then"""
+        if visible and self.diagnostics_container is None:
+            self.build_diagnostics_section()
+        self.diagnostics_visible = visible
+        if self.diagnostics_container is not None:
+            self.diagnostics_container.setVisible(visible)
+        if visible:
+            self.refresh_diagnostics()
+
+    def build_diagnostics_section(self):
+        self.diagnostics_container = QWidget()
+        diagnostics_layout = QVBoxLayout(self.diagnostics_container)
+        diagnostics_layout.setContentsMargins(0, 0, 0, 0)
+        diagnostics_layout.setSpacing(8)
+
+        self.diagnostics_header = QLabel("Diagnostics:")
+        self.diagnostics_header.setFont(QFont("San Francisco", 14, QFont.Weight.Bold))
+        diagnostics_layout.addWidget(self.diagnostics_header)
+
+        self.diagnostics_toggle = QCheckBox("Record timing spans")
+        self.diagnostics_toggle.setFont(QFont("San Francisco", 13))
+        self.diagnostics_toggle.setChecked(spans.enabled)
+        self.diagnostics_toggle.stateChanged.connect(self.toggle_diagnostics_recording)
+        diagnostics_layout.addWidget(self.diagnostics_toggle)
+
+        self.diagnostics_table = QLabel()
+        self.diagnostics_table.setFont(QFont("Menlo", 11))
+        self.diagnostics_table.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        diagnostics_layout.addWidget(self.diagnostics_table)
+
+        self.memory_report_label = QLabel()
+        self.memory_report_label.setFont(QFont("Menlo", 11))
+        self.memory_report_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        self.memory_report_label.setVisible(False)
+        diagnostics_layout.addWidget(self.memory_report_label)
+
+        diagnostics_buttons = QHBoxLayout()
+        diagnostics_buttons.setAlignment(Qt.AlignmentFlag.AlignLeft)
+        self.diagnostics_buttons = []
+        for text, handler in (("Refresh", self.refresh_diagnostics),
+                              ("Reset", self.reset_diagnostics),
+                              ("Memory Report", self.show_memory_report),
+                              ("Export JSON...", self.export_diagnostics)):
+            btn = QPushButton(text)
+            btn.setFixedHeight(32)
+            btn.clicked.connect(handler)
+            diagnostics_buttons.addWidget(btn)
+            self.diagnostics_buttons.append(btn)
+        diagnostics_layout.addLayout(diagnostics_buttons)
+
+        self.settings_layout.insertWidget(self.settings_layout.count() - 1, self.diagnostics_container)
+        self.apply_diagnostics_styles()
+
+    def apply_diagnostics_styles(self):
+        header_color = "#FFFFFF" if current_theme_name in ["dark", "amoled"] else current_theme_colors['TEXT_PRIMARY']
+        self.diagnostics_header.setStyleSheet(f"color: {header_color}; background-color: transparent; padding-top: 20px; font-weight: bold;")
+        self.diagnostics_table.setStyleSheet(f"color: {current_theme_colors['TEXT_SECONDARY']}; background-color: transparent;")
+        self.memory_report_label.setStyleSheet(f"color: {current_theme_colors['TEXT_SECONDARY']}; background-color: transparent;")
+        self.diagnostics_toggle.setStyleSheet(f"color: {current_theme_colors['TEXT_PRIMARY']}; background-color: transparent;")
+        for btn in self.diagnostics_buttons:
+            btn.setStyleSheet(settings_button_style())
+
+    def refresh_diagnostics(self):
+        if self.diagnostics_container is None:
+            return
+        stats = spans.stats()
+        if not stats:
+            state = "Recording is on" if spans.enabled else "Recording is off"
+            self.diagnostics_table.setText(f"No spans recorded yet. {state}.")
+            return
+        lines = [f"{'span':<26}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        for name, span_stats in stats.items():
+            lines.append(f"{name:<26}{span_stats['count']:>8}{span_stats['p50_ms']:>10.1f}"
+                         f"{span_stats['p95_ms']:>10.1f}{span_stats['p99_ms']:>10.1f}")
+        self.diagnostics_table.setText("\n".join(lines))
+
+    def toggle_diagnostics_recording(self, state):
+        spans.enabled = (state == Qt.CheckState.Checked.value)
+        self.parent_window.save_settings({"diagnostics": spans.enabled})
+        self.refresh_diagnostics()
+
+    def reset_diagnostics(self):
+        spans.reset()
+        self.refresh_diagnostics()
+
+    def show_memory_report(self):
+        report = self.parent_window.memory_report()
+        store = report["notes_store"]
+        widgets = report["widgets"]
+        lines = [
+            f"notes store   {store['notes']} notes, metadata {format_bytes(store['metadata_bytes'])}, "
+            f"body index {format_bytes(store['body_index_bytes'])}, body file {format_bytes(store['body_file_bytes'])}",
+            f"note cards    {widgets['note_widgets']} alive, {widgets['note_widgets_in_grid']} in the grid",
+            f"chat          {report['chat']['messages']} messages, {report['chat']['widgets']} widgets",
+            f"widgets       {widgets['total']} alive, {widgets['hidden_top_level']} hidden top-level",
+            f"pixmaps       {report['pixmaps']['count']} on labels, {format_bytes(report['pixmaps']['bytes'])}",
+            f"stylesheets   {report['stylesheets']['widgets']} widgets, {format_bytes(report['stylesheets']['bytes'])} "
+            f"({report['stylesheets']['unique']} unique)"
+        ]
+        traced = report["python_heap"]
+        if traced is None:
+            start_memory_tracing()
+            lines.append("python heap   tracemalloc started now; run the report again to see allocations")
+        else:
+            lines.append(f"python heap   {format_bytes(traced['current_bytes'])} traced, peak {format_bytes(traced['peak_bytes'])}")
+            for entry in traced["top_files"][:5]:
+                lines.append(f"  {format_bytes(entry['bytes']):>10}  {os.path.basename(entry['file'])}")
+        self.memory_report_label.setText("\n".join(lines))
+        self.memory_report_label.setVisible(True)
+
+    def export_diagnostics(self):
+        default_path = str(Path.home() / f"{APP_NAME.lower()}_diagnostics_{datetime.now():%Y%m%d_%H%M%S}.json")
+        path, _ = QFileDialog.getSaveFileName(self, "Export Diagnostics", default_path, "JSON Files (*.json)")
+        if not path:
+            return
+        try:
+            spans.export_json(path, {"memory": self.parent_window.memory_report()})
+        except OSError as e:
+            QMessageBox.critical(self, "Export Error", f"Could not export diagnostics to {path}: {e}")
+
     def populate_buddy_buttons(self):
-        """Create buddy selection buttons with image previews"""
+        """Rebuild the buddy tiles; the folder is scanned and the thumbnails loaded in the background"""
 
         for button in self.buddy_buttons:
             self.buddy_buttons_layout.removeWidget(button)
@@ -1762,17 +2286,24 @@ class SettingsView(QWidget):
         self.buddy_buttons.append(none_button)
 
 
-        if os.path.exists(BUDDIES_FOLDER) and os.path.isdir(BUDDIES_FOLDER):
-            for file in sorted(os.listdir(str(BUDDIES_FOLDER))):
-                if file.endswith(('.png', '.jpg', '.jpeg', '.svg', '.gif', '.webp')):
-                    name = os.path.splitext(file)[0].replace('_', ' ').title()
-                    button = BuddySelectionButton(file, name)
-                    button.clicked.connect(lambda checked, f=file: self.select_buddy(f))
-                    self.buddy_buttons_layout.addWidget(button)
-                    self.buddy_buttons.append(button)
+        self.update_buddy_selection()
+        populate_token = self.buddy_populate_token = object()
+        get_buddy_images().scan_folder(lambda files: self.add_buddy_buttons(files, populate_token))
 
+    def add_buddy_buttons(self, files, populate_token):
+        """Add placeholder tiles a batch at a time so a large buddy folder does not stall the page"""
+        if populate_token is not self.buddy_populate_token:
+            return
+        for file in files[:BUDDY_BUTTON_BATCH]:
+            name = os.path.splitext(file)[0].replace('_', ' ').title()
+            button = BuddySelectionButton(file, name)
+            button.clicked.connect(lambda checked, f=file: self.select_buddy(f))
+            self.buddy_buttons_layout.addWidget(button)
+            self.buddy_buttons.append(button)
 
-        self.update_buddy_selection()
+        remaining = files[BUDDY_BUTTON_BATCH:]
+        if remaining:
+            QTimer.singleShot(0, lambda: self.add_buddy_buttons(remaining, populate_token))
 
     def update_buddy_selection(self):
         """Update the selected buddy button based on the current setting"""
@@ -1803,25 +2334,59 @@ class SettingsView(QWidget):
 
 class MainWindow(QMainWindow):
     def __init__(self):
-        global current_user_accent_color
+        global current_user_accent_color, category_table
         super().__init__()
 
+        self.settings_view = None
+        self.buddy_companion = None
+        self.chat_window = None
+        self.import_worker = None
+        self.export_worker = None
+        self.sync_worker = None
+        self.sync_status = ""
+        self.first_frame_painted = False
+        self.initial_notes_populated = False
+        self.notes_layout_columns = None
 
         self.setWindowIcon(QIcon("images/Amogus.webp"))
 
 
         self.live_countdown_timer = QTimer(self)
         self.amogus_timer = QTimer(self)
+        self.stall_watchdog = StallWatchdog(STALL_LOG_FILE, DEFAULT_STALL_THRESHOLD_MS)
+        self.heartbeat_timer = QTimer(self)
+        self.heartbeat_timer.timeout.connect(self.stall_watchdog.heartbeat)
+        self.file_watcher = QFileSystemWatcher(self)
+        self.notes_reload_timer = QTimer(self)
+        self.notes_reload_timer.setSingleShot(True)
+        self.notes_reload_timer.timeout.connect(self.reload_external_notes)
+        self.buddies_reload_timer = QTimer(self)
+        self.buddies_reload_timer.setSingleShot(True)
+        self.buddies_reload_timer.timeout.connect(self.reload_buddies)
+        self.file_watcher.fileChanged.connect(lambda path: self.notes_reload_timer.start(300))
+        self.file_watcher.directoryChanged.connect(lambda path: self.buddies_reload_timer.start(300))
+        self.sync_timer = QTimer(self)
+        self.sync_timer.setInterval(SYNC_INTERVAL_MS)
+        self.sync_timer.timeout.connect(self.start_sync)
 
         self.setWindowTitle("AmogOS Notes")
         self.setMinimumSize(900, 550)
 
-        self.notes = {}
+        self.store = NotesStore(DATA_DIR)
+        self.store.on_conflicts = self.warn_about_conflicts
+        self.store.on_saved = self.rewatch_notes_file
+        self.drafts = DraftStore(DRAFTS_FOLDER)
+        self.store.on_renamed = self.drafts.rename
+        category_table = self.store.category_table
         self.categories = []
         self.current_filter = "home"
         self.current_category = None
+        # Settings are applied after the UI is built, but the startup load should be timed too
+        spans.enabled = bool(self.read_saved_settings().get("diagnostics", DEFAULT_DIAGNOSTICS))
         self.load_notes()
         self.check_expired_notes()
+        self.watch_data_files()
+        startup_profiler.mark("load notes")
 
         self.main_widget = QWidget()
         self.setCentralWidget(self.main_widget)
@@ -1834,6 +2399,7 @@ class MainWindow(QMainWindow):
 
         self.sidebar = Sidebar(self)
         main_hbox_layout.addWidget(self.sidebar)
+        startup_profiler.mark("build sidebar")
 
 
         self.stacked_content_widget = QStackedWidget()
@@ -1887,11 +2453,8 @@ class MainWindow(QMainWindow):
         notes_page_layout.addWidget(self.scroll_area, 1)
 
 
-        self.settings_view = SettingsView(self)
-
-
         self.stacked_content_widget.addWidget(self.notes_page_widget)
-        self.stacked_content_widget.addWidget(self.settings_view)
+        startup_profiler.mark("build notes page")
 
 
 
@@ -1903,6 +2466,7 @@ class MainWindow(QMainWindow):
                 "favorites": self.show_favorite_notes,
                 "temporary_notes": self.show_temporary_notes,
                 "recycle_bin": self.show_recycle_bin,
+                "synced_notes": self.show_synced_notes,
                 "settings": self.show_settings_view
             }
             for key, func in nav_map.items():
@@ -1914,20 +2478,28 @@ class MainWindow(QMainWindow):
 
         if hasattr(self.sidebar, 'add_category_btn'):
             self.sidebar.add_category_btn.clicked.connect(self.add_new_category)
+        self.sidebar.on_category_selected = self.show_category
 
+        self.undo_shortcut = QShortcut(QKeySequence(QKeySequence.StandardKey.Undo), self)
+        self.undo_shortcut.activated.connect(self.undo_last_transaction)
+        self.redo_shortcut = QShortcut(QKeySequence("Ctrl+Y"), self)
+        self.redo_shortcut.activated.connect(self.redo_last_transaction)
+        self.diagnostics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        self.diagnostics_shortcut.activated.connect(self.toggle_diagnostics_page)
+        self.export_shortcut = QShortcut(QKeySequence("Ctrl+E"), self)
+        self.export_shortcut.activated.connect(self.export_current_view)
 
-        self.active_popup = None
 
-
-        self.buddy_companion = AmogusCompanion(self.main_widget)
+        self.active_popup = None
 
 
         self.load_settings_and_apply_theme()
+        startup_profiler.mark("apply settings and theme")
 
 
         self.update_active_nav_button()
         self.load_categories()
-        self.display_filtered_notes()
+        startup_profiler.mark("load categories")
 
 
         self.live_countdown_timer.timeout.connect(self.update_visible_note_countdowns)
@@ -1955,24 +2527,13 @@ class MainWindow(QMainWindow):
             print("Amogus Joke Timer: Disabled. No random jokes will be created.")
 
     def load_categories(self):
-        """Load categories from notes data"""
-        categories = set()
-        for note_id, note_data in self.notes.items():
-            if not note_data.get("deleted", False):
-                category = note_data.get("category")
-                if category and category != "Uncategorized":
-                    categories.add(category)
-
-        self.categories = sorted(list(categories))
+        """Refresh the category list and sidebar from the category index"""
+        self.categories = self.store.categories()
+        self.save_category_table()
 
 
         if hasattr(self.sidebar, 'update_category_buttons'):
-            self.sidebar.update_category_buttons(self.categories, self.current_category)
-
-
-            if hasattr(self.sidebar, 'category_buttons'):
-                for category, btn in self.sidebar.category_buttons.items():
-                    btn.clicked.connect(lambda checked, cat=category: self.show_category(cat))
+            self.sidebar.update_category_buttons(self.categories, self.current_category, self.category_index.counts())
 
     def show_category(self, category):
         """Filter notes by selected category"""
@@ -1990,12 +2551,7 @@ class MainWindow(QMainWindow):
 
         self.update_active_nav_button()
         if hasattr(self.sidebar, 'update_category_buttons'):
-            self.sidebar.update_category_buttons(self.categories, self.current_category)
-
-
-            if hasattr(self.sidebar, 'category_buttons'):
-                for cat, btn in self.sidebar.category_buttons.items():
-                    btn.clicked.connect(lambda checked, c=cat: self.show_category(c))
+            self.sidebar.update_category_buttons(self.categories, self.current_category, self.category_index.counts())
 
     def update_category_tag(self, category=None):
         """Update the category tag display"""
@@ -2008,12 +2564,12 @@ class MainWindow(QMainWindow):
 
         if category and self.current_filter == "category":
 
-            tag_color = get_category_color(category)
+            tag_color, tag_text_color = get_category_style(category)
             tag = QLabel(f" {category} ")
             tag.setStyleSheet(f"""
                 QLabel {{
                     background-color: {tag_color};
-                    color: {get_contrasting_text_color(tag_color)};
+                    color: {tag_text_color};
                     border-radius: 12px;
                     padding: 4px 10px;
                     font-weight: bold;
@@ -2066,6 +2622,7 @@ class MainWindow(QMainWindow):
 
         color_btn = QPushButton()
         current_color = get_category_color(category)
+        color_btn.selected_color = current_color
         color_btn.setStyleSheet(f"background-color: {current_color}; min-height: 30px;")
         color_btn.clicked.connect(lambda: self.show_color_picker(color_btn))
         dialog_layout.addWidget(color_btn)
@@ -2083,21 +2640,13 @@ class MainWindow(QMainWindow):
             new_name = name_input.text().strip()
             if new_name and new_name != category:
 
-                for note_id, note_data in self.notes.items():
-                    if note_data.get("category") == category:
-                        note_data["category"] = new_name
-
-
-                if category in self.categories:
-                    self.categories.remove(category)
-                if new_name not in self.categories:
-                    self.categories.append(new_name)
-                    self.categories.sort()
-
-
-                self.save_notes()
+                self.move_category_notes(category, new_name, f"Rename category '{category}'", color_btn.selected_color)
                 self.load_categories()
                 self.show_category(new_name)
+            elif color_btn.selected_color != current_color:
+                category_table.set_color(category, color_btn.selected_color)
+                self.save_category_table()
+                self.show_category(category)
 
             dialog.accept()
 
@@ -2114,6 +2663,7 @@ class MainWindow(QMainWindow):
         current_color = button.palette().button().color()
         color = QColorDialog.getColor(current_color, self, "Select Category Color")
         if color.isValid():
+            button.selected_color = color.name()
             button.setStyleSheet(f"background-color: {color.name()}; min-height: 30px;")
 
     def delete_category(self, category, dialog):
@@ -2128,19 +2678,51 @@ class MainWindow(QMainWindow):
 
         if reply == QMessageBox.StandardButton.Yes:
 
-            for note_id, note_data in self.notes.items():
-                if note_data.get("category") == category:
-                    note_data["category"] = "Uncategorized"
+            self.move_category_notes(category, "Uncategorized", f"Delete category '{category}'")
+            self.load_categories()
+            self.show_all_notes()
+            dialog.accept()
+
+    def move_category_notes(self, category, new_category, label, color=None):
+        """Refile only the notes indexed under category, as a single undoable transaction"""
+        try:
+            self.store.move_category(category, new_category, label, color)
+        except OSError as e:
+            QMessageBox.critical(self, "Save Error", f"Could not save the category change: {e}")
 
+    def commit_note_transaction(self, label, ops, undoable=True):
+        """Journal a batch of field changes, apply it and persist it with one write"""
+        try:
+            self.store.commit_transaction(label, ops, undoable)
+        except OSError as e:
+            QMessageBox.critical(self, "Save Error", f"Could not write to the notes journal: {e}")
 
-            if category in self.categories:
-                self.categories.remove(category)
+    def record_note_change(self, label, note_id, mutate):
+        """Make a change through the store's operation log so Ctrl+Z can take it back"""
+        try:
+            return self.store.record(label, [note_id], mutate)
+        except OSError as e:
+            QMessageBox.critical(self, "Save Error", f"Could not write to the notes journal: {e}")
+            return None
 
+    def undo_last_transaction(self):
+        self.step_history(self.store.undo, "undo")
 
-            self.save_notes()
-            self.load_categories()
+    def redo_last_transaction(self):
+        self.step_history(self.store.redo, "redo")
+
+    def step_history(self, step, action):
+        try:
+            if not step():
+                return
+        except OSError as e:
+            QMessageBox.critical(self, "Save Error", f"Could not {action}: {e}")
+            return
+        self.load_categories()
+        if self.current_filter == "category" and self.current_category not in self.categories:
             self.show_all_notes()
-            dialog.accept()
+        else:
+            self.display_filtered_notes()
 
     def add_new_category(self):
         """Show dialog to add a new category"""
@@ -2164,6 +2746,7 @@ class MainWindow(QMainWindow):
 
         default_color = "#FF69B4"
         color_btn = QPushButton()
+        color_btn.selected_color = default_color
         color_btn.setStyleSheet(f"background-color: {default_color}; min-height: 30px;")
         color_btn.clicked.connect(lambda: self.show_color_picker(color_btn))
         dialog_layout.addWidget(color_btn)
@@ -2187,8 +2770,8 @@ class MainWindow(QMainWindow):
                 return
 
 
-            self.categories.append(category_name)
-            self.categories.sort()
+            self.store.ensure_category(category_name, color_btn.selected_color)
+            self.save_category_table()
 
 
             self.load_categories()
@@ -2204,120 +2787,230 @@ class MainWindow(QMainWindow):
         dialog.exec()
 
     def generate_note_id(self):
-        return datetime.now().strftime("%Y%m%d%H%M%S%f")
+        return self.store.generate_id()
 
-    def load_notes(self):
-        if os.path.exists(NOTES_FILE):
-            try:
-                with open(NOTES_FILE, 'r') as f:
-                    self.notes = json.load(f)
-            except json.JSONDecodeError:
-                self.notes = {}
-                QMessageBox.warning(self, "Load Error", "Could not load notes.json. File might be corrupted.")
-        else:
-            self.notes = {}
+    @property
+    def notes(self):
+        return self.store.notes
 
-    def save_notes(self):
-        try:
-            with open(NOTES_FILE, 'w') as f:
-                json.dump(self.notes, f, indent=4)
-        except IOError:
-            QMessageBox.critical(self, "Save Error", "Could not save notes to notes.json.")
+    @property
+    def body_store(self):
+        return self.store.body_store
 
-    def check_expired_notes(self):
-        """Check and handle both temporary notes and recycle bin notes older than 30 days"""
-        current_time = datetime.now()
-        notes_to_delete = []
+    @property
+    def category_index(self):
+        return self.store.category_index
 
-        for note_id, note_data in self.notes.items():
+    @property
+    def journal(self):
+        return self.store.journal
 
-            if not isinstance(note_data, dict):
-                print(f"Warning: Corrupted note data found for ID {note_id}. Skipping...")
-                notes_to_delete.append(note_id)
-                continue
+    @spans.timed("load_notes")
+    def load_notes(self):
+        if not self.store.load():
+            QMessageBox.warning(self, "Load Error", "Could not load notes.json. File might be corrupted.")
 
-            try:
+    def get_note_content(self, note_id):
+        return self.store.get_content(note_id)
 
-                if note_data.get("temporary", False):
-                    created_at = datetime.fromisoformat(note_data.get("created_at", current_time.isoformat()))
-                    age = current_time - created_at
+    def get_note_preview(self, note_id, max_chars=101):
+        return self.store.get_preview(note_id, max_chars)
 
+    @spans.timed("save_notes")
+    def save_notes(self):
+        try:
+            self.store.save_notes()
+        except IOError:
+            QMessageBox.critical(self, "Save Error", "Could not save notes to notes.json.")
+        self.save_category_table()
+
+    def warn_about_conflicts(self, conflicted_titles):
+        QMessageBox.warning(self, "Notes Changed Elsewhere",
+                            "These notes were changed both here and by another program. The older version "
+                            "was kept as a conflicted copy where possible:\n\n" + "\n".join(conflicted_titles[:10]))
+
+    def watch_data_files(self):
+        """(Re)add the buddies folder and notes.json to the file watcher; editors that replace files drop them from it"""
+        watched = set(self.file_watcher.files()) | set(self.file_watcher.directories())
+        for path in (str(BUDDIES_FOLDER), str(NOTES_FILE)):
+            if path not in watched and os.path.exists(path):
+                self.file_watcher.addPath(path)
+
+    def rewatch_notes_file(self):
+        """Watch the notes.json a save just moved into place; the watch on the replaced file is gone"""
+        self.file_watcher.removePath(str(NOTES_FILE))
+        self.file_watcher.addPath(str(NOTES_FILE))
+
+    def reload_external_notes(self):
+        """Merge notes.json after a change that did not come from this window"""
+        self.watch_data_files()
+        if not self.store.changed_on_disk():
+            return
+        if not self.store.merge_external():
+            return
+        if self.notes != self.store.base:
+            self.save_notes()
+        self.load_categories()
+        self.display_filtered_notes()
 
-                    if age.days >= 30:
-                        notes_to_delete.append(note_id)
+    def reload_buddies(self):
+        self.watch_data_files()
+        if self.settings_view is not None:
+            self.settings_view.populate_buddy_buttons()
+        if self.buddy_companion is not None:
+            self.buddy_companion.set_buddy(current_buddy)
 
+    def save_category_table(self):
+        try:
+            self.store.save_categories()
+        except IOError:
+            QMessageBox.critical(self, "Save Error", f"Could not save category colors to {CATEGORIES_FILE}.")
 
-                if note_data.get("deleted", False):
-                    deleted_at = datetime.fromisoformat(note_data.get("deleted_at", current_time.isoformat()))
-                    time_in_bin = current_time - deleted_at
+    def import_notes_folder(self):
+        """Import every Markdown and text file under a folder without blocking the window"""
+        if self.import_worker is not None:
+            return
+        folder = QFileDialog.getExistingDirectory(self, "Import Notes Folder", str(Path.home()))
+        if not folder:
+            return
+        self.import_results = {"imported": 0, "failures": []}
+        self.import_progress = QProgressDialog("Reading notes...", "Cancel", 0, 0, self)
+        self.import_progress.setWindowTitle("Import Notes")
+        self.import_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.import_progress.setMinimumDuration(300)
+        self.import_worker = NotesImportWorker(folder, self)
+        self.import_worker.batch_parsed.connect(self.commit_import_batch)
+        self.import_worker.finished.connect(self.finish_import)
+        self.import_progress.canceled.connect(self.import_worker.cancel)
+        self.import_worker.start()
+
+    def commit_import_batch(self, records):
+        """Add one parsed batch to the store and save it; the grid is only rebuilt once the import ends"""
+        if self.import_worker is None or self.import_worker.cancelled:
+            return
+        note_ids, failures = self.store.import_batch(records)
+        self.import_results["imported"] += len(note_ids)
+        self.import_results["failures"].extend(failures)
+        self.save_notes()
+        self.import_progress.setLabelText(f"Imported {self.import_results['imported']} notes...")
 
+    def finish_import(self):
+        worker = self.import_worker
+        self.import_worker = None
+        self.import_progress.close()
+        worker.deleteLater()
+        self.load_categories()
+        self.display_filtered_notes()
 
-                    if time_in_bin.days >= 30:
-                        notes_to_delete.append(note_id)
-            except (ValueError, TypeError, KeyError) as e:
-                print(f"Warning: Error processing note {note_id}: {str(e)}. Skipping...")
-                continue
+        imported = self.import_results["imported"]
+        failures = self.import_results["failures"]
+        message = f"Imported {imported} notes."
+        if worker.cancelled:
+            message = f"Import cancelled after {imported} notes."
+        if failures:
+            message += f"\n\nCould not read {len(failures)} files:\n" + "\n".join(
+                f"{os.path.basename(source)}: {error}" for source, error in failures[:10])
+        if worker.error:
+            QMessageBox.critical(self, "Import Error", f"{message}\n\nThe import stopped early: {worker.error}")
+        else:
+            QMessageBox.information(self, "Import Notes", message)
 
+    def export_current_view(self):
+        if self.current_filter in ("home", "favorites", "temporary_notes", "recycle_bin", "synced_notes", "category"):
+            self.export_notes(self.current_filter, self.current_category)
+        else:
+            self.export_notes()
 
-        for note_id in notes_to_delete:
-            del self.notes[note_id]
+    def export_notes(self, view="home", category=None):
+        """Export the notes of a view as a zip archive, JSON lines or a folder of Markdown files in the background"""
+        if self.export_worker is not None:
+            return
+        view_name = category if view == "category" else view.replace("_", " ")
+        default_path = str(Path.home() / f"{APP_NAME.lower()}_{safe_filename(view_name)}_{datetime.now():%Y%m%d}")
+        formats = {"Zip archive of Markdown files (*.zip)": "zip",
+                   "JSON Lines (*.jsonl)": "jsonl",
+                   "Folder of Markdown files (*)": "markdown"}
+        destination, selected_filter = QFileDialog.getSaveFileName(self, "Export Notes", default_path, ";;".join(formats))
+        if not destination:
+            return
+        fmt = formats.get(selected_filter, "zip")
+        if fmt != "markdown" and not destination.lower().endswith(f".{fmt}"):
+            destination += f".{fmt}"
+        if fmt == "markdown" and os.path.isfile(destination):
+            QMessageBox.critical(self, "Export Error", f"{destination} is a file; choose a new folder name for the Markdown files.")
+            return
 
+        data_path, items = snapshot_notes(self.store, view, category)
+        self.export_progress = QProgressDialog("Exporting notes...", "Cancel", 0, max(len(items), 1), self)
+        self.export_progress.setWindowTitle("Export Notes")
+        self.export_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.export_progress.setMinimumDuration(300)
+        self.export_worker = NotesExportWorker(fmt, data_path, items, destination, self)
+        self.export_worker.progress.connect(self.update_export_progress)
+        self.export_worker.finished.connect(self.finish_export)
+        self.export_progress.canceled.connect(self.export_worker.cancel)
+        self.export_worker.start()
+
+    def update_export_progress(self, done, total):
+        if self.export_worker is not None and not self.export_worker.cancelled:
+            self.export_progress.setValue(done)
+            self.export_progress.setLabelText(f"Exported {done} of {total} notes...")
+
+    def finish_export(self):
+        worker = self.export_worker
+        self.export_worker = None
+        self.export_progress.close()
+        worker.deleteLater()
+        if worker.error:
+            QMessageBox.critical(self, "Export Error", f"Could not export notes to {worker.destination}: {worker.error}")
+        elif not worker.cancelled:
+            QMessageBox.information(self, "Export Notes", f"Exported {worker.count} notes to {worker.destination}.")
 
-        if notes_to_delete:
-            print(f"Deleted {len(notes_to_delete)} expired/corrupted notes")
+    def check_expired_notes(self):
+        """Check and handle both temporary notes and recycle bin notes older than 30 days"""
+        expired = self.store.expire()
+        if expired:
+            print(f"Deleted {expired} expired/corrupted notes")
             self.save_notes()
 
     def add_or_update_note(self, note_id=None, title="", content="", is_temporary=False, category=None):
-        if not note_id:
-            note_id = self.generate_note_id()
-            created_at = datetime.now().isoformat()
-
-            if category is None and self.current_filter == "category":
-                category = self.current_category
-        else:
-            created_at = self.notes.get(note_id, {}).get("created_at", datetime.now().isoformat())
-
-            if category is None:
-                category = self.notes.get(note_id, {}).get("category", "Uncategorized")
-
-        self.notes[note_id] = {
-            "title": title,
-            "content": content,
-            "created_at": created_at,
-            "updated_at": datetime.now().isoformat(),
-            "category": category or "Uncategorized",
-            "favorite": self.notes.get(note_id, {}).get("favorite", False),
-            "temporary": is_temporary,
-            "deleted": self.notes.get(note_id, {}).get("deleted", False),
-            "deleted_at": self.notes.get(note_id, {}).get("deleted_at", None)
-        }
-        self.save_notes()
+        if not note_id and category is None and self.current_filter == "category":
+            category = self.current_category
+        label = f"Edit '{title or 'Untitled'}'" if note_id in self.notes else f"New note '{title or 'Untitled'}'"
+        note_id = note_id or self.store.generate_id()
+        self.record_note_change(label, note_id,
+                                lambda: self.store.add_or_update(note_id, title, content, is_temporary, category))
         self.load_categories()
         self.display_filtered_notes()
 
-    def create_new_note_popup(self):
+    def create_new_note_popup(self, title="", draft=None):
         if self.active_popup:
             self.active_popup.close()
 
 
         is_temporary = (self.current_filter == "temporary_notes")
         category = self.current_category if self.current_filter == "category" else None
+        if draft:
+            title, is_temporary, category = draft["title"], draft.get("temporary", False), draft.get("category")
 
 
         self.active_popup = CategoryNotePopup(
             self.main_widget,
             on_save=self.add_or_update_note,
+            title=title,
+            content=draft["content"] if draft else "",
             is_temporary=is_temporary,
             categories=self.categories,
             initial_category=category
         )
+        self.attach_autosaver(self.active_popup, draft["key"] if draft else f"new-{self.store.generate_id()}")
         self.active_popup.show()
 
 
-        if hasattr(self, 'buddy_companion') and self.buddy_companion.isVisible():
+        if self.buddy_companion is not None and self.buddy_companion.isVisible():
             self.buddy_companion.raise_()
 
-    def edit_note_popup(self, note_id):
+    def edit_note_popup(self, note_id, draft=None):
         note = self.notes.get(note_id)
         if not note:
             return
@@ -2326,38 +3019,139 @@ class MainWindow(QMainWindow):
             self.active_popup.close()
 
 
+        draft = draft or {}
         self.active_popup = CategoryNotePopup(
             self.main_widget,
             on_save=self.add_or_update_note,
             note_id=note_id,
-            title=note["title"],
-            content=note["content"],
-            is_temporary=note.get("temporary", False),
+            title=draft.get("title", note["title"]),
+            content=draft["content"] if "content" in draft else self.get_note_content(note_id),
+            is_temporary=draft.get("temporary", note.get("temporary", False)),
             categories=self.categories,
-            initial_category=note.get("category", "Uncategorized")
+            initial_category=draft.get("category") or note.get("category", "Uncategorized"),
+            on_history=self.show_note_history
         )
+        self.attach_autosaver(self.active_popup, note_id)
         self.active_popup.show()
 
 
-        if hasattr(self, 'buddy_companion') and self.buddy_companion.isVisible():
+        if self.buddy_companion is not None and self.buddy_companion.isVisible():
             self.buddy_companion.raise_()
 
+    def attach_autosaver(self, popup, key):
+        popup.autosaver = DraftAutosaver(popup, key, popup.draft, self.drafts)
+        popup.autosaver.watch(popup.title_edit.textChanged, popup.content_edit.textChanged,
+                              popup.temp_checkbox.toggled, popup.category_combo.currentIndexChanged)
+
+    def offer_drafts(self):
+        """After a crash, offer to reopen the drafts that were being edited; declined ones are deleted"""
+        for draft in self.drafts.load():
+            note_id = draft.get("note_id")
+            note = self.notes.get(note_id) if note_id else None
+            if note and draft.get("title") == note.get("title") and draft.get("content") == self.get_note_content(note_id):
+                self.drafts.discard(draft["key"])
+                continue
+            if not draft.get("title") and not draft.get("content"):
+                self.drafts.discard(draft["key"])
+                continue
+            reply = QMessageBox.question(
+                self, "Restore Draft",
+                f"AmogOS Notes closed while you were editing '{draft.get('title') or 'Untitled'}' "
+                f"(last autosaved {(draft.get('saved_at') or '')[:16].replace('T', ' ')}).\n\nRestore the unsaved draft?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.Yes
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                self.drafts.discard(draft["key"])
+                continue
+            if note:
+                self.edit_note_popup(note_id, draft)
+            else:
+                if note_id:
+                    # The note was deleted meanwhile, so the draft comes back as a new note
+                    self.drafts.discard(draft["key"])
+                    draft = dict(draft, key=f"new-{note_id}", note_id=None)
+                self.create_new_note_popup(draft=draft)
+            # Any other drafts are offered after the next restart
+            return
+
+    def show_note_history(self, note_id, popup):
+        """Browse the saved versions of a note and load one back into the open editor"""
+        history = self.store.history
+        revisions = history.revisions(note_id)
+        if not revisions:
+            QMessageBox.information(popup, "Note History",
+                                    "This note has no earlier versions yet. A version is kept every time you save it.")
+            return
+
+        dialog = QDialog(popup)
+        dialog.setWindowTitle(f"History of '{self.notes.get(note_id, {}).get('title') or 'Untitled'}'")
+        dialog.resize(680, 440)
+        dialog_layout = QHBoxLayout(dialog)
+
+        revision_list = QListWidget()
+        revision_list.setFixedWidth(230)
+        for rev, saved_at, title in revisions:
+            item = QListWidgetItem(f"{saved_at[:16].replace('T', ' ')}\n{title or 'Untitled'}")
+            item.setData(Qt.ItemDataRole.UserRole, (rev, title))
+            revision_list.addItem(item)
+        dialog_layout.addWidget(revision_list)
+
+        right_layout = QVBoxLayout()
+        # Versions can be megabytes long; this editor loads them in chunks instead of freezing the dialog
+        preview = LargeNoteEditor("", read_only=True)
+        preview.setFont(QFont("San Francisco", 12))
+        right_layout.addWidget(preview, 1)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch(1)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(dialog.reject)
+        restore_btn = QPushButton("Restore This Version")
+        restore_btn.setDefault(True)
+        restore_btn.setToolTip("Load this version into the editor; press Done there to keep it")
+        button_layout.addWidget(close_btn)
+        button_layout.addWidget(restore_btn)
+        right_layout.addLayout(button_layout)
+        dialog_layout.addLayout(right_layout, 1)
+
+        selected = {}
+
+        def show_revision(row):
+            if row < 0:
+                return
+            rev, title = revision_list.item(row).data(Qt.ItemDataRole.UserRole)
+            try:
+                text = history.text(note_id, rev)
+            except ValueError as e:
+                print(f"Could not rebuild revision {rev} of note {note_id}: {e}")
+                text = None
+            selected.update(title=title, text=text)
+            preview.setPlainText(text if text is not None else "This version could not be read.")
+            restore_btn.setEnabled(text is not None)
+
+        def restore():
+            popup.load_version(selected["title"], selected["text"])
+            dialog.accept()
+
+        revision_list.currentRowChanged.connect(show_revision)
+        restore_btn.clicked.connect(restore)
+        revision_list.setCurrentRow(0)
+        dialog.exec()
+
     def toggle_favorite(self, note_id):
-        if note_id in self.notes:
-            self.notes[note_id]["favorite"] = not self.notes[note_id]["favorite"]
-            self.save_notes()
+        if self.record_note_change("Favorite", note_id, lambda: self.store.toggle_favorite(note_id)):
             self.display_filtered_notes()
 
     def delete_note_confirmed(self, note_id, permanent=False):
         if note_id in self.notes:
+            title = self.notes[note_id].get("title") or "Untitled"
             if permanent:
-
-                del self.notes[note_id]
+                self.record_note_change(f"Permanently delete '{title}'", note_id,
+                                        lambda: self.store.delete_permanently(note_id))
             else:
-
-                self.notes[note_id]["deleted"] = True
-                self.notes[note_id]["deleted_at"] = datetime.now().isoformat()
-            self.save_notes()
+                self.record_note_change(f"Delete '{title}'", note_id, lambda: self.store.move_to_recycle_bin(note_id))
+            self.load_categories()
             self.display_filtered_notes()
 
     def delete_note_prompt(self, note_id):
@@ -2373,10 +3167,8 @@ class MainWindow(QMainWindow):
             self.delete_note_confirmed(note_id)
 
     def restore_note(self, note_id):
-        if note_id in self.notes:
-            self.notes[note_id]["deleted"] = False
-            self.notes[note_id]["deleted_at"] = None
-            self.save_notes()
+        if self.record_note_change("Restore", note_id, lambda: self.store.restore(note_id)):
+            self.load_categories()
             self.display_filtered_notes()
 
     def show_all_notes(self):
@@ -2412,6 +3204,9 @@ class MainWindow(QMainWindow):
                  is_settings = (key == "settings")
                  btn.setStyleSheet(self.sidebar.get_modern_button_style(is_sidebar_item=True, is_checked=is_active, is_settings_button=is_settings))
 
+        self.sidebar.active_category = self.current_category if self.current_filter == "category" else None
+        self.sidebar.update_category_button_styles()
+
     def get_num_columns(self):
 
 
@@ -2420,6 +3215,7 @@ class MainWindow(QMainWindow):
         num_cols = max(1, container_width // card_min_width)
         return num_cols
 
+    @spans.timed("display_filtered_notes")
     def display_filtered_notes(self):
 
 
@@ -2429,6 +3225,9 @@ class MainWindow(QMainWindow):
         elif self.current_filter == "recycle_bin":
             self.temp_notes_explanation_label.setVisible(True)
             self.temp_notes_explanation_label.setText("Notes in the recycle bin will be permanently deleted after 30 days.")
+        elif self.current_filter == "synced_notes":
+            self.temp_notes_explanation_label.setVisible(True)
+            self.temp_notes_explanation_label.setText(self.sync_status_text())
         else:
             self.temp_notes_explanation_label.setVisible(False)
 
@@ -2436,18 +3235,7 @@ class MainWindow(QMainWindow):
         self.update_category_tag(self.current_category if self.current_filter == "category" else None)
 
 
-        active_notes_dict = {}
-        if self.current_filter == "home":
-            active_notes_dict = {k:v for k,v in self.notes.items() if not v.get("deleted", False)}
-        elif self.current_filter == "favorites":
-            active_notes_dict = {k:v for k,v in self.notes.items() if v["favorite"] and not v.get("deleted", False)}
-        elif self.current_filter == "temporary_notes":
-            active_notes_dict = {k:v for k,v in self.notes.items() if v.get("temporary", False) and not v.get("deleted", False)}
-        elif self.current_filter == "recycle_bin":
-            active_notes_dict = {k:v for k,v in self.notes.items() if v.get("deleted", False)}
-        elif self.current_filter == "category" and self.current_category:
-            active_notes_dict = {k:v for k,v in self.notes.items()
-                               if v.get("category") == self.current_category and not v.get("deleted", False)}
+        active_notes_dict = dict(self.store.filter_notes(self.current_filter, self.current_category))
 
 
         while self.notes_layout.count():
@@ -2468,29 +3256,36 @@ class MainWindow(QMainWindow):
                 create_hint.setFont(QFont("San Francisco", 13))
                 create_hint.setStyleSheet(f"color: {current_theme_colors['TEXT_TERTIARY']}; margin-top: 5px;")
                 empty_layout.addWidget(create_hint)
+            elif self.current_filter == "synced_notes":
+                create_hint = QLabel("Notes show up here once they match the copy in your sync folder.")
+                create_hint.setFont(QFont("San Francisco", 13))
+                create_hint.setStyleSheet(f"color: {current_theme_colors['TEXT_TERTIARY']}; margin-top: 5px;")
+                empty_layout.addWidget(create_hint)
             elif self.current_filter == "category":
                 create_hint = QLabel(f"No notes in the '{self.current_category}' category. Create a new note or drag existing notes here.")
                 create_hint.setFont(QFont("San Francisco", 13))
                 create_hint.setStyleSheet(f"color: {current_theme_colors['TEXT_TERTIARY']}; margin-top: 5px;")
                 create_hint.setWordWrap(True)
                 empty_layout.addWidget(create_hint)
-            elif self.current_filter != "favorites":
+            elif self.current_filter not in ("favorites", "synced_notes"):
                 create_hint = QLabel("Click 'Create Note' to add a new one.")
                 create_hint.setFont(QFont("San Francisco", 13))
                 create_hint.setStyleSheet(f"color: {current_theme_colors['TEXT_TERTIARY']}; margin-top: 5px;")
                 empty_layout.addWidget(create_hint)
             empty_layout.addStretch()
-            self.notes_layout.addWidget(empty_widget, 0, 0, 1, self.get_num_columns())
+            self.notes_layout_columns = self.get_num_columns()
+            self.notes_layout.addWidget(empty_widget, 0, 0, 1, self.notes_layout_columns)
             return
 
         sorted_notes = sorted(active_notes_dict.items(), key=lambda item: item[1]['updated_at'], reverse=True)
         num_columns = self.get_num_columns()
+        self.notes_layout_columns = num_columns
         row, col = 0, 0
         for note_id, note_data in sorted_notes:
             if self.current_filter == "recycle_bin":
 
                 note_widget = RecycleBinNoteWidget(
-                    note_id, note_data["title"], note_data["content"],
+                    note_id, note_data["title"], self.get_note_preview(note_id),
                     note_data["favorite"], note_data.get("temporary", False),
                     note_data["created_at"], note_data["updated_at"],
                     note_data.get("deleted_at", ""),
@@ -2500,7 +3295,7 @@ class MainWindow(QMainWindow):
                 )
             else:
                 note_widget = NoteWidget(
-                    note_id, note_data["title"], note_data["content"],
+                    note_id, note_data["title"], self.get_note_preview(note_id),
                     note_data["favorite"], note_data.get("temporary", False),
                     note_data["created_at"],  note_data["updated_at"],
                     category=note_data.get("category", "Uncategorized"),
@@ -2522,17 +3317,8 @@ class MainWindow(QMainWindow):
 
     def change_note_category(self, note_id, new_category):
         """Change the category of a note"""
-        if note_id in self.notes:
-
-            self.notes[note_id]["category"] = new_category
-
-
-            if new_category not in self.categories and new_category != "Uncategorized":
-                self.categories.append(new_category)
-                self.categories.sort()
-
-
-            self.save_notes()
+        if self.record_note_change(f"Move to '{new_category}'", note_id,
+                                   lambda: self.store.set_category(note_id, new_category)):
             self.load_categories()
 
 
@@ -2576,44 +3362,99 @@ class MainWindow(QMainWindow):
 
         super().resizeEvent(event)
 
-        QTimer.singleShot(100, self.display_filtered_notes)
+        QTimer.singleShot(100, self.relayout_notes)
 
 
-        if hasattr(self, 'buddy_companion'):
+        if getattr(self, 'buddy_companion', None) is not None:
             self.buddy_companion.reposition()
 
+    def relayout_notes(self):
+        """Rebuild the grid after a resize only when the number of columns changed"""
+        if self.initial_notes_populated and self.get_num_columns() != self.notes_layout_columns:
+            self.display_filtered_notes()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_frame_painted:
+            self.first_frame_painted = True
+            startup_profiler.mark("first frame")
+            QTimer.singleShot(0, self.populate_initial_notes)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        QTimer.singleShot(200, self.populate_initial_notes)
+
+    def populate_initial_notes(self):
+        """Fill the notes grid once the window has been shown, so it does not delay the first frame"""
+        if self.initial_notes_populated:
+            return
+        self.initial_notes_populated = True
+        self.display_filtered_notes()
+        startup_profiler.mark("populate notes grid")
+        self.heartbeat_timer.start(100)
+        self.stall_watchdog.start()
+        if self.store.sync_folder:
+            QTimer.singleShot(2000, self.start_sync)
+        QTimer.singleShot(300, self.offer_drafts)
+        startup_profiler.report()
+        if "--quit-after-startup" in sys.argv:
+            QTimer.singleShot(0, QApplication.instance().quit)
+
     def closeEvent(self, event):
+        for worker in (self.import_worker, self.export_worker):
+            if worker is not None:
+                worker.cancel()
+                worker.wait()
+        if self.sync_worker is not None:
+            self.sync_worker.wait()
+        if self.active_popup is not None and self.active_popup.isVisible() and self.active_popup.autosaver is not None:
+            self.active_popup.autosaver.save_now()
+        self.drafts.close()
+        self.sync_timer.stop()
         self.live_countdown_timer.stop()
         self.amogus_timer.stop()
+        self.heartbeat_timer.stop()
+        self.stall_watchdog.stop()
         self.check_expired_notes()
         self.save_notes()
+        self.store.close()
         super().closeEvent(event)
 
+    def read_saved_settings(self):
+        """The settings saved in SETTINGS_FILE, or {} if there are none or they cannot be read"""
+        if os.path.exists(SETTINGS_FILE):
+            try:
+                with open(SETTINGS_FILE, 'r') as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                print(f"Error decoding {SETTINGS_FILE}. Using default settings.")
+        return {}
+
     def load_settings_and_apply_theme(self):
         global current_user_accent_color, current_theme_name, current_theme_colors, enable_amogus_jokes, current_buddy
         settings = {
             "accent_color": DEFAULT_ACCENT_COLOR,
             "theme": DEFAULT_THEME,
             "amogus_jokes": DEFAULT_AMOGUS_JOKES,
-            "buddy": DEFAULT_BUDDY
+            "buddy": DEFAULT_BUDDY,
+            "diagnostics": DEFAULT_DIAGNOSTICS,
+            "stall_threshold_ms": DEFAULT_STALL_THRESHOLD_MS,
+            "sync_folder": DEFAULT_SYNC_FOLDER
         }
 
-        if os.path.exists(SETTINGS_FILE):
-            try:
-                with open(SETTINGS_FILE, 'r') as f:
-                    loaded_settings = json.load(f)
-
-                    if loaded_settings.get("theme") == "auto":
-                        loaded_settings["theme"] = DEFAULT_THEME
-                    settings.update(loaded_settings)
-            except json.JSONDecodeError:
-                print(f"Error decoding {SETTINGS_FILE}. Using default settings.")
+        loaded_settings = self.read_saved_settings()
+        if loaded_settings.get("theme") == "auto":
+            loaded_settings["theme"] = DEFAULT_THEME
+        settings.update(loaded_settings)
 
 
         current_user_accent_color = settings.get("accent_color", DEFAULT_ACCENT_COLOR)
         current_theme_name = settings.get("theme", DEFAULT_THEME)
         enable_amogus_jokes = settings.get("amogus_jokes", DEFAULT_AMOGUS_JOKES)
         current_buddy = settings.get("buddy", DEFAULT_BUDDY)
+        spans.enabled = bool(settings.get("diagnostics", DEFAULT_DIAGNOSTICS))
+        self.stall_watchdog.threshold_ms = settings.get("stall_threshold_ms", DEFAULT_STALL_THRESHOLD_MS)
+        self.set_sync_folder(settings.get("sync_folder", DEFAULT_SYNC_FOLDER))
 
 
         current_theme_colors = THEMES.get(current_theme_name, THEMES["light"])
@@ -2622,7 +3463,9 @@ class MainWindow(QMainWindow):
         self.apply_theme()
 
 
-        if hasattr(self, 'buddy_companion'):
+        if current_buddy and self.buddy_companion is None:
+            self.buddy_companion = AmogusCompanion(self.main_widget)
+        if self.buddy_companion is not None:
             self.buddy_companion.set_buddy(current_buddy)
 
 
@@ -2649,6 +3492,7 @@ class MainWindow(QMainWindow):
         except IOError:
             QMessageBox.critical(self, "Settings Error", f"Could not save to {SETTINGS_FILE}.")
 
+    @spans.timed("apply_theme")
     def apply_theme(self):
         global current_theme_colors
         print(f"Applying theme: {current_theme_name}, Accent: {current_user_accent_color}")
@@ -2677,12 +3521,14 @@ class MainWindow(QMainWindow):
             self.sidebar.apply_styles()
 
 
-        if hasattr(self, 'settings_view'):
+        if self.settings_view is not None:
             self.settings_view.apply_styles()
 
 
-        if hasattr(self, 'buddy_companion') and hasattr(self.buddy_companion, 'chat_window') and self.buddy_companion.chat_window:
+        if self.buddy_companion is not None and self.buddy_companion.chat_window:
             self.buddy_companion.chat_window.apply_styles()
+        if self.chat_window is not None:
+            self.chat_window.apply_styles()
 
 
         self.update_visible_note_widget_styles()
@@ -2703,14 +3549,80 @@ class MainWindow(QMainWindow):
                 widget.apply_styles()
 
 
+    def memory_report(self):
+        """Memory held by the notes store, live widgets, label pixmaps and stylesheets, plus tracemalloc totals"""
+        all_widgets = QApplication.allWidgets()
+        widget_counts = {}
+        pixmap_count = pixmap_bytes = 0
+        styled_widgets = stylesheet_bytes = 0
+        unique_stylesheets = set()
+        for widget in all_widgets:
+            class_name = type(widget).__name__
+            widget_counts[class_name] = widget_counts.get(class_name, 0) + 1
+            if isinstance(widget, QLabel):
+                pixmap = widget.pixmap()
+                if pixmap is not None and not pixmap.isNull():
+                    pixmap_count += 1
+                    pixmap_bytes += pixmap.width() * pixmap.height() * pixmap.depth() // 8
+            stylesheet = widget.styleSheet()
+            if stylesheet:
+                styled_widgets += 1
+                stylesheet_bytes += len(stylesheet.encode("utf-8"))
+                unique_stylesheets.add(stylesheet)
+
+        grid_widgets = [self.notes_layout.itemAt(i).widget() for i in range(self.notes_layout.count())]
+        chat_window = self.buddy_companion.chat_window if self.buddy_companion is not None else self.chat_window
+        data_path = self.body_store.data_path
+
+        return {
+            "notes_store": {
+                "notes": len(self.notes),
+                "metadata_bytes": deep_sizeof(self.notes),
+                "body_index_bytes": deep_sizeof(self.body_store.index),
+                "body_file_bytes": os.path.getsize(data_path) if os.path.exists(data_path) else 0,
+                "category_index_bytes": deep_sizeof(self.category_index.members),
+                "undo_stack_bytes": deep_sizeof(self.store.undo_stack),
+                "redo_stack_bytes": deep_sizeof(self.store.redo_stack)
+            },
+            "widgets": {
+                "total": len(all_widgets),
+                "note_widgets": widget_counts.get("NoteWidget", 0) + widget_counts.get("RecycleBinNoteWidget", 0),
+                "note_widgets_in_grid": sum(1 for w in grid_widgets if isinstance(w, (NoteWidget, RecycleBinNoteWidget))),
+                "hidden_top_level": sum(1 for w in QApplication.topLevelWidgets() if not w.isVisible()),
+                "by_class": dict(sorted(widget_counts.items(), key=lambda item: -item[1]))
+            },
+            "chat": {
+                "messages": chat_window.chat_layout.count() if chat_window else 0,
+                "widgets": len(chat_window.findChildren(QWidget)) if chat_window else 0
+            },
+            "pixmaps": {"count": pixmap_count, "bytes": pixmap_bytes},
+            "stylesheets": {"widgets": styled_widgets, "bytes": stylesheet_bytes, "unique": len(unique_stylesheets)},
+            "python_heap": traced_memory_by_file()
+        }
+
     def show_notes_view(self):
         self.stacked_content_widget.setCurrentWidget(self.notes_page_widget)
 
+    def ensure_settings_view(self):
+        """Build the settings page (and its buddy thumbnails) the first time it is needed"""
+        if self.settings_view is None:
+            self.settings_view = SettingsView(self)
+            self.stacked_content_widget.addWidget(self.settings_view)
+        return self.settings_view
+
     def show_settings_view(self):
-        self.stacked_content_widget.setCurrentWidget(self.settings_view)
+        self.stacked_content_widget.setCurrentWidget(self.ensure_settings_view())
         self.current_filter = "settings"
         self.update_active_nav_button()
 
+    def toggle_diagnostics_page(self):
+        """Show or hide the hidden Diagnostics section at the bottom of the settings page"""
+        settings_view = self.ensure_settings_view()
+        settings_view.set_diagnostics_visible(not settings_view.diagnostics_visible)
+        if settings_view.diagnostics_visible:
+            self.show_settings_view()
+            settings_view.scroll_area.ensureWidgetVisible(settings_view.diagnostics_container)
+
     def show_recycle_bin(self):
         self.show_notes_view()
         self.current_filter = "recycle_bin"
@@ -2720,6 +3632,116 @@ class MainWindow(QMainWindow):
         self.display_filtered_notes()
         self.update_active_nav_button()
 
+    def show_synced_notes(self):
+        self.show_notes_view()
+        self.current_filter = "synced_notes"
+        self.section_title.setText("Synced Notes")
+        self.display_filtered_notes()
+        self.update_active_nav_button()
+        if not self.store.sync_folder:
+            self.choose_sync_folder()
+        else:
+            self.start_sync()
+
+    def choose_sync_folder(self):
+        """Pick the folder (a local directory or mounted share) to sync with; every replica should pick the same one"""
+        current = self.store.sync_folder if not is_server_url(self.store.sync_folder or "") else None
+        folder = QFileDialog.getExistingDirectory(self, "Choose Sync Folder", current or str(Path.home()))
+        if not folder:
+            return
+        self.save_settings({"sync_folder": folder})
+        self.set_sync_folder(folder)
+        self.start_sync()
+
+    def choose_sync_server(self):
+        """Sync with a notes_sync_server instead of a folder; the URL may carry ?token=..."""
+        current = self.store.sync_folder if is_server_url(self.store.sync_folder or "") else "http://"
+        url, ok = QInputDialog.getText(self, "Sync Server", "Server address (http://host:8765/?token=...):",
+                                       QLineEdit.EchoMode.Normal, current)
+        url = url.strip()
+        if not ok or not url:
+            return
+        if not is_server_url(url):
+            QMessageBox.warning(self, "Sync Server", "The address must start with http:// or https://.")
+            return
+        self.save_settings({"sync_folder": url})
+        self.set_sync_folder(url)
+        self.start_sync()
+
+    def set_sync_folder(self, folder):
+        """folder is a directory or a server URL; a URL keeps its ?token=..., which is only stored in settings"""
+        if not folder:
+            self.store.sync_folder = self.store.sync_key = None
+        else:
+            self.store.sync_folder = folder if is_server_url(folder) else sync_key(folder)
+            self.store.sync_key = sync_key(folder)
+        if self.store.sync_folder:
+            self.sync_timer.start()
+        else:
+            self.sync_timer.stop()
+
+    def sync_status_text(self):
+        if not self.store.sync_folder:
+            return "Choose a sync folder to keep your notes in step with your other computers."
+        return self.sync_status or f"Syncing with {display_location(self.store.sync_folder)}."
+
+    def set_sync_status(self, text):
+        self.sync_status = text
+        if self.current_filter == "synced_notes":
+            self.temp_notes_explanation_label.setText(self.sync_status_text())
+
+    def start_sync(self):
+        """Sync with the sync folder: folder I/O runs on worker threads, merging into the store on this one"""
+        if self.sync_worker is not None or not self.store.sync_folder:
+            return
+        engine = SyncEngine(self.store, self.store.sync_folder)
+        local, base = engine.local_state(), engine.base()
+        self.set_sync_status(f"Syncing with {display_location(self.store.sync_folder)}...")
+        self.run_sync_step(lambda: engine.fetch(local, base), lambda fetched: self.apply_sync(engine, fetched))
+
+    def run_sync_step(self, func, on_done):
+        self.sync_worker = BackgroundCall(func, self)
+        self.sync_worker.finished.connect(lambda: self.finish_sync_step(on_done))
+        self.sync_worker.start()
+
+    def finish_sync_step(self, on_done):
+        worker = self.sync_worker
+        self.sync_worker = None
+        worker.deleteLater()
+        if worker.error:
+            self.set_sync_status(f"Sync failed: {worker.error}")
+            print(f"Sync with {display_location(self.store.sync_folder)} failed: {worker.error}")
+            return
+        on_done(worker.result)
+
+    def apply_sync(self, engine, fetched):
+        try:
+            outgoing = engine.apply(fetched)
+        except OSError as e:
+            self.set_sync_status(f"Sync failed: {e}")
+            QMessageBox.critical(self, "Sync Error", f"Could not save the synced notes: {e}")
+            return
+        stats = outgoing["stats"]
+        if stats["pulled"] or stats["deleted"] or stats["conflicts"]:
+            self.load_categories()
+            self.display_filtered_notes()
+        self.run_sync_step(lambda: engine.publish(outgoing), lambda published: self.finish_sync(engine, published))
+
+    def finish_sync(self, engine, outgoing):
+        try:
+            stats = engine.finish(outgoing)
+        except OSError as e:
+            self.set_sync_status(f"Sync failed: {e}")
+            return
+        self.set_sync_status(f"Last synced {datetime.now():%H:%M} with {display_location(self.store.sync_folder)}: "
+                             f"{stats['pulled']} received, {stats['pushed']} sent, {stats['deleted']} deleted.")
+        if self.current_filter == "synced_notes":
+            self.display_filtered_notes()
+        if stats["conflicts"]:
+            QMessageBox.warning(self, "Sync Conflicts",
+                                "These notes were changed on more than one computer. The newest version was kept "
+                                "and the other saved as a conflicted copy:\n\n" + "\n".join(stats["conflicts"][:10]))
+
     def set_random_amogus_interval(self):
 
         interval = random.randint(10 * 60 * 1000, 60 * 60 * 1000)
@@ -2730,19 +3752,9 @@ class MainWindow(QMainWindow):
         if enable_amogus_jokes and random.random() < 0.2:
 
             joke = random.choice(AMOGUS_JOKES)
-            note_id = self.generate_note_id()
-            created_at = datetime.now().isoformat()
-
-            self.notes[note_id] = {
-                "title": joke["title"],
-                "content": joke["content"],
-                "created_at": created_at,
-                "updated_at": created_at,
-                "category": "Amogus",
-                "favorite": False,
-                "temporary": True
-            }
+            self.store.add_or_update(title=joke["title"], content=joke["content"], is_temporary=True, category="Amogus")
             self.save_notes()
+            self.load_categories()
 
 
             if self.current_filter in ["home", "temporary_notes"]:
@@ -2780,6 +3792,41 @@ class MainWindow(QMainWindow):
         self.set_random_amogus_interval()
         self.amogus_timer.start()
 
+    def handle_instance_command(self, args):
+        """Bring the window forward and act on launch arguments such as 'new [title]' or 'search <terms>'"""
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
+        if not args:
+            return
+
+        command, rest = args[0].lower(), list(args[1:])
+        if command == "new":
+            if rest and rest[0].lower() == "note":
+                rest = rest[1:]
+            self.show_all_notes()
+            self.create_new_note_popup(title=" ".join(rest))
+        elif command == "search" and rest:
+            chat_window = self.open_buddy_chat()
+            chat_window.search_notes_action(" ".join(rest))
+        else:
+            print(f"Ignoring unknown launch command: {' '.join(args)}")
+
+    def open_buddy_chat(self):
+        """Show the buddy chat, creating it even when no buddy sits in the corner"""
+        if self.buddy_companion is not None:
+            if not self.buddy_companion.chat_window:
+                self.buddy_companion.chat_window = AmogusBuddyChat(self)
+            chat_window = self.buddy_companion.chat_window
+        else:
+            if self.chat_window is None:
+                self.chat_window = AmogusBuddyChat(self)
+            chat_window = self.chat_window
+        chat_window.show()
+        chat_window.raise_()
+        return chat_window
+
     def show_chat_view(self):
         """Show the chat view in the main window"""
         self.stacked_content_widget.setCurrentWidget(self.chat_view)
@@ -2954,12 +4001,266 @@ class RecycleBinNoteWidget(QWidget):
 
     def _handle_permanent_delete(self):
         reply = QMessageBox.question(self, 'Permanently Delete',
-                                     f"Permanently delete '{self.title_text or 'Untitled'}'? This cannot be undone.",
+                                     f"Permanently delete '{self.title_text or 'Untitled'}'? Ctrl+Z undoes this.",
                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
                                      QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
             self.on_permanent_delete()
 
+BUDDY_THUMBNAIL_SIZE = 70
+BUDDY_COMPANION_SIZE = 100
+BUDDY_IMAGE_SIZES = (BUDDY_THUMBNAIL_SIZE, BUDDY_COMPANION_SIZE)
+BUDDY_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.svg', '.gif', '.webp')
+BUDDY_BUTTON_BATCH = 24
+
+
+def decode_buddy_variants(path, sizes=BUDDY_IMAGE_SIZES):
+    """Decode a buddy image once and return {size: QImage} scaled to fit size x size; safe off the GUI thread"""
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    image = reader.read()
+    if image.isNull():
+        print(f"Error: Failed to load buddy image {path}: {reader.errorString()}")
+        return {}
+    return {size: image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+            for size in sizes}
+
+
+def buddy_thumbnail_path(path, mtime_ns, size):
+    digest = hashlib.sha1(str(path).encode("utf-8")).hexdigest()[:16]
+    return BUDDY_THUMBS_FOLDER / f"{digest}-{mtime_ns}-{size}.png"
+
+
+def load_buddy_variants(path, mtime_ns, sizes=BUDDY_IMAGE_SIZES):
+    """Return {size: QImage} from the persisted thumbnails, decoding path and saving them when missing; safe off the GUI thread"""
+    thumbnail_paths = {size: buddy_thumbnail_path(path, mtime_ns, size) for size in sizes}
+    variants = {}
+    for size, thumbnail_path in thumbnail_paths.items():
+        image = QImage(str(thumbnail_path)) if thumbnail_path.exists() else QImage()
+        if image.isNull():
+            break
+        variants[size] = image
+    else:
+        return variants
+
+    variants = decode_buddy_variants(path, sizes)
+    try:
+        BUDDY_THUMBS_FOLDER.mkdir(parents=True, exist_ok=True)
+        for size, image in variants.items():
+            image.save(str(thumbnail_paths[size]), "PNG")
+    except OSError as e:
+        print(f"Could not save buddy thumbnails to {BUDDY_THUMBS_FOLDER}: {e}")
+    return variants
+
+
+def scan_buddy_folder():
+    """Sorted buddy image file names, with thumbnails of removed or changed files pruned; safe off the GUI thread"""
+    if not BUDDIES_FOLDER.is_dir():
+        return []
+    files = []
+    keep = set()
+    with os.scandir(BUDDIES_FOLDER) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(BUDDY_IMAGE_EXTENSIONS):
+                files.append(entry.name)
+                mtime_ns = entry.stat().st_mtime_ns
+                keep.update(buddy_thumbnail_path(entry.path, mtime_ns, size).name for size in BUDDY_IMAGE_SIZES)
+
+    if BUDDY_THUMBS_FOLDER.is_dir():
+        for thumbnail in BUDDY_THUMBS_FOLDER.iterdir():
+            if thumbnail.name not in keep:
+                try:
+                    thumbnail.unlink()
+                except OSError:
+                    pass
+    return sorted(files)
+
+
+class NotesImportWorker(QThread):
+    """Parses a folder of note files in a process pool; the GUI thread commits each batch it emits"""
+    batch_parsed = pyqtSignal(object)
+
+    def __init__(self, folder, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+        self.cancelled = False
+        self.error = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        batches = parse_batches(self.folder)
+        try:
+            for records in batches:
+                if self.cancelled:
+                    break
+                self.batch_parsed.emit(records)
+        except (OSError, RuntimeError) as e:
+            self.error = str(e)
+        finally:
+            batches.close()
+
+
+class BackgroundCall(QThread):
+    """Runs one function on a worker thread; read result or error once finished is emitted"""
+
+    def __init__(self, func, parent=None):
+        super().__init__(parent)
+        self.func = func
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = self.func()
+        except (OSError, ValueError, KeyError) as e:
+            self.error = str(e)
+
+
+class NotesExportWorker(QThread):
+    """Writes an export snapshot on a worker thread, reading one note body at a time"""
+    progress = pyqtSignal(int, int)
+
+    def __init__(self, fmt, data_path, items, destination, parent=None):
+        super().__init__(parent)
+        self.fmt = fmt
+        self.data_path = data_path
+        self.items = items
+        self.destination = destination
+        self.cancelled = False
+        self.count = 0
+        self.error = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            self.count = write_export(self.fmt, self.data_path, self.items, self.destination,
+                                      self.progress.emit, lambda: self.cancelled)
+        except ExportCancelled:
+            pass
+        except (OSError, UnicodeDecodeError) as e:
+            self.error = str(e)
+
+
+class BuddyImageSignals(QObject):
+    loaded = pyqtSignal(str, str, object)
+    scanned = pyqtSignal(object, object)
+
+
+class BuddyImageJob(QRunnable):
+    def __init__(self, path, mtime_ns, key_base, signals):
+        super().__init__()
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.key_base = key_base
+        self.signals = signals
+
+    def run(self):
+        self.signals.loaded.emit(self.path, self.key_base, load_buddy_variants(self.path, self.mtime_ns))
+
+
+class BuddyFolderScanJob(QRunnable):
+    def __init__(self, callback, signals):
+        super().__init__()
+        self.callback = callback
+        self.signals = signals
+
+    def run(self):
+        self.signals.scanned.emit(self.callback, scan_buddy_folder())
+
+
+class BuddyImageService:
+    """
+    Buddy pixmaps in QPixmapCache, keyed by (path, mtime, size). Every decode
+    produces all BUDDY_IMAGE_SIZES variants at once and persists them under
+    BUDDY_THUMBS_FOLDER; request() and scan_folder() work on a thread pool and
+    call back on the GUI thread.
+    """
+
+    def __init__(self):
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(max(1, min(4, QThreadPool.globalInstance().maxThreadCount())))
+        self.signals = BuddyImageSignals()
+        self.signals.loaded.connect(self._handle_loaded)
+        self.signals.scanned.connect(self._handle_scanned)
+        self.pending = {}
+        QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), 20 * 1024))
+
+    def stamp(self, path):
+        """(cache key base, mtime_ns) for path, or (None, None) when it does not exist"""
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None, None
+        return f"buddy|{path}|{mtime_ns}", mtime_ns
+
+    def cached(self, key_base, size):
+        pixmap = QPixmapCache.find(f"{key_base}|{size}")
+        return pixmap if pixmap is not None and not pixmap.isNull() else None
+
+    def store(self, key_base, variants):
+        for size, image in variants.items():
+            QPixmapCache.insert(f"{key_base}|{size}", QPixmap.fromImage(image))
+
+    def pixmap(self, path, size):
+        """Return the scaled pixmap for path, decoding it on the calling (GUI) thread on a cache miss"""
+        path = str(path)
+        key_base, mtime_ns = self.stamp(path)
+        if key_base is None:
+            return None
+        pixmap = self.cached(key_base, size)
+        if pixmap is None:
+            self.store(key_base, load_buddy_variants(path, mtime_ns))
+            pixmap = self.cached(key_base, size)
+        return pixmap
+
+    def request(self, path, size, callback):
+        """Call callback(pixmap or None) with the scaled pixmap; cache misses are decoded in the background"""
+        path = str(path)
+        key_base, mtime_ns = self.stamp(path)
+        if key_base is None:
+            callback(None)
+            return
+        pixmap = self.cached(key_base, size)
+        if pixmap is not None:
+            callback(pixmap)
+            return
+        waiting = self.pending.get(key_base)
+        if waiting is None:
+            waiting = self.pending[key_base] = []
+            self.thread_pool.start(BuddyImageJob(path, mtime_ns, key_base, self.signals))
+        waiting.append((size, callback))
+
+    def scan_folder(self, callback):
+        """Call callback(file_names) with the buddy images found in BUDDIES_FOLDER, scanned in the background"""
+        self.thread_pool.start(BuddyFolderScanJob(callback, self.signals))
+
+    def _handle_scanned(self, callback, files):
+        callback(files)
+
+    def _handle_loaded(self, path, key_base, variants):
+        self.store(key_base, variants)
+        for size, callback in self.pending.pop(key_base, []):
+            try:
+                callback(self.cached(key_base, size))
+            except RuntimeError:
+                # The widget that asked for this image was deleted while it was decoding
+                pass
+
+
+_buddy_images = None
+
+
+def get_buddy_images():
+    global _buddy_images
+    if _buddy_images is None:
+        _buddy_images = BuddyImageService()
+    return _buddy_images
+
+
 class AmogusCompanion(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -3016,9 +4317,8 @@ class AmogusCompanion(QWidget):
             self.setVisible(False)
             return
 
-        pixmap = QPixmap(str(buddy_path))
-        if pixmap.isNull():
-            print(f"Error: Failed to load buddy image {buddy_path}")
+        pixmap = get_buddy_images().pixmap(buddy_path, BUDDY_COMPANION_SIZE)
+        if pixmap is None:
             self.setVisible(False)
             return
 
@@ -3175,7 +4475,7 @@ class AmogusBuddyChat(QWidget):
 
     def showEvent(self, event):
 
-        if self.parent_window and hasattr(self.parent_window, 'buddy_companion'):
+        if self.parent_window and getattr(self.parent_window, 'buddy_companion', None) is not None:
             buddy = self.parent_window.buddy_companion
             if buddy.isVisible():
 
@@ -3420,18 +4720,17 @@ class AmogusBuddyChat(QWidget):
             print(f"Web search error: {e}")
             self.add_message("😕 Sorry, I had trouble searching the web. Please try again later.", is_success=True)
 
+    @spans.timed("web_search")
     def web_search(self, query):
         """Helper function to perform web search using DuckDuckGo as a reliable alternative"""
         try:
-            import os
-            import requests
-            from bs4 import BeautifulSoup
             import tempfile
+            requests, BeautifulSoup = load_web_stack()
 
             print(f"[DEBUG] Performing search for: {query}")
 
 
-            ddg_url = f"https://html.duckduckgo.com/html/?q={requests.utils.quote(query)}"
+            ddg_url = f"https://html.duckduckgo.com/html/?q={quote(query)}"
             headers = {
                 "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36",
                 "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
@@ -3536,7 +4835,7 @@ class AmogusBuddyChat(QWidget):
                 print("[DEBUG] No useful results found, using fallback")
                 search_results = [{
                     'title': f"Search Results for: {query}",
-                    'link': f"https://duckduckgo.com/?q={requests.utils.quote(query)}",
+                    'link': f"https://duckduckgo.com/?q={quote(query)}",
                     'snippet': f"Sorry, I couldn't find detailed results for '{query}'. You can try searching online directly."
                 }]
 
@@ -3549,16 +4848,17 @@ class AmogusBuddyChat(QWidget):
             traceback.print_exc()
             return [{
                 'title': f"Search Results for: {query}",
-                'link': f"https://duckduckgo.com/?q={requests.utils.quote(query)}",
+                'link': f"https://duckduckgo.com/?q={quote(query)}",
                 'snippet': f"Sorry, I encountered an error while searching. You can try searching online directly."
             }]
 
+    @spans.timed("wikipedia_search_action")
     def wikipedia_search_action(self, search_terms):
         """Search Wikipedia and display results with a copy button"""
         self.add_message(f"🔍 Searching Wikipedia for '{search_terms}'...", is_loading=True)
 
         try:
-            import requests
+            requests, _ = load_web_stack()
 
 
             simple_url = f"https://simple.wikipedia.org/w/api.php"
@@ -3772,7 +5072,8 @@ class AmogusBuddyChat(QWidget):
 
 
             title = note_data.get("title", "Untitled")
-            preview = note_data.get("content", "")[:50] + "..." if len(note_data.get("content", "")) > 50 else note_data.get("content", "")
+            preview_text = self.parent_window.get_note_preview(note_id, 51)
+            preview = preview_text[:50] + "..." if len(preview_text) > 50 else preview_text
 
 
             if note_data.get("favorite", False):
@@ -3963,21 +5264,7 @@ class AmogusBuddyChat(QWidget):
         self.add_message(f"🔍 Searching for '{search_terms}'...", is_loading=True)
 
 
-        matching_notes = {}
-        for note_id, note_data in self.parent_window.notes.items():
-            if note_data.get("deleted", False):
-                continue
-
-            title = note_data.get("title", "").lower()
-            content = note_data.get("content", "").lower()
-
-
-            for term in search_terms.split():
-                if term in title or term in content:
-                    matching_notes[note_id] = note_data
-                    break
-
-
+        matching_notes = self.parent_window.store.search(search_terms)
         if matching_notes:
             self.add_message(f"✨ Here are the notes I found matching '{search_terms}':",
                            is_success=True, include_notes=matching_notes)
@@ -4015,7 +5302,8 @@ class AmogusBuddyChat(QWidget):
 
 
             title = note_data.get("title", "Untitled")
-            preview = note_data.get("content", "")[:50] + "..." if len(note_data.get("content", "")) > 50 else note_data.get("content", "")
+            preview_text = self.parent_window.get_note_preview(note_id, 51)
+            preview = preview_text[:50] + "..." if len(preview_text) > 50 else preview_text
 
 
             if note_data.get("favorite", False):
@@ -4137,22 +5425,11 @@ class BuddySelectionButton(QPushButton):
 
 
         if buddy_file:
-            buddy_path = BUDDIES_FOLDER / buddy_file
-            if os.path.exists(buddy_path):
-                pixmap = QPixmap(str(buddy_path))
-                if not pixmap.isNull():
-                    scaled_pixmap = pixmap.scaled(70, 70, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                    self.image_container.setPixmap(scaled_pixmap)
+            self.set_placeholder("…")
+            get_buddy_images().request(BUDDIES_FOLDER / buddy_file, BUDDY_THUMBNAIL_SIZE, self.set_thumbnail)
 
         else:
-            self.image_container.setText("❌")
-            self.image_container.setStyleSheet(f"""
-                QLabel {{
-                    color: {current_theme_colors['TEXT_SECONDARY']};
-                    font-size: 24px;
-                    background: transparent;
-                }}
-            """)
+            self.set_placeholder("❌")
 
         layout.addWidget(self.image_container)
 
@@ -4214,6 +5491,23 @@ class BuddySelectionButton(QPushButton):
             }}
         """)
 
+    def set_placeholder(self, text):
+        self.image_container.setText(text)
+        self.image_container.setStyleSheet(f"""
+            QLabel {{
+                color: {current_theme_colors['TEXT_SECONDARY']};
+                font-size: 24px;
+                background: transparent;
+            }}
+        """)
+
+    def set_thumbnail(self, pixmap):
+        if pixmap is None:
+            self.set_placeholder("?")
+            return
+        self.image_container.setStyleSheet("background: transparent;")
+        self.image_container.setPixmap(pixmap)
+
     def setSelected(self, selected):
         self.apply_styles()
 
@@ -4223,7 +5517,24 @@ def resource_path(relative_path):
     return os.path.abspath(relative_path)
 
 def main():
+    if "--profile-startup" in sys.argv:
+        sys.argv.remove("--profile-startup")
+        startup_profiler.enable()
+    if "--trace-memory" in sys.argv:
+        sys.argv.remove("--trace-memory")
+        start_memory_tracing()
+
+    launch_args = [arg for arg in sys.argv[1:] if not arg.startswith("-")]
+    single_instance = SingleInstance()
+    if not single_instance.acquire():
+        if single_instance.forward(launch_args):
+            sys.exit(0)
+        print(f"{APP_NAME} is already running but did not answer. If it crashed, remove {INSTANCE_LOCK_FILE}.")
+        sys.exit(1)
+
     app = QApplication(sys.argv)
+    single_instance.listen()
+    startup_profiler.mark("create QApplication")
     app.setWindowIcon(QtGui.QIcon(resource_path('images/Amogus.ico')))
 
     window = MainWindow()
@@ -4231,7 +5542,14 @@ def main():
     
     app.processEvents() 
     window.show()
-    sys.exit(app.exec())
+    startup_profiler.mark("show window")
+    single_instance.set_handler(window.handle_instance_command)
+    if launch_args:
+        QTimer.singleShot(0, lambda: window.handle_instance_command(launch_args))
+    exit_code = app.exec()
+    single_instance.release()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,208 @@
+"""Command line access to the notes, without Qt: `amogos-notes cli <command>`."""
+import argparse
+import json
+import sys
+
+from notes_export import EXPORT_FORMATS, iter_note_bodies, snapshot_notes, write_export
+from notes_import import BATCH_SIZE, import_notes
+from notes_store import NotesStore, default_data_dir
+from notes_sync import SyncEngine, display_location
+
+VIEWS = {
+    "all": "home",
+    "favorites": "favorites",
+    "temporary": "temporary_notes",
+    "deleted": "recycle_bin"
+}
+
+
+def open_store(args):
+    store = NotesStore(args.data_dir or default_data_dir())
+    store.on_conflicts = lambda titles: print(f"Kept conflicted copies of: {', '.join(titles)}", file=sys.stderr)
+    if not store.load():
+        print(f"Could not read {store.notes_file}; refusing to touch a corrupted notes file.", file=sys.stderr)
+        return None
+    return store
+
+
+def note_record(note_id, note_data):
+    return {"id": note_id, **note_data}
+
+
+def print_notes(items, as_json):
+    if as_json:
+        print(json.dumps([note_record(note_id, note_data) for note_id, note_data in items], indent=2))
+        return
+    for note_id, note_data in items:
+        updated_at = (note_data.get("updated_at") or "")[:16].replace("T", " ")
+        category = note_data.get("category") or "Uncategorized"
+        flags = ("*" if note_data.get("favorite") else " ") + ("t" if note_data.get("temporary") else " ")
+        print(f"{note_id}  {updated_at:<16}  {flags}  {category:<16}  {note_data.get('title') or 'Untitled'}")
+
+
+def sorted_by_update(items):
+    return sorted(items, key=lambda item: item[1].get("updated_at") or "", reverse=True)
+
+
+def cmd_list(store, args):
+    view = "category" if args.category else VIEWS[args.view]
+    print_notes(sorted_by_update(store.filter_notes(view, args.category)), args.json)
+    return 0
+
+
+def cmd_add(store, args):
+    if args.file == "-":
+        content = sys.stdin.read()
+    elif args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            content = f.read()
+    else:
+        content = args.content or ""
+    if args.category:
+        store.ensure_category(args.category)
+    note_id = store.add_or_update(title=args.title, content=content, is_temporary=args.temporary,
+                                  category=args.category)
+    store.save()
+    print(note_id)
+    return 0
+
+
+def cmd_search(store, args):
+    matches = store.search(" ".join(args.terms))
+    print_notes(sorted_by_update(matches.items()), args.json)
+    return 0 if matches else 1
+
+
+def cmd_export(store, args):
+    view = "category" if args.category else VIEWS[args.view]
+    data_path, items = snapshot_notes(store, view, args.category)
+    if args.include_deleted and view != "recycle_bin":
+        items += [item for item in snapshot_notes(store, "recycle_bin")[1]
+                  if not args.category or item[1].get("category") == args.category]
+
+    if args.format in ("json", "jsonl") and not args.output:
+        records = ({"id": note_id, **note_data, "content": content}
+                   for note_id, note_data, content in iter_note_bodies(data_path, items))
+        if args.format == "json":
+            json.dump(list(records), sys.stdout, indent=2, ensure_ascii=False)
+            print()
+        else:
+            for record in records:
+                print(json.dumps(record, ensure_ascii=False))
+        return 0
+    if not args.output:
+        print(f"--output is required for {args.format} exports", file=sys.stderr)
+        return 2
+
+    if args.format == "json":
+        records = [{"id": note_id, **note_data, "content": content}
+                   for note_id, note_data, content in iter_note_bodies(data_path, items)]
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2, ensure_ascii=False)
+        count = len(records)
+    else:
+        count = write_export(args.format, data_path, items, args.output)
+    print(f"Exported {count} notes to {args.output}", file=sys.stderr)
+    return 0
+
+
+def cmd_import(store, args):
+    def report(imported, failed):
+        print(f"\rImported {imported} notes ({failed} failed)", end="", file=sys.stderr, flush=True)
+
+    imported, failures = import_notes(store, args.directory, args.batch_size, args.workers, report)
+    print(file=sys.stderr)
+    for source, error in failures:
+        print(f"Skipped {source}: {error}", file=sys.stderr)
+    print(imported)
+    return 0 if not failures else 1
+
+
+def cmd_sync(store, args):
+    stats = SyncEngine(store, args.location).sync()
+    print(f"Received {stats['pulled']}, sent {stats['pushed']} and deleted {stats['deleted']} notes")
+    for title in stats["conflicts"]:
+        print(f"Conflict: kept both versions of {title}", file=sys.stderr)
+    if stats["missing"]:
+        print(f"{stats['missing']} notes could not be read from {display_location(args.location)}; "
+              "they will be retried next time", file=sys.stderr)
+    return 0
+
+
+def cmd_purge(store, args):
+    expired = store.expire()
+    emptied = 0
+    if args.empty_recycle_bin:
+        for note_id, _ in store.filter_notes("recycle_bin"):
+            store.delete_permanently(note_id)
+            emptied += 1
+    if expired or emptied:
+        store.save()
+    print(f"Removed {expired} expired notes and {emptied} notes from the recycle bin")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="amogos-notes cli", description="Work with AmogOS Notes without opening the window.")
+    parser.add_argument("--data-dir", help="notes data directory (default: ~/.amogosnotes_data)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="list notes, newest first")
+    list_parser.add_argument("--view", choices=sorted(VIEWS), default="all")
+    list_parser.add_argument("--category", help="only notes in this category")
+    list_parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    list_parser.set_defaults(handler=cmd_list)
+
+    add_parser = commands.add_parser("add", help="add a note and print its id")
+    add_parser.add_argument("title")
+    add_parser.add_argument("--content", help="note text")
+    add_parser.add_argument("--file", help="read the note text from a file, or - for stdin")
+    add_parser.add_argument("--category")
+    add_parser.add_argument("--temporary", action="store_true", help="delete the note automatically after 30 days")
+    add_parser.set_defaults(handler=cmd_add)
+
+    search_parser = commands.add_parser("search", help="find notes containing any of the terms")
+    search_parser.add_argument("terms", nargs="+")
+    search_parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    search_parser.set_defaults(handler=cmd_search)
+
+    export_parser = commands.add_parser("export", help="write notes with their text as JSON, JSON lines, Markdown files or a zip")
+    export_parser.add_argument("--format", choices=("json",) + EXPORT_FORMATS, default="json")
+    export_parser.add_argument("--output", "-o", help="file, or folder for markdown, to write (default: stdout)")
+    export_parser.add_argument("--view", choices=sorted(VIEWS), default="all")
+    export_parser.add_argument("--category", help="only notes in this category")
+    export_parser.add_argument("--include-deleted", action="store_true", help="include notes in the recycle bin")
+    export_parser.set_defaults(handler=cmd_export)
+
+    import_parser = commands.add_parser("import", help="import every .md, .markdown and .txt file under a directory")
+    import_parser.add_argument("directory")
+    import_parser.add_argument("--workers", type=int, help="parser processes (default: up to 8, 0 parses in this process)")
+    import_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="notes saved per batch")
+    import_parser.set_defaults(handler=cmd_import)
+
+    sync_parser = commands.add_parser("sync", help="two-way sync with a folder or sync server that other computers also use")
+    sync_parser.add_argument("location", help="local directory, mounted share, or http://host:port/?token=... of a notes_sync_server")
+    sync_parser.set_defaults(handler=cmd_sync)
+
+    purge_parser = commands.add_parser("purge", help="delete expired temporary and recycle bin notes")
+    purge_parser.add_argument("--empty-recycle-bin", action="store_true", help="also delete everything in the recycle bin")
+    purge_parser.set_defaults(handler=cmd_purge)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store = open_store(args)
+    if store is None:
+        return 1
+    try:
+        return args.handler(store, args)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Streaming export of notes to Markdown files, JSON lines or a zip archive, without Qt."""
+import json
+import os
+import re
+import zipfile
+from datetime import datetime
+
+from notes_store import BodyReader
+
+EXPORT_FORMATS = ("markdown", "jsonl", "zip")
+PROGRESS_EVERY = 50
+
+UNSAFE_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def snapshot_notes(store, view="home", category=None):
+    """
+    Copy the metadata and body locations of the notes in a view, newest first.
+    Taking the snapshot is cheap; the bodies are read later, one at a time,
+    by iter_note_bodies() on whatever thread does the writing.
+    """
+    items = sorted(store.filter_notes(view, category), key=lambda item: item[1].get("updated_at") or "", reverse=True)
+    entries = store.body_store.index
+    return store.body_store.data_path, [(note_id, dict(note_data), entries.get(note_id)) for note_id, note_data in items]
+
+
+def iter_note_bodies(data_path, items, progress=None, cancelled=None):
+    """Yield (note_id, note_data, content) for a snapshot, reporting progress and stopping when cancelled() is true"""
+    total = len(items)
+    with BodyReader(data_path) as reader:
+        for done, (note_id, note_data, entry) in enumerate(items):
+            if cancelled and cancelled():
+                raise ExportCancelled()
+            if progress and done % PROGRESS_EVERY == 0:
+                progress(done, total)
+            yield note_id, note_data, reader.read(entry)
+    if progress:
+        progress(total, total)
+
+
+def safe_filename(name, fallback="Untitled"):
+    name = UNSAFE_FILENAME_CHARS.sub("_", name or "").strip(" .")
+    return name[:100] or fallback
+
+
+def unique_note_path(note_data, used_paths):
+    """Relative path for a note: its category folder (none for Uncategorized) and a title that is not taken yet"""
+    category = note_data.get("category") or "Uncategorized"
+    folder = "" if category == "Uncategorized" else safe_filename(category)
+    stem = safe_filename(note_data.get("title"))
+    path = f"{folder}/{stem}.md" if folder else f"{stem}.md"
+    number = 2
+    while path.lower() in used_paths:
+        path = f"{folder}/{stem} ({number}).md" if folder else f"{stem} ({number}).md"
+        number += 1
+    used_paths.add(path.lower())
+    return path
+
+
+def note_markdown(note_data, content):
+    """Front matter the importer reads back (title, category, created) followed by the note text"""
+    lines = ["---", f"title: {' '.join((note_data.get('title') or '').splitlines())}",
+             f"category: {note_data.get('category') or 'Uncategorized'}"]
+    for key, field in (("created", "created_at"), ("updated", "updated_at"), ("deleted", "deleted_at")):
+        if note_data.get(field):
+            lines.append(f"{key}: {note_data[field]}")
+    for flag in ("favorite", "temporary"):
+        if note_data.get(flag):
+            lines.append(f"{flag}: true")
+    lines.append("---")
+    return "\n".join(lines) + "\n" + content
+
+
+def note_timestamp(note_data):
+    try:
+        return datetime.fromisoformat(note_data.get("updated_at") or "")
+    except ValueError:
+        return None
+
+
+def write_markdown_folder(notes, directory):
+    """One .md file per note under directory, with category subfolders and the note's modification time"""
+    os.makedirs(directory, exist_ok=True)
+    used_paths = set()
+    count = 0
+    for note_id, note_data, content in notes:
+        path = os.path.join(directory, *unique_note_path(note_data, used_paths).split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(note_markdown(note_data, content))
+        updated_at = note_timestamp(note_data)
+        if updated_at:
+            os.utime(path, (updated_at.timestamp(), updated_at.timestamp()))
+        count += 1
+    return count
+
+
+def write_jsonl(notes, path):
+    """One JSON object per line: the note's id, metadata and content"""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for note_id, note_data, content in notes:
+            f.write(json.dumps({"id": note_id, **note_data, "content": content}, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def write_zip(notes, path):
+    """The Markdown folder layout, written into a zip archive one entry at a time"""
+    used_paths = set()
+    count = 0
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for note_id, note_data, content in notes:
+            updated_at = note_timestamp(note_data)
+            date_time = updated_at.timetuple()[:6] if updated_at and updated_at.year >= 1980 else (1980, 1, 1, 0, 0, 0)
+            info = zipfile.ZipInfo(unique_note_path(note_data, used_paths), date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, note_markdown(note_data, content))
+            count += 1
+    return count
+
+
+FILE_WRITERS = {"jsonl": write_jsonl, "zip": write_zip}
+
+
+def write_export(fmt, data_path, items, destination, progress=None, cancelled=None):
+    """
+    Write a snapshot in the given format. Files are written to a temporary
+    name and moved into place at the end, so a failed or cancelled export
+    never leaves a truncated archive behind. Returns the number of notes.
+    """
+    notes = iter_note_bodies(data_path, items, progress, cancelled)
+    if fmt == "markdown":
+        return write_markdown_folder(notes, destination)
+
+    temp_path = f"{destination}.part"
+    try:
+        count = FILE_WRITERS[fmt](notes, temp_path)
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return count
+
+
+def export_notes(store, fmt, destination, view="home", category=None, progress=None):
+    data_path, items = snapshot_notes(store, view, category)
+    return write_export(fmt, data_path, items, destination, progress)
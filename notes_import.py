@@ -0,0 +1,140 @@
+"""Bulk import of Markdown and text files into a NotesStore, without Qt."""
+import os
+from datetime import datetime
+from itertools import islice
+
+NOTE_EXTENSIONS = (".md", ".markdown", ".txt")
+BATCH_SIZE = 500
+
+
+def iter_note_files(root, extensions=NOTE_EXTENSIONS):
+    """Yield note files under root, walking directories lazily so huge trees start importing at once"""
+    root = os.path.abspath(root)
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"Could not read {directory}: {e}")
+            continue
+        subdirectories = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif entry.name.lower().endswith(extensions):
+                yield (entry.path, root)
+        pending.extend(reversed(subdirectories))
+
+
+def split_front_matter(text):
+    """Separate a leading '---' block of 'key: value' lines from the note text"""
+    if not text.startswith("---\n"):
+        return {}, text
+    end = text.find("\n---", 3)
+    if end == -1:
+        return {}, text
+    fields = {}
+    for line in text[4:end].splitlines():
+        key, sep, value = line.partition(":")
+        if sep:
+            fields[key.strip().lower()] = value.strip().strip("\"'")
+    body_start = text.find("\n", end + 4)
+    return fields, text[body_start + 1:] if body_start != -1 else ""
+
+
+def parse_note_file(job):
+    """Turn (path, root) into a note record; runs in the import worker processes"""
+    path, root = job
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        modified_at = datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+    except OSError as e:
+        return {"source": path, "error": str(e)}
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = raw.decode("latin-1")
+    text = text.replace("\r\n", "\n")
+
+    fields, content = split_front_matter(text)
+    title = fields.get("title")
+    if not title:
+        for line in content.splitlines()[:5]:
+            if line.startswith("# "):
+                title = line[2:].strip()
+                break
+    if not title:
+        title = os.path.splitext(os.path.basename(path))[0]
+
+    category = fields.get("category")
+    if not category:
+        relative_dir = os.path.relpath(os.path.dirname(path), root)
+        category = relative_dir.split(os.sep)[0] if relative_dir != "." else "Uncategorized"
+
+    return {
+        "source": path,
+        "title": title,
+        "content": content,
+        "category": category,
+        "created_at": fields.get("created") or fields.get("date") or modified_at,
+        "updated_at": modified_at
+    }
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def parse_batches(root, batch_size=BATCH_SIZE, workers=None):
+    """
+    Yield lists of parsed note records for the files under root. With
+    workers != 0 the files are parsed in a process pool, and the next batch is
+    already being parsed while the caller commits the current one.
+    """
+    jobs = iter_note_files(root)
+    if workers == 0:
+        for batch in batched(jobs, batch_size):
+            yield list(map(parse_note_file, batch))
+        return
+
+    # Imported here so the app and the CLI do not load multiprocessing until an import starts
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or min(8, os.cpu_count() or 1)
+    # spawn, not fork: the app calls this from a QThread, and forking a process with
+    # other threads running can copy a lock one of them holds into the children
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        in_flight = None
+        for batch in batched(jobs, batch_size):
+            chunksize = max(1, len(batch) // (4 * workers))
+            submitted = pool.map(parse_note_file, batch, chunksize=chunksize)
+            if in_flight is not None:
+                yield list(in_flight)
+            in_flight = submitted
+        if in_flight is not None:
+            yield list(in_flight)
+
+
+def import_notes(store, root, batch_size=BATCH_SIZE, workers=None, progress=None):
+    """Import every note file under root, saving the store once per batch; returns (imported, failures)"""
+    imported = 0
+    failures = []
+    for records in parse_batches(root, batch_size, workers):
+        note_ids, failed = store.import_batch(records)
+        failures.extend(failed)
+        imported += len(note_ids)
+        store.save()
+        if progress:
+            progress(imported, len(failures))
+    return imported, failures
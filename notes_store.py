@@ -0,0 +1,2191 @@
+"""Note storage for AmogOS Notes that does not depend on Qt."""
+import difflib
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+def atomic_write_json(path, data, indent=None):
+    """Write JSON to a temp file and move it over path so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class OwnerLock:
+    """
+    Exclusive lock on a file in the data directory. Only the process holding
+    it rewrites or deletes files other processes may have open (compaction,
+    migrations, journal recovery). The operating system drops the lock when
+    the process exits, so it never goes stale.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.file = None
+
+    def acquire(self):
+        """Take the lock without waiting; returns whether this process holds it"""
+        if self.file is not None:
+            return True
+        f = open(self.path, "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        self.file = f
+        return True
+
+    def release(self):
+        if self.file is None:
+            return
+        if fcntl is None:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+
+def entry_parts(entry):
+    """
+    The (offset, length) pieces of a body index entry: an entry is either one
+    (offset, length) pair or, for a chunked body, a tuple of them.
+    """
+    return entry if isinstance(entry[0], tuple) else (entry,)
+
+
+def entry_length(entry):
+    return sum(length for _, length in entry_parts(entry))
+
+
+def entry_end(entry):
+    return max(offset + length for offset, length in entry_parts(entry))
+
+
+def parse_entry(raw):
+    """An index entry as read from JSON: [offset, length] or [[offset, length], ...]"""
+    if isinstance(raw[0], list):
+        return tuple((int(offset), int(length)) for offset, length in raw)
+    return (int(raw[0]), int(raw[1]))
+
+
+def dump_entry(entry):
+    if isinstance(entry[0], tuple):
+        return [list(part) for part in entry]
+    return list(entry)
+
+
+def chunk_boundaries(data, min_size, max_size):
+    """
+    Offsets where a large body is cut into chunks. A chunk ends at the first
+    line break at least min_size into it whose preceding 32 bytes hash to a
+    multiple of 16, or at max_size when there is none. Cuts depend only on
+    the text around them, so an edit changes the chunk it falls in and the
+    chunks after it stay the same.
+    """
+    cuts = []
+    start = 0
+    while len(data) - start > min_size:
+        limit = min(len(data), start + max_size)
+        position = data.find(b"\n", start + min_size, limit)
+        while position != -1 and zlib.crc32(data[position - 32:position]) % 16:
+            position = data.find(b"\n", position + 1, limit)
+        if position != -1:
+            start = position + 1
+        elif limit < len(data):
+            start = limit
+        else:
+            break
+        if start < len(data):
+            cuts.append(start)
+    return cuts
+
+
+class NoteBodyStore:
+    """Append-only file of note bodies, read through mmap.
+
+    Bodies are stored UTF-8 encoded in a data file that is only ever appended
+    to. The index maps each note id to the (offset, length) of its current
+    body, so only the body that is asked for gets decoded. Superseded bodies
+    stay in the data file until compact() rewrites it under a new name.
+
+    Bodies of CHUNKED_BODY_BYTES or more are stored as content-defined
+    chunks (see chunk_boundaries), and their index entry lists the chunks.
+    Saving such a body again only appends the chunks that changed, so a
+    small edit to a 10 MB note writes a few kilobytes instead of 10 MB.
+
+    Another process may compact while this one has the store open. Before
+    reading past its map, appending or writing the index, the store checks
+    whether the index on disk names a new data file and, if so, follows it
+    (see follow_compaction).
+    """
+
+    COMPACT_MIN_GARBAGE = 1024 * 1024
+    CHUNKED_BODY_BYTES = 256 * 1024
+    CHUNK_MIN_BYTES = 32 * 1024
+    CHUNK_MAX_BYTES = 256 * 1024
+
+    def __init__(self, directory, name="notes_bodies"):
+        self.directory = str(directory)
+        self.name = name
+        self.index_path = os.path.join(self.directory, f"{name}.idx")
+        self.data_file = f"{name}.dat"
+        self.index = {}
+        self.garbage = 0
+        self._map = None
+        self._map_file = None
+        self._append_file = None
+        self._data_handle = None
+        self._index_dirty = False
+        self._index_state = None
+        self._unflushed = set()
+        self.load()
+
+    @property
+    def data_path(self):
+        return os.path.join(self.directory, self.data_file)
+
+    def load(self):
+        """(Re)read the index from disk and drop entries that point past the end of the data file"""
+        self.close()
+        self.index = {}
+        self.garbage = 0
+        self.data_file = f"{self.name}.dat"
+        self._unflushed = set()
+
+        self._index_state = self._read_index_state()
+        raw = self._read_index_file()
+        if raw is not None:
+            try:
+                self.data_file = raw.get("data_file", self.data_file)
+                self.garbage = int(raw.get("garbage", 0))
+                for note_id, entry in raw.get("bodies", {}).items():
+                    self.index[note_id] = parse_entry(entry)
+            except (ValueError, TypeError, AttributeError, IndexError) as e:
+                print(f"Error reading note body index {self.index_path}: {e}. Starting with an empty index.")
+                self.index = {}
+
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        torn = [note_id for note_id, entry in self.index.items() if entry_end(entry) > data_size]
+        for note_id in torn:
+            print(f"Warning: Body for note {note_id} is missing from {self.data_path}. Dropping it from the index.")
+            del self.index[note_id]
+        if torn:
+            self._index_dirty = True
+        self._hold_data_file()
+
+    def _hold_data_file(self):
+        """
+        Keep the data file open while the store is, so our entries stay
+        readable if another process compacts and deletes it (Windows refuses
+        to delete it at all, and remove_stale_data_files catches it later).
+        """
+        if self._data_handle is None and os.path.exists(self.data_path):
+            self._data_handle = open(self.data_path, "rb")
+
+    def _read_index_state(self):
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def replaced_on_disk(self):
+        """
+        True when another process has compacted into a new data file. The
+        index is only parsed when its stat changed since we last read or
+        wrote it, so the usual cost is two stat calls.
+        """
+        if not os.path.exists(self.data_path) and (self.index or self._append_file is not None):
+            return True
+        index_state = self._read_index_state()
+        if index_state == self._index_state:
+            return False
+        self._index_state = index_state
+        raw = self._read_index_file()
+        return raw is not None and raw.get("data_file", f"{self.name}.dat") != self.data_file
+
+    def follow_compaction(self):
+        """
+        Reload the index another process wrote after compacting, then write
+        again the bodies we changed since our last flush. Those are read back
+        through our append handle or map, which still reach the old file.
+        """
+        carried = {}
+        for note_id in self._unflushed:
+            entry = self.index.get(note_id)
+            if entry is None:
+                carried[note_id] = None
+                continue
+            try:
+                carried[note_id] = self._read_old_file(entry)
+            except OSError as e:
+                print(f"Could not carry over the body of note {note_id} after compaction: {e}")
+        print("Note bodies were compacted into a new file by another process; following it")
+        self.load()
+        for note_id, data in carried.items():
+            if data is None:
+                self.delete(note_id)
+            else:
+                self._append(note_id, data)
+
+    def _read_old_file(self, entry):
+        return b"".join(self._read_old_part(offset, length) for offset, length in entry_parts(entry))
+
+    def _read_old_part(self, offset, length):
+        if self._append_file is not None:
+            self._append_file.seek(offset)
+            data = self._append_file.read(length)
+            if len(data) == length:
+                return data
+        if self._data_handle is None:
+            raise OSError(f"{self.data_path} is gone")
+        self._data_handle.seek(offset)
+        data = self._data_handle.read(length)
+        if len(data) != length:
+            raise OSError(f"{self.data_path} ends before the body")
+        return data
+
+    def _read_index_file(self):
+        if not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reading note body index {self.index_path}: {e}")
+            return None
+
+    def disk_entries(self):
+        """
+        Index entries as currently saved on disk, possibly by another process.
+        If that process compacted into a new data file the whole store is
+        reloaded, since entries from different data files cannot be mixed.
+        """
+        raw = self._read_index_file()
+        if raw is None:
+            return {}
+        if raw.get("data_file", f"{self.name}.dat") != self.data_file:
+            self.follow_compaction()
+            return dict(self.index)
+
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        entries = {}
+        for note_id, entry in raw.get("bodies", {}).items():
+            try:
+                entry = parse_entry(entry)
+            except (ValueError, TypeError, IndexError):
+                continue
+            if entry_end(entry) <= data_size:
+                entries[note_id] = entry
+        return entries
+
+    def read_entry(self, entry, default=""):
+        return self._read_entry_bytes(entry).decode("utf-8") if entry else default
+
+    def _read_entry_bytes(self, entry):
+        return b"".join(self._read_bytes(offset, length) for offset, length in entry_parts(entry))
+
+    def adopt(self, note_id, entry):
+        """Point note_id at an entry from disk_entries(), or drop it when entry is None"""
+        if entry is None:
+            self.index.pop(note_id, None)
+        else:
+            self.index[note_id] = entry
+        self._unflushed.add(note_id)
+        self._index_dirty = True
+
+    def __contains__(self, note_id):
+        return note_id in self.index
+
+    def _remap(self):
+        if self.replaced_on_disk():
+            self.follow_compaction()
+        if self._append_file:
+            self._append_file.flush()
+        self._close_map()
+        if not os.path.exists(self.data_path) or os.path.getsize(self.data_path) == 0:
+            return
+        self._map_file = open(self.data_path, "rb")
+        self._map = mmap.mmap(self._map_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _read_bytes(self, offset, length):
+        if length == 0:
+            return b""
+        if self._map is None or len(self._map) < offset + length:
+            self._remap()
+        return self._map[offset:offset + length]
+
+    def get(self, note_id, default=""):
+        """Decode and return the full body of a single note"""
+        entry = self.index.get(note_id)
+        if entry is None:
+            return default
+        return self._read_entry_bytes(entry).decode("utf-8")
+
+    def get_preview(self, note_id, max_chars):
+        """Return at most max_chars leading characters without decoding the whole body"""
+        entry = self.index.get(note_id)
+        if entry is None:
+            return ""
+        offset, length = entry_parts(entry)[0]
+        raw = self._read_bytes(offset, min(length, max_chars * 4))
+        return raw.decode("utf-8", errors="ignore")[:max_chars]
+
+    def body_size(self, note_id):
+        entry = self.index.get(note_id)
+        return entry_length(entry) if entry else 0
+
+    def put(self, note_id, text):
+        """Append a new body for note_id unless it matches the stored one"""
+        data = text.encode("utf-8")
+        if self.replaced_on_disk():
+            self.follow_compaction()
+        old_entry = self.index.get(note_id)
+        if old_entry is not None and entry_length(old_entry) == len(data) and self._read_entry_bytes(old_entry) == data:
+            return
+        self._append(note_id, data)
+
+    def _append(self, note_id, data):
+        """Write data as note_id's body, reusing the chunks of its current body that did not change"""
+        old_entry = self.index.get(note_id)
+        old_parts = entry_parts(old_entry) if old_entry is not None else ()
+        if len(data) < self.CHUNKED_BODY_BYTES:
+            pieces = [data]
+        else:
+            cuts = [0] + chunk_boundaries(data, self.CHUNK_MIN_BYTES, self.CHUNK_MAX_BYTES) + [len(data)]
+            pieces = [data[start:end] for start, end in zip(cuts, cuts[1:])]
+
+        by_length = {}
+        for part in old_parts:
+            by_length.setdefault(part[1], []).append(part)
+        parts = []
+        new_pieces = []
+        for piece in pieces:
+            reused = next((part for part in by_length.get(len(piece), ()) if self._read_bytes(*part) == piece), None)
+            parts.append(reused)
+            if reused is None:
+                new_pieces.append(piece)
+
+        if new_pieces:
+            if self._append_file is None:
+                # a+ so follow_compaction can read back what we appended
+                self._append_file = open(self.data_path, "a+b")
+                self._hold_data_file()
+            # Another process may have appended since our last write
+            self._append_file.seek(0, os.SEEK_END)
+            offset = self._append_file.tell()
+            self._append_file.write(b"".join(new_pieces))
+            self._append_file.flush()
+            for i, piece in enumerate(pieces):
+                if parts[i] is None:
+                    parts[i] = (offset, len(piece))
+                    offset += len(piece)
+
+        kept = set(parts)
+        self.garbage += sum(length for _, length in set(old_parts) - kept)
+        self.index[note_id] = tuple(parts) if len(data) >= self.CHUNKED_BODY_BYTES else parts[0]
+        self._unflushed.add(note_id)
+        self._index_dirty = True
+
+    def delete(self, note_id):
+        entry = self.index.pop(note_id, None)
+        if entry is not None:
+            self.garbage += entry_length(entry)
+            self._unflushed.add(note_id)
+            self._index_dirty = True
+
+    def flush(self):
+        """Make appended bodies durable, then persist the index"""
+        if self._index_dirty and self.replaced_on_disk():
+            self.follow_compaction()
+        if self._append_file:
+            self._append_file.flush()
+            os.fsync(self._append_file.fileno())
+        if self._index_dirty:
+            self._write_index()
+
+    def _write_index(self):
+        atomic_write_json(self.index_path, {
+            "data_file": self.data_file,
+            "garbage": self.garbage,
+            "bodies": {note_id: dump_entry(entry) for note_id, entry in self.index.items()}
+        })
+        self._index_state = self._read_index_state()
+        self._index_dirty = False
+        self._unflushed = set()
+
+    def compact(self, force=False):
+        """Rewrite live bodies into a fresh data file once superseded bytes outweigh them"""
+        live_bytes = sum(entry_length(entry) for entry in self.index.values())
+        if not force and (self.garbage < self.COMPACT_MIN_GARBAGE or self.garbage < live_bytes):
+            return False
+
+        old_data_path = self.data_path
+        generation = 1
+        while os.path.exists(os.path.join(self.directory, f"{self.name}.{generation}.dat")):
+            generation += 1
+        new_data_file = f"{self.name}.{generation}.dat"
+
+        new_index = {}
+        with open(os.path.join(self.directory, new_data_file), "wb") as out:
+            for note_id, entry in sorted(self.index.items(), key=lambda item: entry_parts(item[1])[0][0]):
+                parts = []
+                for offset, length in entry_parts(entry):
+                    parts.append((out.tell(), length))
+                    out.write(self._read_bytes(offset, length))
+                new_index[note_id] = tuple(parts) if isinstance(entry[0], tuple) else parts[0]
+            out.flush()
+            os.fsync(out.fileno())
+
+        self.close()
+        self.index = new_index
+        self.data_file = new_data_file
+        self.garbage = 0
+        self._write_index()
+        self._hold_data_file()
+
+        try:
+            os.remove(old_data_path)
+        except OSError as e:
+            print(f"Could not remove old note body file {old_data_path}: {e}")
+        return True
+
+    def remove_stale_data_files(self):
+        """
+        Delete data files left by earlier compactions, such as ones another
+        process still had open (Windows will not delete those). Only call this
+        while holding the OwnerLock.
+        """
+        pattern = re.compile(rf"{re.escape(self.name)}(\.\d+)?\.dat")
+        for file_name in os.listdir(self.directory):
+            if file_name != self.data_file and pattern.fullmatch(file_name):
+                try:
+                    os.remove(os.path.join(self.directory, file_name))
+                except OSError as e:
+                    print(f"Could not remove old note body file {file_name}: {e}")
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._map_file is not None:
+            self._map_file.close()
+            self._map_file = None
+
+    def close(self):
+        self._close_map()
+        if self._append_file is not None:
+            self._append_file.close()
+            self._append_file = None
+        if self._data_handle is not None:
+            self._data_handle.close()
+            self._data_handle = None
+
+
+class BodyReader:
+    """
+    Reads body entries through its own file handle, so a worker thread can
+    stream bodies while the store keeps appending and remapping. Entries stay
+    valid because the data file is only ever appended to.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "rb") if os.path.exists(path) else None
+
+    def read(self, entry, default=""):
+        if not entry or self.file is None:
+            return default
+        data = []
+        for offset, length in entry_parts(entry):
+            self.file.seek(offset)
+            data.append(self.file.read(length))
+        return b"".join(data).decode("utf-8")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def merge_notes(base, mine, theirs):
+    """
+    Three-way merge of note metadata dicts keyed by note id.
+
+    base is the state both sides started from. A record changed on one side
+    only takes that side. A record changed differently on both sides is a
+    conflict: an edit beats a deletion, otherwise the later updated_at wins
+    (ties go to mine). Returns (merged, from_theirs, conflicts) where
+    from_theirs lists the ids whose merged record came from theirs and
+    conflicts holds (note_id, losing_record, losing_side) tuples.
+    """
+    merged = {}
+    from_theirs = []
+    conflicts = []
+    note_ids = list(mine) + [note_id for note_id in theirs if note_id not in mine]
+    note_ids += [note_id for note_id in base if note_id not in mine and note_id not in theirs]
+
+    for note_id in note_ids:
+        base_record, my_record, their_record = base.get(note_id), mine.get(note_id), theirs.get(note_id)
+        take_theirs = False
+        if their_record == base_record or their_record == my_record:
+            pass
+        elif my_record == base_record:
+            take_theirs = True
+        elif my_record is None:
+            take_theirs = True
+            conflicts.append((note_id, None, "mine"))
+        elif their_record is None:
+            conflicts.append((note_id, None, "theirs"))
+        elif their_record.get("updated_at", "") > my_record.get("updated_at", ""):
+            take_theirs = True
+            conflicts.append((note_id, my_record, "mine"))
+        else:
+            conflicts.append((note_id, their_record, "theirs"))
+
+        winner = their_record if take_theirs else my_record
+        if take_theirs:
+            from_theirs.append(note_id)
+        if winner is not None:
+            merged[note_id] = winner
+    return merged, from_theirs, conflicts
+
+
+def normalize_category(category):
+    return category or "Uncategorized"
+
+
+class CategoryIndex:
+    """Category -> set(note_id) index kept up to date on every mutation.
+
+    Notes in the recycle bin stay indexed under their category so renames and
+    restores keep working, but only live notes count towards a category.
+    """
+
+    def __init__(self):
+        self.members = {}
+        self.live_counts = {}
+        self.empty_categories = set()
+
+    def rebuild(self, notes):
+        self.members = {}
+        self.live_counts = {}
+        for note_id, note_data in notes.items():
+            if isinstance(note_data, dict):
+                self.add(note_id, note_data.get("category"), note_data.get("deleted", False))
+
+    def add(self, note_id, category, deleted=False):
+        category = normalize_category(category)
+        self.members.setdefault(category, set()).add(note_id)
+        self.live_counts.setdefault(category, 0)
+        if not deleted:
+            self.live_counts[category] += 1
+            self.empty_categories.discard(category)
+
+    def remove(self, note_id, category, deleted=False):
+        category = normalize_category(category)
+        members = self.members.get(category)
+        if not members or note_id not in members:
+            return
+        members.discard(note_id)
+        if not deleted:
+            self.live_counts[category] -= 1
+        if not members:
+            del self.members[category]
+            del self.live_counts[category]
+
+    def move(self, note_id, old_category, new_category, deleted=False):
+        if normalize_category(old_category) == normalize_category(new_category):
+            return
+        self.remove(note_id, old_category, deleted)
+        self.add(note_id, new_category, deleted)
+
+    def set_deleted(self, note_id, category, deleted):
+        category = normalize_category(category)
+        if note_id in self.members.get(category, ()):
+            self.live_counts[category] += -1 if deleted else 1
+            if not deleted:
+                self.empty_categories.discard(category)
+
+    def ensure(self, category):
+        """Register a category that has no notes yet"""
+        category = normalize_category(category)
+        if self.count(category) == 0:
+            self.empty_categories.add(category)
+
+    def forget(self, category):
+        """Drop a category from the index and return the ids that were filed under it"""
+        category = normalize_category(category)
+        self.empty_categories.discard(category)
+        self.live_counts.pop(category, None)
+        return self.members.pop(category, set())
+
+    def note_ids(self, category):
+        return self.members.get(normalize_category(category), set())
+
+    def count(self, category):
+        return self.live_counts.get(normalize_category(category), 0)
+
+    def categories(self):
+        """Sorted user categories that have live notes or were created empty"""
+        names = {category for category, count in self.live_counts.items() if count > 0}
+        names |= self.empty_categories
+        names.discard("Uncategorized")
+        return sorted(names)
+
+    def counts(self):
+        return {category: self.count(category) for category in self.categories()}
+
+
+def common_prefix_length(a, b):
+    """Length of the common prefix, found by comparing slices so long texts are compared in C"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix_length(a, b, limit):
+    low, high = 0, min(len(a), len(b), limit)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def text_patch(old, new, line_diff_above=4096):
+    """
+    Hunks [position in old, old text, new text] that turn old into new.
+    Edits to a long note are stored as small hunks rather than one big one:
+    see diff_span().
+    """
+    hunks = []
+    diff_span(old, new, 0, hunks, line_diff_above)
+    return hunks
+
+
+def diff_span(old, new, offset, hunks, line_diff_above, depth=0):
+    """
+    Trim the common start and end; a changed middle longer than
+    line_diff_above is split at a line of old that also occurs in new and
+    both halves are diffed again, so far-apart edits cost a few slice
+    comparisons. Only a middle without such a line gets a line diff.
+    """
+    if old == new:
+        return
+    prefix = common_prefix_length(old, new)
+    suffix = common_suffix_length(old, new, min(len(old), len(new)) - prefix)
+    old_middle = old[prefix:len(old) - suffix]
+    new_middle = new[prefix:len(new) - suffix]
+    start = offset + prefix
+    if min(len(old_middle), len(new_middle)) <= line_diff_above:
+        hunks.append([start, old_middle, new_middle])
+        return
+
+    if depth < 24:
+        split = anchor_split(old_middle, new_middle)
+        if split is not None:
+            i, j = split
+            diff_span(old_middle[:i], new_middle[:j], start, hunks, line_diff_above, depth + 1)
+            diff_span(old_middle[i:], new_middle[j:], start + i, hunks, line_diff_above, depth + 1)
+            return
+
+    old_lines = old_middle.splitlines(keepends=True)
+    new_lines = new_middle.splitlines(keepends=True)
+    old_offsets = [start]
+    for line in old_lines:
+        old_offsets.append(old_offsets[-1] + len(line))
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines).get_opcodes():
+        if tag != "equal":
+            hunks.append([old_offsets[i1], "".join(old_lines[i1:i2]), "".join(new_lines[j1:j2])])
+
+
+def anchor_split(old, new, anchor_chars=64):
+    """(i, j) such that old[i:] and new[j:] start with the same line from the middle of old, or None"""
+    i = old.find("\n", len(old) // 2) + 1
+    if i <= 0 or i >= len(old):
+        return None
+    anchor = old[i:i + anchor_chars]
+    if not anchor.strip():
+        return None
+    j = new.find(anchor)
+    return (i, j) if j != -1 else None
+
+
+def apply_text_patch(text, hunks):
+    """Apply text_patch() hunks; raises ValueError if text does not hold the old parts"""
+    pieces = []
+    cursor = 0
+    for position, old, new in hunks:
+        if position < cursor or text[position:position + len(old)] != old:
+            raise ValueError("the note text has changed since this edit")
+        pieces.append(text[cursor:position])
+        pieces.append(new)
+        cursor = position + len(old)
+    pieces.append(text[cursor:])
+    return "".join(pieces)
+
+
+def invert_text_patch(hunks):
+    """Hunks that turn the patched text back into the original"""
+    inverted = []
+    shift = 0
+    for position, old, new in hunks:
+        inverted.append([position + shift, new, old])
+        shift += len(new) - len(old)
+    return inverted
+
+
+def invert_op(op):
+    if op["field"] == "content":
+        return dict(op, patch=invert_text_patch(op["patch"]))
+    return dict(op, old=op["new"], new=op["old"])
+
+
+class NotesJournal:
+    """Append-only JSON-lines log of note transactions.
+
+    Every batch of note changes is written here as a single line before it is
+    applied, followed by a checkpoint line once notes.json holds the result.
+    Transactions after the last checkpoint are replayed on the next start.
+    Checkpointed transactions are only kept for undo, so trim() keeps at most
+    max_transactions of them and max_bytes of their lines.
+    """
+
+    def __init__(self, path, max_transactions=200, max_bytes=4 * 1024 * 1024):
+        self.path = str(path)
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.last_seq = 0
+        self.line_count = 0
+        self.size = 0
+
+    def load(self):
+        """Read the journal once, for replay and undo history, and continue numbering after it"""
+        entries = self._read_entries()
+        for entry in entries:
+            self.last_seq = max(self.last_seq, entry.get("seq", 0), entry.get("checkpoint", 0))
+        return entries
+
+    def _read_entries(self):
+        entries = []
+        if not os.path.exists(self.path):
+            self.line_count = self.size = 0
+            return entries
+        self.size = os.path.getsize(self.path)
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f"Warning: Ignoring a torn entry at the end of {self.path}")
+                    break
+        self.line_count = len(entries)
+        return entries
+
+    def _append_line(self, entry):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.line_count += 1
+        self.size += len(line.encode("utf-8"))
+
+    def append(self, transaction):
+        """Durably record a transaction and return its sequence number"""
+        self.last_seq += 1
+        entry = dict(transaction, seq=self.last_seq)
+        self._append_line(entry)
+        return self.last_seq
+
+    def checkpoint(self, seq):
+        """Record that every transaction up to seq is reflected in notes.json"""
+        self._append_line({"checkpoint": seq})
+        if self.line_count > 2 * self.max_transactions or self.size > 2 * self.max_bytes:
+            self.trim()
+
+    def transactions(self, entries=None):
+        """Every transaction kept; entries saves reading the file again when the caller has just loaded it"""
+        return [entry for entry in (self._read_entries() if entries is None else entries) if "seq" in entry]
+
+    def pending(self, entries=None):
+        """Transactions written after the last checkpoint"""
+        last_checkpoint = 0
+        transactions = []
+        for entry in self._read_entries() if entries is None else entries:
+            if "checkpoint" in entry:
+                last_checkpoint = max(last_checkpoint, entry["checkpoint"])
+            elif "seq" in entry:
+                transactions.append(entry)
+        return [entry for entry in transactions if entry["seq"] > last_checkpoint]
+
+    def trim(self):
+        """
+        Keep the transactions not yet checkpointed, and the newest checkpointed
+        ones up to max_transactions and max_bytes, so the journal stays bounded
+        in length and size even when single transactions carry whole notes.
+        """
+        entries = self._read_entries()
+        last_checkpoint = max([entry["checkpoint"] for entry in entries if "checkpoint" in entry] or [0])
+        lines = []
+        kept_bytes = 0
+        for entry in reversed([entry for entry in entries if "seq" in entry]):
+            line = json.dumps(entry, separators=(",", ":")) + "\n"
+            if entry["seq"] <= last_checkpoint:
+                kept_bytes += len(line.encode("utf-8"))
+                if len(lines) >= self.max_transactions or kept_bytes > self.max_bytes:
+                    break
+            lines.append(line)
+        lines.reverse()
+        lines.append(json.dumps({"checkpoint": last_checkpoint}) + "\n")
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.line_count = len(lines)
+        self.size = os.path.getsize(self.path)
+
+
+def text_digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class RevisionStore:
+    """
+    Past versions of each note, one JSON-lines file per note under history/.
+
+    A revision is either a keyframe holding the whole text or a delta of
+    text_patch() hunks against the revision before it. A keyframe is written
+    at least every KEYFRAME_EVERY revisions, so rebuilding any revision reads
+    one keyframe and applies at most KEYFRAME_EVERY - 1 deltas. Notes keep
+    at most MAX_REVISIONS revisions, and when all files together exceed
+    MAX_BYTES the largest histories lose their oldest half.
+
+    record() only needs the newest revision, how many there are and how far
+    back the last keyframe is. Those are kept per note in tails, checked
+    against the file size, so saving a note does not read its history.
+    """
+
+    KEYFRAME_EVERY = 16
+    MAX_REVISIONS = 100
+    MAX_BYTES = 64 * 1024 * 1024
+    # Entries are written with their keys in this order, and titles are escaped, so this only matches keyframes
+    KEYFRAME_LINE = re.compile(r'"sha": "[0-9a-f]+", "text": ')
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        self.total_bytes = None
+        self.tails = {}
+
+    def path(self, note_id):
+        return os.path.join(self.directory, f"{note_id}.jsonl")
+
+    def entries(self, note_id):
+        """Every stored revision of a note, oldest first; a torn last line is ignored"""
+        entries = []
+        try:
+            with open(self.path(note_id), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Could not read the history of note {note_id}: {e}")
+        return entries
+
+    def revisions(self, note_id):
+        """(rev, time, title) of each revision, newest first, without rebuilding any text"""
+        return [(entry["rev"], entry["time"], entry["title"]) for entry in reversed(self.entries(note_id))]
+
+    def has_history(self, note_id):
+        return os.path.exists(self.path(note_id))
+
+    def rename(self, old_id, new_id):
+        """Move a note's history to a new id; returns False when there is none or new_id already has one"""
+        if not self.has_history(old_id) or self.has_history(new_id):
+            return False
+        os.replace(self.path(old_id), self.path(new_id))
+        self.tails.pop(old_id, None)
+        return True
+
+    def tail(self, note_id):
+        """
+        (newest entry without its text or patch, revision count, revisions
+        since the last keyframe counting it) of a note. Read once by scanning
+        the lines for keyframes, parsing only the last one; the file size
+        tells when another process has appended since.
+        """
+        try:
+            size = os.path.getsize(self.path(note_id))
+        except OSError:
+            self.tails.pop(note_id, None)
+            return None, 0, 0
+        cached = self.tails.get(note_id)
+        if cached is not None and cached[3] == size:
+            return cached[:3]
+
+        count = since_keyframe = 0
+        last_line = None
+        with open(self.path(note_id), "r", encoding="utf-8") as f:
+            for line in f:
+                count += 1
+                since_keyframe = 1 if self.KEYFRAME_LINE.search(line) else since_keyframe + 1
+                last_line = line
+        try:
+            last = json.loads(last_line) if last_line else None
+        except json.JSONDecodeError:
+            # A torn last line: entries() knows where the readable part ends
+            entries = self.entries(note_id)
+            last = entries[-1] if entries else None
+            count = len(entries)
+            since_keyframe = next((i for i, old in enumerate(reversed(entries)) if "text" in old), count - 1) + 1
+        self.remember_tail(note_id, last, count, since_keyframe, size)
+        return self.tails[note_id][:3]
+
+    def remember_tail(self, note_id, last, count, since_keyframe, size=None):
+        if last is None:
+            self.tails.pop(note_id, None)
+            return
+        last = {key: value for key, value in last.items() if key not in ("text", "patch")}
+        if size is None:
+            size = os.path.getsize(self.path(note_id))
+        self.tails[note_id] = (last, count, since_keyframe, size)
+
+    @staticmethod
+    def rebuild(entries, index):
+        """Text of entries[index] from the keyframe at or before it"""
+        start = index
+        while "text" not in entries[start]:
+            start -= 1
+        text = entries[start]["text"]
+        for entry in entries[start + 1:index + 1]:
+            text = apply_text_patch(text, entry["patch"])
+        return text
+
+    def text(self, note_id, rev):
+        """The note text at a revision, or None if that revision is not kept"""
+        entries = self.entries(note_id)
+        for index, entry in enumerate(entries):
+            if entry["rev"] == rev:
+                return self.rebuild(entries, index)
+        return None
+
+    def record(self, note_id, title, text, previous_text=None):
+        """
+        Append a revision unless it matches the latest one. previous_text, the
+        text the note had before this change, saves rebuilding the latest
+        revision when it is the one stored.
+        """
+        last, count, since_keyframe = self.tail(note_id)
+        digest = text_digest(text)
+        entry = {"rev": 1, "time": datetime.now().isoformat(), "title": title, "sha": digest}
+        if last is not None:
+            if last["sha"] == digest and last["title"] == title:
+                return False
+            entry["rev"] = last["rev"] + 1
+            if previous_text is None or text_digest(previous_text) != last["sha"]:
+                previous_text = self.text(note_id, last["rev"])
+            patch = text_patch(previous_text, text)
+            if since_keyframe < self.KEYFRAME_EVERY and len(json.dumps(patch)) < len(text) // 2:
+                entry["patch"] = patch
+        if "patch" not in entry:
+            entry["text"] = text
+
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(note_id), "a", encoding="utf-8") as f:
+            f.write(line)
+        if self.total_bytes is not None:
+            self.total_bytes += len(line.encode("utf-8"))
+        self.remember_tail(note_id, entry, count + 1, 1 if "text" in entry else since_keyframe + 1)
+        if count + 1 > self.MAX_REVISIONS:
+            self.trim(note_id, self.MAX_REVISIONS * 3 // 4)
+        self.enforce_budget()
+        return True
+
+    def trim(self, note_id, keep):
+        """Drop all but the newest keep revisions, turning the oldest kept one into a keyframe"""
+        entries = self.entries(note_id)
+        if len(entries) <= keep:
+            return
+        first = len(entries) - keep
+        kept = [dict(entries[first], text=self.rebuild(entries, first))] + entries[first + 1:]
+        kept[0].pop("patch", None)
+        path = self.path(note_id)
+        old_size = os.path.getsize(path)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            for entry in kept:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(f"{path}.tmp", path)
+        if self.total_bytes is not None:
+            self.total_bytes += os.path.getsize(path) - old_size
+        since_keyframe = next(i for i, entry in enumerate(reversed(kept)) if "text" in entry) + 1
+        self.remember_tail(note_id, kept[-1], len(kept), since_keyframe)
+
+    def file_sizes(self):
+        try:
+            with os.scandir(self.directory) as files:
+                return {entry.name[:-len(".jsonl")]: entry.stat().st_size for entry in files if entry.name.endswith(".jsonl")}
+        except FileNotFoundError:
+            return {}
+
+    def enforce_budget(self):
+        """Halve the largest histories until all of them fit in MAX_BYTES again"""
+        if self.total_bytes is None:
+            self.total_bytes = sum(self.file_sizes().values())
+        if self.total_bytes <= self.MAX_BYTES:
+            return
+        sizes = self.file_sizes()
+        for note_id in sorted(sizes, key=sizes.get, reverse=True):
+            if self.total_bytes <= self.MAX_BYTES * 3 // 4:
+                break
+            revisions = self.tail(note_id)[1]
+            if revisions > 1:
+                self.trim(note_id, revisions // 2)
+            else:
+                self.forget(note_id)
+
+    def forget(self, note_id):
+        self.tails.pop(note_id, None)
+        try:
+            size = os.path.getsize(self.path(note_id))
+            os.remove(self.path(note_id))
+        except OSError:
+            return
+        if self.total_bytes is not None:
+            self.total_bytes -= size
+
+    def forget_missing(self, note_ids, older_than_days=30):
+        """Remove the history of notes that no longer exist once it has not changed for older_than_days"""
+        cutoff = time.time() - older_than_days * 86400
+        removed = 0
+        for note_id in self.file_sizes():
+            if note_id not in note_ids and os.path.getmtime(self.path(note_id)) < cutoff:
+                self.forget(note_id)
+                removed += 1
+        return removed
+
+
+class DraftStore:
+    """
+    Unsaved editor drafts, one JSON file per draft under drafts/. put() and
+    discard() only queue the change, so callers never wait for the disk; a
+    background thread writes the queue, keeping just the latest version of
+    each draft when several arrive before it catches up.
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        self.pending = {}
+        self.writing = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self):
+        """Drafts left on disk, newest first"""
+        drafts = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return drafts
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    drafts.append(json.load(f))
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Skipping unreadable draft {name}: {e}")
+        return sorted(drafts, key=lambda draft: draft.get("saved_at") or "", reverse=True)
+
+    def put(self, key, draft):
+        with self.condition:
+            self.pending[key] = draft
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="draft-writer", daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+
+    def discard(self, key):
+        self.put(key, None)
+
+    def rename(self, renames):
+        """Move the drafts of notes whose ids changed (an old id to new id dict) to the new ids"""
+        for old_id, new_id in renames.items():
+            with self.condition:
+                queued = old_id in self.pending
+                draft = self.pending.get(old_id)
+            if not queued:
+                try:
+                    with open(self.path(old_id), "r", encoding="utf-8") as f:
+                        draft = json.load(f)
+                except FileNotFoundError:
+                    continue
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"Could not move draft {old_id}: {e}")
+                    continue
+            if draft is not None:
+                self.put(new_id, dict(draft, key=new_id, note_id=new_id))
+            self.discard(old_id)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                batch, self.pending = self.pending, {}
+                self.writing = True
+            for key, draft in batch.items():
+                try:
+                    if draft is None:
+                        if os.path.exists(self.path(key)):
+                            os.remove(self.path(key))
+                    else:
+                        os.makedirs(self.directory, exist_ok=True)
+                        atomic_write_json(self.path(key), draft)
+                except OSError as e:
+                    print(f"Could not write draft {key}: {e}")
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+    def flush(self, timeout=5):
+        """Wait until every queued draft is on disk; returns False on timeout"""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.pending and not self.writing, timeout)
+
+    def close(self, timeout=5):
+        self.flush(timeout)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+
+DEFAULT_CATEGORY_COLORS = {
+    "Uncategorized": "#FFFFFF",
+    "Amogus": "#FF69B4",
+    "Work": "#228B22",
+    "Personal": "#1E90FF",
+    "Important": "#FF8C00"
+}
+DEFAULT_CATEGORY_COLOR = "#FFFFFF"
+
+
+def contrasting_text_color(hex_color):
+    """Black or white text for a #RRGGBB background, without going through QColor"""
+    value = hex_color.lstrip("#")
+    if len(value) == 3:
+        value = "".join(c * 2 for c in value)
+    try:
+        red, green, blue = int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+    except ValueError:
+        return "#000000"
+    luminance = (0.299 * red + 0.587 * green + 0.114 * blue) / 255
+    return "#FFFFFF" if luminance < 0.5 else "#000000"
+
+
+class CategoryTable:
+    """Persisted per-category metadata (color, sort order, created_at).
+
+    The background and contrasting text color of every category are cached in
+    ``styles`` so building a card or tag is a plain dict lookup.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.entries = {}
+        self.styles = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = {name: entry for name, entry in json.load(f).items() if isinstance(entry, dict)}
+            except (json.JSONDecodeError, AttributeError) as e:
+                print(f"Error reading category table {self.path}: {e}. Using default colors.")
+                self.entries = {}
+        self.styles = {name: self._style_for(entry) for name, entry in self.entries.items()}
+
+    def save(self):
+        if self.dirty:
+            atomic_write_json(self.path, self.entries, indent=4)
+            self.dirty = False
+
+    def _style_for(self, entry):
+        color = entry.get("color") or DEFAULT_CATEGORY_COLOR
+        return color, contrasting_text_color(color)
+
+    def style(self, name):
+        """(background, text) colors for a category"""
+        style = self.styles.get(name)
+        if style is None:
+            color = DEFAULT_CATEGORY_COLORS.get(name, DEFAULT_CATEGORY_COLOR)
+            style = self.styles[name] = (color, contrasting_text_color(color))
+        return style
+
+    def color(self, name):
+        return self.style(name)[0]
+
+    def get(self, name):
+        entry = self.entries.get(name)
+        return dict(entry) if entry is not None else None
+
+    def set_entry(self, name, entry):
+        """Replace or (with entry=None) remove the metadata of a category"""
+        if entry is None:
+            self.entries.pop(name, None)
+            self.styles.pop(name, None)
+        else:
+            self.entries[name] = dict(entry)
+            self.styles[name] = self._style_for(entry)
+        self.dirty = True
+
+    def new_entry(self, name, color=None):
+        sort_order = max([entry.get("sort_order", 0) for entry in self.entries.values()] or [0]) + 1
+        return {
+            "color": color or DEFAULT_CATEGORY_COLORS.get(name, DEFAULT_CATEGORY_COLOR),
+            "sort_order": sort_order,
+            "created_at": datetime.now().isoformat()
+        }
+
+    def ensure(self, name, color=None):
+        if name not in self.entries:
+            self.set_entry(name, self.new_entry(name, color))
+
+    def set_color(self, name, color):
+        entry = self.get(name) or self.new_entry(name)
+        if entry.get("color") != color:
+            entry["color"] = color
+            self.set_entry(name, entry)
+
+    def sort_key(self, name):
+        entry = self.entries.get(name)
+        return (entry.get("sort_order", 0) if entry else float("inf"), name.lower())
+
+
+class HybridClock:
+    """
+    Hybrid logical clock for ordering note changes across replicas. Stamps
+    are strings "<wall ms>.<counter>.<node id>" with fixed-width numbers, so
+    they compare like time, never go backwards when the wall clock does, and
+    two replicas can never issue the same stamp.
+    """
+
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self.wall_ms = 0
+        self.counter = 0
+
+    def tick(self):
+        now_ms = int(time.time() * 1000)
+        if now_ms > self.wall_ms:
+            self.wall_ms = now_ms
+            self.counter = 0
+        else:
+            self.counter += 1
+        return f"{self.wall_ms:015d}.{self.counter:05d}.{self.node_id}"
+
+    def observe(self, stamp):
+        """Move past a stamp seen elsewhere so the next tick orders after it"""
+        try:
+            wall_ms, counter, _ = stamp.split(".", 2)
+            seen = (int(wall_ms), int(counter))
+        except (AttributeError, ValueError):
+            return
+        if seen > (self.wall_ms, self.counter):
+            self.wall_ms, self.counter = seen
+
+
+def stamp_time(stamp):
+    try:
+        return datetime.fromtimestamp(int(stamp.split(".", 1)[0]) / 1000)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+ULID_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ULID_RANDOM_BITS = 80
+LEGACY_ID = re.compile(r"(\d{14})(\d{6})?")
+
+
+def encode_ulid(ms, randomness):
+    """26 Crockford base32 characters: 48 bits of Unix milliseconds, then 80 bits of randomness"""
+    value = (ms << ULID_RANDOM_BITS) | randomness
+    chars = []
+    for _ in range(26):
+        chars.append(ULID_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def is_ulid(note_id):
+    return (isinstance(note_id, str) and len(note_id) == 26 and note_id[0] <= "7"
+            and all(char in ULID_ALPHABET for char in note_id))
+
+
+def hashed_ulid(ms, key):
+    """A ULID whose random part comes from hashing key, so every replica derives the same id"""
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return encode_ulid(ms, int.from_bytes(digest[:ULID_RANDOM_BITS // 8], "big"))
+
+
+def legacy_id_us(note_id, note_data=None):
+    """
+    Microseconds for an id from before ULIDs: the timestamp digits it starts
+    with, read as UTC so replicas in other time zones agree, else the note's
+    created_at, else 0.
+    """
+    match = LEGACY_ID.match(note_id)
+    candidates = []
+    if match:
+        try:
+            candidates.append(datetime.strptime(match.group(1) + (match.group(2) or "000000"), "%Y%m%d%H%M%S%f"))
+        except ValueError:
+            pass
+    if isinstance(note_data, dict) and note_data.get("created_at"):
+        try:
+            candidates.append(datetime.fromisoformat(note_data["created_at"]).replace(tzinfo=None))
+        except (TypeError, ValueError):
+            pass
+    for moment in candidates:
+        us = (moment - datetime(1970, 1, 1)) // timedelta(microseconds=1)
+        if 0 <= us < 2 ** 48 * 1000:
+            return us
+    return 0
+
+
+def migrated_note_id(note_id, note_data=None):
+    """
+    The ULID that replaces a legacy note id, the same on every replica. The
+    sub-millisecond part of the old timestamp leads the random bits, so
+    migrated ids keep the order the old ones had.
+    """
+    us = legacy_id_us(note_id, note_data)
+    digest = hashlib.sha256(note_id.encode("utf-8")).digest()
+    randomness = ((us % 1000) << 70) | (int.from_bytes(digest[:9], "big") >> 2)
+    return encode_ulid(us // 1000, randomness)
+
+
+class NoteIdGenerator:
+    """
+    ULID-style note ids: time-ordered, so sorting ids sorts notes by creation,
+    and with 80 random bits, so ids made on different devices never collide.
+    Ids made in the same millisecond count up from the previous one, so they
+    are unique and stay in creation order within a process.
+    """
+
+    def __init__(self):
+        self.last_ms = 0
+        self.last_random = 0
+
+    def new(self):
+        now_ms = int(time.time() * 1000)
+        if now_ms > self.last_ms:
+            self.last_ms = now_ms
+            self.last_random = int.from_bytes(os.urandom(ULID_RANDOM_BITS // 8), "big")
+        else:
+            self.last_random += 1
+            if self.last_random >= 2 ** ULID_RANDOM_BITS:
+                self.last_ms += 1
+                self.last_random = 0
+        return encode_ulid(self.last_ms, self.last_random)
+
+
+def default_data_dir(app_name="AmogOSNotes"):
+    return Path.home() / f".{app_name.lower()}_data"
+
+
+class NotesStore:
+    """
+    Everything about notes that does not need Qt: metadata in notes.json,
+    bodies in a NoteBodyStore, the category index and colour table, and the
+    transaction journal. Shared by MainWindow and the command line.
+
+    Mutators only change memory; call save() to persist. save() merges
+    changes another process made to notes.json since we last read or wrote
+    it, reporting conflicting notes through on_conflicts(titles), and calls
+    on_saved() once notes.json has been replaced.
+
+    Every change gives the note a new HybridClock stamp in its "hlc" field,
+    and permanent deletions leave a stamped tombstone in replica.json, so
+    notes_sync can tell which notes changed and which edit is newer.
+
+    The first process to load a data directory takes its OwnerLock and is
+    the only one that compacts, migrates or recovers the journal; the others
+    (usually the cli next to a running window) just read and write notes.
+    """
+
+    EXPIRY_DAYS = 30
+    TOMBSTONE_DAYS = 90
+    UNDO_LIMIT = 100
+    UNDO_MAX_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, data_dir):
+        self.data_dir = str(data_dir)
+        self.notes_file = os.path.join(self.data_dir, "notes.json")
+        self.notes = {}
+        self.body_store = NoteBodyStore(self.data_dir)
+        self.category_index = CategoryIndex()
+        self.category_table = CategoryTable(os.path.join(self.data_dir, "categories.json"))
+        self.journal = NotesJournal(os.path.join(self.data_dir, "notes.journal"), max_bytes=self.UNDO_MAX_BYTES)
+        self.history = RevisionStore(os.path.join(self.data_dir, "history"))
+        self.owner_lock = OwnerLock(os.path.join(self.data_dir, "store.lock"))
+        self.owner = False
+        self.replica_file = os.path.join(self.data_dir, "replica.json")
+        self.node_id = None
+        self.clock = None
+        self.tombstones = {}
+        self.sync_bases = {}
+        self.sync_folder = None
+        self.sync_key = None
+        self.ids = NoteIdGenerator()
+        self.undo_stack = []
+        self.redo_stack = []
+        self.base = {}
+        self.file_state = None
+        self.on_conflicts = None
+        self.on_saved = None
+        self.on_renamed = None
+
+    def load(self):
+        """Read notes.json and recover journaled transactions; returns False if notes.json was unreadable"""
+        readable = True
+        self.notes = {}
+        os.makedirs(self.data_dir, exist_ok=True)
+        if os.path.exists(self.notes_file):
+            try:
+                with open(self.notes_file, "r") as f:
+                    self.notes = json.load(f)
+            except json.JSONDecodeError:
+                readable = False
+        self.remember_file_state(self.notes)
+        self.load_replica()
+
+        self.owner = self.owner_lock.acquire()
+        if self.owner:
+            self.migrate_bodies()
+            self.body_store.compact()
+            self.body_store.remove_stale_data_files()
+        self.category_index.rebuild(self.notes)
+        journal_entries = self.journal.load()
+        if self.owner:
+            self.replay_journal(journal_entries)
+            self.migrate_ids()
+        self.load_history(journal_entries)
+        return readable
+
+    def read_replica_file(self):
+        try:
+            with open(self.replica_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reading {self.replica_file}: {e}")
+            return {}
+
+    def load_replica(self):
+        """Read this replica's node id, tombstones and sync bases, and start the clock after every known stamp"""
+        replica = self.read_replica_file()
+        self.node_id = replica.get("node_id") or uuid.uuid4().hex[:12]
+        self.tombstones = replica.get("tombstones", {})
+        self.sync_bases = replica.get("sync_bases", {})
+        # Older versions keyed a server's base by its whole URL, ?token=... included
+        for key in [key for key in self.sync_bases if "://" in key and "?" in key]:
+            self.sync_bases.setdefault(key.split("?", 1)[0].rstrip("/"), self.sync_bases.pop(key))
+        self.clock = HybridClock(self.node_id)
+        for stamp in self.tombstones.values():
+            self.clock.observe(stamp)
+        for note_data in self.notes.values():
+            if isinstance(note_data, dict):
+                self.clock.observe(note_data.get("hlc"))
+        if not replica.get("node_id"):
+            self.save_replica()
+
+    def save_replica(self):
+        """Write replica.json, keeping tombstones another process of this replica added and dropping expired ones"""
+        on_disk = self.read_replica_file()
+        for note_id, stamp in on_disk.get("tombstones", {}).items():
+            if note_id not in self.notes and stamp > self.tombstones.get(note_id, ""):
+                self.tombstones[note_id] = stamp
+        cutoff = datetime.now() - timedelta(days=self.TOMBSTONE_DAYS)
+        self.tombstones = {note_id: stamp for note_id, stamp in self.tombstones.items()
+                           if (stamp_time(stamp) or cutoff) >= cutoff}
+        atomic_write_json(self.replica_file, {
+            "node_id": self.node_id,
+            "tombstones": self.tombstones,
+            "sync_bases": self.sync_bases
+        }, indent=1)
+
+    def touch(self, note_id):
+        """Stamp a changed note with the clock"""
+        note_data = self.notes.get(note_id)
+        if isinstance(note_data, dict):
+            note_data["hlc"] = self.clock.tick()
+            self.tombstones.pop(note_id, None)
+
+    def migrate_bodies(self):
+        """Move inline note content from notes.json into the body store"""
+        migrated = 0
+        for note_id, note_data in self.notes.items():
+            if isinstance(note_data, dict) and "content" in note_data:
+                self.body_store.put(note_id, note_data.pop("content") or "")
+                migrated += 1
+
+        if migrated:
+            print(f"Moved the content of {migrated} notes into the body store")
+            self.save()
+
+    def migrate_ids(self, arrived=()):
+        """
+        Rename notes whose ids predate ULIDs. The new id is derived from the
+        old one, so replicas that migrate separately agree on it, and the
+        note keeps its stamp. Old ids a sync location knows about, or that
+        just arrived from one (arrived), get a tombstone, so replicas still
+        on old ids drop them for the new ones.
+
+        When the new id is taken, the note was migrated before and an old
+        replica brought it back under its old id; the two copies are merged
+        by keeping the one with the newer stamp. Histories move with the
+        notes, and on_renamed(renames) lets the app move its own state.
+        """
+        renames = {note_id: migrated_note_id(note_id, note_data) for note_id, note_data in self.notes.items()
+                   if not is_ulid(note_id)}
+        if not renames:
+            return 0
+
+        synced = {old for old in renames if old in arrived}
+        for sync_base in self.sync_bases.values():
+            known = sync_base.get("notes", {})
+            synced.update(old for old in renames if old in known)
+            for old, new in renames.items():
+                if old in known and new not in known:
+                    known[new] = known[old]
+        stamp = lambda note_data: (note_data.get("hlc") or "") if isinstance(note_data, dict) else ""
+        for old, new in renames.items():
+            record = self.notes.pop(old)
+            current = self.notes.get(new)
+            if current is None or stamp(record) > stamp(current):
+                if current is not None:
+                    print(f"Note {old} came back after it was renamed to {new}; its newer version replaces that note")
+                self.notes[new] = record
+                self.body_store.adopt(new, self.body_store.index.get(old))
+                if not self.history.rename(old, new) and current is not None:
+                    self.record_revision(new)
+            else:
+                print(f"Note {old} came back after it was renamed to {new}; kept the newer version already there")
+            self.body_store.adopt(old, None)
+            if old in synced:
+                self.tombstones[old] = self.clock.tick()
+        self.category_index.rebuild(self.notes)
+        print(f"Gave {len(renames)} notes time-ordered ids")
+        if self.on_renamed:
+            self.on_renamed(renames)
+        self.save()
+        return len(renames)
+
+    def get_content(self, note_id):
+        return self.body_store.get(note_id)
+
+    def record_revision(self, note_id, previous=None):
+        """
+        Add a note's current title and text to its history. previous is its
+        (title, text) before the change, kept as the first revision of notes
+        that have no history yet. History is best effort and never fails a save.
+        """
+        note_data = self.notes.get(note_id)
+        if not isinstance(note_data, dict):
+            return
+        try:
+            if previous is not None and not self.history.has_history(note_id):
+                self.history.record(note_id, *previous)
+            self.history.record(note_id, note_data.get("title", ""), self.body_store.get(note_id),
+                                previous[1] if previous else None)
+        except (OSError, ValueError) as e:
+            print(f"Could not record the history of note {note_id}: {e}")
+
+    def get_preview(self, note_id, max_chars=101):
+        return self.body_store.get_preview(note_id, max_chars)
+
+    def save(self):
+        self.save_notes()
+        self.save_categories()
+
+    def save_notes(self):
+        # Merge first: flushing would overwrite the body index another process just wrote
+        if self.changed_on_disk():
+            self.merge_external()
+        self.body_store.flush()
+        atomic_write_json(self.notes_file, self.notes, indent=4)
+        self.remember_file_state(self.notes)
+        self.save_replica()
+        if self.on_saved:
+            self.on_saved()
+
+    def save_categories(self):
+        self.category_table.save()
+
+    def close(self):
+        self.body_store.close()
+        self.owner_lock.release()
+
+    def read_file_state(self):
+        try:
+            stat = os.stat(self.notes_file)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def remember_file_state(self, notes_on_disk):
+        """Record what notes.json holds now: the merge base and the stat used to recognise our own writes"""
+        self.base = {note_id: dict(note_data) if isinstance(note_data, dict) else note_data
+                     for note_id, note_data in notes_on_disk.items()}
+        self.file_state = self.read_file_state()
+
+    def changed_on_disk(self):
+        return self.read_file_state() != self.file_state
+
+    def merge_external(self):
+        """
+        Three-way merge notes.json as written by another process into memory.
+        Only records that differ are touched; conflicting edits keep the later
+        version and save the other one as a conflicted copy. Returns True when
+        the notes changed.
+        """
+        try:
+            with open(self.notes_file, "r") as f:
+                theirs = json.load(f)
+        except FileNotFoundError:
+            theirs = {}
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Could not read externally changed {self.notes_file}: {e}")
+            return False
+
+        merged, from_theirs, conflicts = merge_notes(self.base, self.notes, theirs)
+        disk_bodies = self.body_store.disk_entries()
+
+        conflicted_titles = []
+        for note_id, losing_record, losing_side in conflicts:
+            conflicted_titles.append((losing_record or merged.get(note_id) or {}).get("title") or "Untitled")
+            if losing_record is None:
+                continue
+            if losing_side == "theirs":
+                content = self.body_store.read_entry(disk_bodies.get(note_id))
+            else:
+                content = self.body_store.get(note_id)
+            copy_id = self.generate_id()
+            while copy_id in merged:
+                copy_id = self.generate_id()
+            merged[copy_id] = dict(losing_record, title=f"{losing_record.get('title', '')} (conflicted copy)",
+                                   hlc=self.clock.tick())
+            self.body_store.put(copy_id, content)
+            self.category_index.add(copy_id, merged[copy_id].get("category"), merged[copy_id].get("deleted", False))
+
+        for note_id in from_theirs:
+            if isinstance(merged.get(note_id), dict):
+                self.clock.observe(merged[note_id].get("hlc"))
+            previous = self.notes.get(note_id)
+            if isinstance(previous, dict):
+                self.category_index.remove(note_id, previous.get("category"), previous.get("deleted", False))
+            current = merged.get(note_id)
+            if isinstance(current, dict):
+                self.category_index.add(note_id, current.get("category"), current.get("deleted", False))
+            self.body_store.adopt(note_id, disk_bodies.get(note_id))
+
+        self.remember_file_state(theirs)
+        if not from_theirs and not conflicts:
+            return False
+
+        self.notes.clear()
+        self.notes.update(merged)
+        print(f"Merged {len(from_theirs)} externally changed notes from {self.notes_file}")
+        if conflicted_titles and self.on_conflicts:
+            self.on_conflicts(conflicted_titles)
+        return True
+
+    def generate_id(self):
+        return self.ids.new()
+
+    def expire(self, now=None):
+        """Drop temporary notes and recycle bin entries older than EXPIRY_DAYS, plus corrupted records"""
+        now = now or datetime.now()
+        notes_to_delete = []
+
+        for note_id, note_data in self.notes.items():
+            if not isinstance(note_data, dict):
+                print(f"Warning: Corrupted note data found for ID {note_id}. Skipping...")
+                notes_to_delete.append(note_id)
+                continue
+
+            try:
+                if note_data.get("temporary", False):
+                    created_at = datetime.fromisoformat(note_data.get("created_at") or now.isoformat())
+                    if (now - created_at).days >= self.EXPIRY_DAYS:
+                        notes_to_delete.append(note_id)
+                        continue
+
+                if note_data.get("deleted", False):
+                    deleted_at = datetime.fromisoformat(note_data.get("deleted_at") or now.isoformat())
+                    if (now - deleted_at).days >= self.EXPIRY_DAYS:
+                        notes_to_delete.append(note_id)
+            except (ValueError, TypeError, KeyError) as e:
+                print(f"Warning: Error processing note {note_id}: {str(e)}. Skipping...")
+                continue
+
+        for note_id in notes_to_delete:
+            self.delete_permanently(note_id)
+        self.history.forget_missing(self.notes, self.EXPIRY_DAYS)
+        return len(notes_to_delete)
+
+    def add_or_update(self, note_id=None, title="", content="", is_temporary=False, category=None):
+        """Create a note (note_id=None) or replace an existing note's title, body and flags; returns its id"""
+        previous = self.notes.get(note_id) if note_id else None
+        now = datetime.now().isoformat()
+        if not note_id:
+            note_id = self.generate_id()
+        previous_data = previous if isinstance(previous, dict) else {}
+        if category is None:
+            category = previous_data.get("category", "Uncategorized")
+
+        if previous is not None:
+            self.category_index.remove(note_id, previous_data.get("category"), previous_data.get("deleted", False))
+        previous_version = (previous_data.get("title", ""), self.body_store.get(note_id)) if previous is not None else None
+        self.body_store.put(note_id, content)
+        self.notes[note_id] = {
+            "title": title,
+            "created_at": previous_data.get("created_at", now),
+            "updated_at": now,
+            "category": category or "Uncategorized",
+            "favorite": previous_data.get("favorite", False),
+            "temporary": is_temporary,
+            "deleted": previous_data.get("deleted", False),
+            "deleted_at": previous_data.get("deleted_at", None)
+        }
+        self.touch(note_id)
+        self.category_index.add(note_id, self.notes[note_id]["category"], self.notes[note_id]["deleted"])
+        self.record_revision(note_id, previous_version)
+        return note_id
+
+    def import_batch(self, records):
+        """Add parsed note records in one go; returns (new ids, [(source, error)] for records that failed to parse)"""
+        note_ids = []
+        failures = []
+        for record in records:
+            if "error" in record:
+                failures.append((record["source"], record["error"]))
+                continue
+            note_id = self.generate_id()
+            while note_id in self.notes:
+                note_id = self.generate_id()
+            category = record.get("category") or "Uncategorized"
+            self.body_store.put(note_id, record.get("content", ""))
+            self.notes[note_id] = {
+                "title": record.get("title", ""),
+                "created_at": record.get("created_at") or record.get("updated_at"),
+                "updated_at": record.get("updated_at"),
+                "category": category,
+                "favorite": False,
+                "temporary": False,
+                "deleted": False,
+                "deleted_at": None,
+                "hlc": self.clock.tick()
+            }
+            self.category_index.add(note_id, category)
+            if category != "Uncategorized":
+                self.category_table.ensure(category)
+            note_ids.append(note_id)
+        return note_ids, failures
+
+    def stamp_unstamped(self):
+        """Stamp notes saved before sync existed or edited by hand; returns how many needed one"""
+        unstamped = [note_id for note_id, note_data in self.notes.items()
+                     if isinstance(note_data, dict) and not note_data.get("hlc")]
+        for note_id in unstamped:
+            self.touch(note_id)
+        return len(unstamped)
+
+    def apply_remote(self, note_id, record, content):
+        """Create or replace a note with another replica's version, keeping its stamp"""
+        previous = self.notes.get(note_id)
+        previous_version = None
+        if isinstance(previous, dict):
+            self.category_index.remove(note_id, previous.get("category"), previous.get("deleted", False))
+            previous_version = (previous.get("title", ""), self.body_store.get(note_id))
+        self.notes[note_id] = record
+        self.body_store.put(note_id, content)
+        self.category_index.add(note_id, record.get("category"), record.get("deleted", False))
+        self.clock.observe(record.get("hlc"))
+        self.tombstones.pop(note_id, None)
+        # A note this replica never had has no earlier version to keep, and
+        # recording it would copy the whole library into history on first sync
+        if previous_version is not None:
+            self.record_revision(note_id, previous_version)
+
+    def apply_remote_delete(self, note_id, stamp):
+        """Delete a note because another replica deleted it, keeping that replica's tombstone stamp"""
+        note_data = self.notes.pop(note_id, None)
+        if isinstance(note_data, dict):
+            self.category_index.remove(note_id, note_data.get("category"), note_data.get("deleted", False))
+        self.body_store.delete(note_id)
+        self.tombstones[note_id] = stamp
+        self.clock.observe(stamp)
+
+    def toggle_favorite(self, note_id):
+        note_data = self.notes.get(note_id)
+        if note_data is None:
+            return False
+        note_data["favorite"] = not note_data.get("favorite", False)
+        self.touch(note_id)
+        return True
+
+    def move_to_recycle_bin(self, note_id):
+        note_data = self.notes.get(note_id)
+        if note_data is None:
+            return False
+        if not note_data.get("deleted", False):
+            self.category_index.set_deleted(note_id, note_data.get("category"), True)
+        note_data["deleted"] = True
+        note_data["deleted_at"] = datetime.now().isoformat()
+        self.touch(note_id)
+        return True
+
+    def restore(self, note_id):
+        note_data = self.notes.get(note_id)
+        if note_data is None:
+            return False
+        if note_data.get("deleted", False):
+            self.category_index.set_deleted(note_id, note_data.get("category"), False)
+        note_data["deleted"] = False
+        note_data["deleted_at"] = None
+        self.touch(note_id)
+        return True
+
+    def delete_permanently(self, note_id):
+        note_data = self.notes.pop(note_id, None)
+        if isinstance(note_data, dict):
+            self.category_index.remove(note_id, note_data.get("category"), note_data.get("deleted", False))
+        self.body_store.delete(note_id)
+        if note_data is not None:
+            self.tombstones[note_id] = self.clock.tick()
+        return note_data is not None
+
+    def set_category(self, note_id, category):
+        note_data = self.notes.get(note_id)
+        if note_data is None:
+            return False
+        self.category_index.move(note_id, note_data.get("category"), category, note_data.get("deleted", False))
+        note_data["category"] = category
+        self.touch(note_id)
+        return True
+
+    def categories(self):
+        """Known categories (excluding Uncategorized) in the user's sort order"""
+        for category in self.category_index.categories():
+            self.category_table.ensure(category)
+        return sorted(self.category_index.categories(), key=self.category_table.sort_key)
+
+    def ensure_category(self, name, color=None):
+        self.category_index.ensure(name)
+        self.category_table.ensure(name, color)
+
+    def move_category(self, category, new_category, label, color=None):
+        """Refile only the notes indexed under category, as a single undoable transaction"""
+        ops = [{"id": note_id, "field": "category", "old": self.notes[note_id].get("category"), "new": new_category}
+               for note_id in self.category_index.note_ids(category)]
+
+        old_entry = self.category_table.get(category)
+        if new_category != "Uncategorized":
+            target_entry = self.category_table.get(new_category)
+            new_entry = target_entry or old_entry or self.category_table.new_entry(new_category)
+            if color:
+                new_entry = dict(new_entry, color=color)
+            if new_entry != target_entry:
+                ops.append({"category": new_category, "field": "meta", "old": target_entry, "new": new_entry})
+        if old_entry is not None:
+            ops.append({"category": category, "field": "meta", "old": old_entry, "new": None})
+
+        if ops:
+            self.commit_transaction(label, ops)
+        if new_category != "Uncategorized" and self.category_index.count(new_category) == 0:
+            self.category_index.ensure(new_category)
+        self.category_index.forget(category)
+
+    def apply_ops(self, ops):
+        """
+        Apply a transaction's operations to the in-memory notes, bodies and
+        category index. Field ops set one metadata field, record ops create
+        (old None) or permanently delete (new None) a note, content ops patch
+        its body, and category ops change the colour table.
+        """
+        touched = set()
+        revised = {}
+        for op in ops:
+            if "category" in op:
+                self.category_table.set_entry(op["category"], op["new"])
+                continue
+            note_id = op["id"]
+            note_data = self.notes.get(note_id)
+            if op["field"] == "record":
+                if isinstance(note_data, dict):
+                    self.category_index.remove(note_id, note_data.get("category"), note_data.get("deleted", False))
+                if op["new"] is None:
+                    if self.notes.pop(note_id, None) is not None:
+                        self.tombstones[note_id] = self.clock.tick()
+                    self.body_store.delete(note_id)
+                    touched.discard(note_id)
+                else:
+                    self.notes[note_id] = dict(op["new"])
+                    self.category_index.add(note_id, op["new"].get("category"), op["new"].get("deleted", False))
+                    touched.add(note_id)
+                continue
+            if op["field"] == "content":
+                current = self.body_store.get(note_id)
+                try:
+                    self.body_store.put(note_id, apply_text_patch(current, op["patch"]))
+                except ValueError as e:
+                    print(f"Skipping a text change to note {note_id}: {e}")
+                    continue
+                if isinstance(note_data, dict):
+                    revised.setdefault(note_id, (note_data.get("title", ""), current))
+                touched.add(note_id)
+                continue
+            if not isinstance(note_data, dict):
+                continue
+            if op["field"] == "category":
+                self.category_index.move(note_id, note_data.get("category"), op["new"], note_data.get("deleted", False))
+            elif op["field"] == "deleted":
+                self.category_index.set_deleted(note_id, note_data.get("category"), bool(op["new"]))
+            note_data[op["field"]] = op["new"]
+            touched.add(note_id)
+        for note_id in touched:
+            self.touch(note_id)
+        for note_id, previous in revised.items():
+            self.record_revision(note_id, previous)
+
+    def note_snapshot(self, note_id):
+        """(record copy, body index entry); the body bytes stay readable because the data file is append-only"""
+        note_data = self.notes.get(note_id)
+        return (dict(note_data) if isinstance(note_data, dict) else None), self.body_store.index.get(note_id)
+
+    def note_ops(self, note_id, before, after):
+        """Operations that turn snapshot before into snapshot after: changed fields, or the whole record, plus a text patch"""
+        old_record, old_entry = before
+        new_record, new_entry = after
+        ops = []
+        if old_entry != new_entry:
+            patch = text_patch(self.body_store.read_entry(old_entry), self.body_store.read_entry(new_entry))
+            if patch:
+                ops.append({"id": note_id, "field": "content", "patch": patch})
+        strip = lambda record: {k: v for k, v in record.items() if k != "hlc"} if record is not None else None
+        old_record, new_record = strip(old_record), strip(new_record)
+        if old_record is None or new_record is None:
+            if old_record != new_record:
+                record_op = {"id": note_id, "field": "record", "old": old_record, "new": new_record}
+                # A new note needs its record before its text; a deleted one loses its text first
+                ops = ops + [record_op] if new_record is None else [record_op] + ops
+            return ops
+        field_ops = [{"id": note_id, "field": field, "old": old_record.get(field), "new": new_record.get(field)}
+                     for field in sorted(set(old_record) | set(new_record)) if old_record.get(field) != new_record.get(field)]
+        return field_ops + ops
+
+    def record(self, label, note_ids, mutate):
+        """
+        Run mutate(), which changes the given notes through the usual
+        mutators, then journal and save the difference as one undoable
+        transaction. Returns what mutate() returned; raises OSError if the
+        change could not be journaled, after putting the notes back.
+        """
+        before = {note_id: self.note_snapshot(note_id) for note_id in note_ids}
+        result = mutate()
+        ops = []
+        for note_id, snapshot in before.items():
+            ops.extend(self.note_ops(note_id, snapshot, self.note_snapshot(note_id)))
+        if ops:
+            self.commit_transaction(label, ops, applied=True)
+        return result
+
+    def commit_transaction(self, label, ops, undoable=True, applied=False, **links):
+        """
+        Journal a batch of operations, apply it (unless the caller already
+        has) and persist it with one write; raises OSError if it cannot.
+        links records which transaction an undo or redo reverses.
+        """
+        transaction = dict({"label": label, "time": datetime.now().isoformat(), "ops": ops, "undoable": undoable}, **links)
+        try:
+            transaction["seq"] = self.journal.append(transaction)
+        except OSError:
+            if applied:
+                self.apply_ops([invert_op(op) for op in reversed(ops)])
+            raise
+        if not applied:
+            self.apply_ops(ops)
+        self.save()
+        self.journal.checkpoint(transaction["seq"])
+        if undoable:
+            self.push_undo(transaction)
+            if "redoes" not in links:
+                self.redo_stack.clear()
+        return transaction
+
+    def push_undo(self, transaction):
+        """Add to the undo stack, dropping the oldest entries beyond UNDO_LIMIT or UNDO_MAX_BYTES"""
+        transaction.setdefault("size", len(json.dumps(transaction["ops"])))
+        self.undo_stack.append(transaction)
+        total = sum(entry["size"] for entry in self.undo_stack)
+        while len(self.undo_stack) > 1 and (len(self.undo_stack) > self.UNDO_LIMIT or total > self.UNDO_MAX_BYTES):
+            total -= self.undo_stack.pop(0)["size"]
+
+    def replay_journal(self, entries=None):
+        """Re-apply transactions that were journaled but never made it into notes.json"""
+        pending = self.journal.pending(entries)
+        if not pending:
+            return
+        for transaction in pending:
+            self.apply_ops(transaction["ops"])
+        print(f"Recovered {len(pending)} unsaved transaction(s) from the notes journal")
+        self.save()
+        self.journal.checkpoint(pending[-1]["seq"])
+
+    def load_history(self, entries=None):
+        """Rebuild the undo and redo stacks from the transactions kept in the journal"""
+        self.undo_stack = []
+        self.redo_stack = []
+        for transaction in self.journal.transactions(entries):
+            if "undoes" in transaction:
+                undone = [entry for entry in self.undo_stack if entry["seq"] == transaction["undoes"]]
+                if undone:
+                    self.undo_stack.remove(undone[0])
+                    self.redo_stack.append(undone[0])
+            elif transaction.get("undoable"):
+                if "redoes" in transaction:
+                    self.redo_stack = [entry for entry in self.redo_stack if entry["seq"] != transaction["redoes"]]
+                else:
+                    self.redo_stack.clear()
+                self.push_undo(transaction)
+
+    def undo(self):
+        """Commit the inverse of the most recent undoable transaction; returns its label, or None when there is none"""
+        if not self.undo_stack:
+            return None
+        transaction = self.undo_stack.pop()
+        inverse_ops = [invert_op(op) for op in reversed(transaction["ops"])]
+        try:
+            self.commit_transaction(f"Undo {transaction['label']}", inverse_ops, undoable=False, undoes=transaction["seq"])
+        except OSError:
+            self.undo_stack.append(transaction)
+            raise
+        self.redo_stack.append(transaction)
+        return transaction["label"]
+
+    def redo(self):
+        """Commit again the most recently undone transaction; returns its label, or None when there is none"""
+        if not self.redo_stack:
+            return None
+        transaction = self.redo_stack.pop()
+        try:
+            self.commit_transaction(transaction["label"], transaction["ops"], redoes=transaction["seq"])
+        except OSError:
+            self.redo_stack.append(transaction)
+            raise
+        return transaction["label"]
+
+    def filter_notes(self, view="home", category=None):
+        """(note_id, note_data) pairs shown by a sidebar view: home, favorites, temporary_notes, recycle_bin, synced_notes or category"""
+        if view == "category":
+            if not category:
+                return []
+            items = [(note_id, self.notes[note_id]) for note_id in self.category_index.note_ids(category)
+                     if note_id in self.notes]
+        elif view == "synced_notes":
+            synced = self.sync_bases.get(self.sync_key or "", {}).get("notes", {})
+            items = [(note_id, note_data) for note_id, note_data in self.notes.items()
+                     if isinstance(note_data, dict) and note_data.get("hlc") and synced.get(note_id) == note_data["hlc"]]
+        elif view in ("home", "favorites", "temporary_notes", "recycle_bin"):
+            items = list(self.notes.items())
+        else:
+            return []
+
+        def visible(note_data):
+            if view == "recycle_bin":
+                return note_data.get("deleted", False)
+            if note_data.get("deleted", False):
+                return False
+            if view == "favorites":
+                return note_data.get("favorite", False)
+            if view == "temporary_notes":
+                return note_data.get("temporary", False)
+            return True
+
+        return [(note_id, note_data) for note_id, note_data in items if isinstance(note_data, dict) and visible(note_data)]
+
+    def search(self, search_terms):
+        """Live notes whose title or body contains any of the whitespace-separated terms"""
+        terms = search_terms.lower().split()
+        matching_notes = {}
+        for note_id, note_data in self.notes.items():
+            if not isinstance(note_data, dict) or note_data.get("deleted", False):
+                continue
+            title = note_data.get("title", "").lower()
+            if any(term in title for term in terms):
+                matching_notes[note_id] = note_data
+                continue
+            content = self.get_content(note_id).lower()
+            if any(term in content for term in terms):
+                matching_notes[note_id] = note_data
+        return matching_notes
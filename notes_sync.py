@@ -0,0 +1,470 @@
+"""Sync for AmogOS Notes through a shared folder or a sync server, without Qt."""
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import threading
+from datetime import datetime
+from urllib.parse import parse_qs, quote, unquote, urlencode, urlsplit
+
+from notes_store import BodyReader, atomic_write_json, hashed_ulid, is_ulid
+
+SYNC_DIR_NAME = "AmogOS Notes Sync"
+HTTP_BATCH_SIZE = 200
+
+
+def is_server_url(location):
+    return str(location).startswith(("http://", "https://"))
+
+
+def sync_key(location):
+    """
+    The key a sync folder's or server's base is stored under in replica.json.
+    A server's key leaves out the ?token=... query, so the secret is never
+    written there and a new token keeps the same base.
+    """
+    if is_server_url(location):
+        return display_location(location).rstrip("/")
+    return os.path.abspath(os.path.expanduser(str(location)))
+
+
+def display_location(location):
+    """The location without a ?token=... query, for status messages"""
+    return str(location).split("?", 1)[0] if is_server_url(location) else str(location)
+
+
+def make_target(location):
+    return HttpTarget(location) if is_server_url(location) else FolderTarget(location)
+
+
+def bucket_of(note_id):
+    return hashlib.sha1(note_id.encode("utf-8")).hexdigest()[:2]
+
+
+def merkle_summary(state):
+    """
+    Two-level Merkle summary of a {note_id: (stamp, deleted)} state: notes
+    fall into 256 buckets by a hash of their id, each bucket hashes its
+    sorted (id, stamp, deleted) leaves, and the root hashes the buckets.
+    Stamps are unique per edit, so they stand in for the note content and
+    no bodies have to be read to build the summary.
+    """
+    leaves = {}
+    for note_id, (stamp, deleted) in state.items():
+        leaves.setdefault(bucket_of(note_id), []).append(f"{note_id}\0{stamp}\0{int(bool(deleted))}")
+    buckets = {prefix: hashlib.sha256("\n".join(sorted(entries)).encode("utf-8")).hexdigest()[:16]
+               for prefix, entries in leaves.items()}
+    root = hashlib.sha256("".join(f"{prefix}{buckets[prefix]}" for prefix in sorted(buckets)).encode("ascii")).hexdigest()
+    return root, buckets
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def conflict_copy_id(note_id, losing_stamp):
+    """The same id on every replica that resolves the same conflict, so the copy is only made once"""
+    try:
+        ms = int(losing_stamp.split(".", 1)[0])
+    except ValueError:
+        ms = 0
+    return hashed_ulid(ms, f"{note_id}\0{losing_stamp}")
+
+
+class FolderTarget:
+    """
+    Sync data inside a shared folder. Each replica writes only its own
+    manifest (manifests/<node id>.json, the stamp of every note and
+    tombstone it has) plus immutable note files (notes/<id>@<stamp>.json),
+    so replicas syncing through the folder at the same time never overwrite
+    each other's files.
+    """
+
+    def __init__(self, folder):
+        self.root = os.path.join(sync_key(folder), SYNC_DIR_NAME)
+        self.manifest_dir = os.path.join(self.root, "manifests")
+        self.notes_dir = os.path.join(self.root, "notes")
+
+    def note_path(self, note_id, stamp):
+        return os.path.join(self.notes_dir, f"{quote(note_id, safe='')}@{stamp}.json")
+
+    def read_state(self, local=None):
+        """Newest (stamp, deleted) per note id over all manifests in the folder"""
+        state = {}
+        if not os.path.isdir(self.manifest_dir):
+            return state
+        for name in sorted(os.listdir(self.manifest_dir)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.manifest_dir, name), "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Skipping unreadable sync manifest {name}: {e}")
+                continue
+            for deleted, entries in ((False, manifest.get("notes", {})), (True, manifest.get("deleted", {}))):
+                for note_id, stamp in entries.items():
+                    if note_id not in state or stamp > state[note_id][0]:
+                        state[note_id] = (stamp, deleted)
+        return state
+
+    def read_note(self, note_id, stamp):
+        try:
+            with open(self.note_path(note_id, stamp), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Could not read synced note {note_id}: {e}")
+            return None
+
+    def read_notes(self, wanted):
+        """{note_id: payload} for the (note_id, stamp) pairs in wanted that could be read"""
+        payloads = {}
+        for note_id, stamp in wanted:
+            payload = self.read_note(note_id, stamp)
+            if payload is not None:
+                payloads[note_id] = payload
+        return payloads
+
+    def write_note(self, note_id, stamp, record, content):
+        """Upload one note version; a version that is already in the folder is left alone"""
+        path = self.note_path(note_id, stamp)
+        if os.path.exists(path):
+            return False
+        os.makedirs(self.notes_dir, exist_ok=True)
+        atomic_write_json(path, {"id": note_id, "record": record, "content": content})
+        return True
+
+    def write_manifest(self, node_id, notes, deleted):
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        atomic_write_json(os.path.join(self.manifest_dir, f"{node_id}.json"), {
+            "node_id": node_id,
+            "written_at": datetime.now().isoformat(),
+            "notes": notes,
+            "deleted": deleted
+        })
+
+    def publish(self, node_id, uploads, local, remote):
+        """Upload changed notes, then this replica's manifest, then drop superseded files"""
+        for note_id, stamp, record, content in uploads:
+            self.write_note(note_id, stamp, record, content)
+        self.write_manifest(node_id,
+                            {note_id: stamp for note_id, (stamp, deleted) in local.items() if not deleted},
+                            {note_id: stamp for note_id, (stamp, deleted) in local.items() if deleted})
+        self.collect_garbage(self.read_state())
+
+    def collect_garbage(self, state):
+        """Remove note files superseded by a newer version or a deletion; returns how many went"""
+        if not os.path.isdir(self.notes_dir):
+            return 0
+        removed = 0
+        for name in os.listdir(self.notes_dir):
+            quoted_id, sep, stamp = name[:-len(".json")].rpartition("@")
+            if not name.endswith(".json") or not sep:
+                continue
+            current = state.get(unquote(quoted_id))
+            if current is not None and (current[1] or stamp < current[0]):
+                try:
+                    os.remove(os.path.join(self.notes_dir, name))
+                    removed += 1
+                except OSError as e:
+                    print(f"Could not remove superseded sync file {name}: {e}")
+        return removed
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per server, so repeated requests and syncs skip the TCP and TLS handshakes"""
+
+    def __init__(self, max_idle=2):
+        self.max_idle = max_idle
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def get(self, scheme, netloc):
+        with self.lock:
+            connections = self.idle.get((scheme, netloc))
+            if connections:
+                return connections.pop()
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return connection_class(netloc, timeout=30)
+
+    def put(self, scheme, netloc, connection):
+        with self.lock:
+            connections = self.idle.setdefault((scheme, netloc), [])
+            if len(connections) < self.max_idle:
+                connections.append(connection)
+                return
+        connection.close()
+
+
+connection_pool = ConnectionPool()
+
+
+class HttpTarget:
+    """
+    Sync through a notes_sync_server. The Merkle summaries are compared
+    first, so only buckets whose hashes differ are listed and only notes
+    whose stamps differ are transferred; bodies the server already holds
+    (by content hash) are not uploaded again. Every request and response
+    body is gzip-compressed and requests reuse pooled connections. An
+    optional ?token=... in the URL is sent as a bearer token.
+    """
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.path = parts.path.rstrip("/")
+        self.token = parse_qs(parts.query).get("token", [None])[0]
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.requests = 0
+
+    def request(self, method, path, payload=None):
+        body = gzip.compress(json.dumps(payload).encode("utf-8")) if payload is not None else None
+        headers = {"Accept-Encoding": "gzip"}
+        if body is not None:
+            headers.update({"Content-Type": "application/json", "Content-Encoding": "gzip"})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+
+        for attempt in range(2):
+            connection = connection_pool.get(self.scheme, self.netloc)
+            try:
+                connection.request(method, self.path + path, body, headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                # A pooled connection the server has since closed fails once; a fresh one should not
+                if attempt:
+                    raise OSError(f"Could not reach sync server {self.netloc}: {e}") from e
+        if response.will_close:
+            connection.close()
+        else:
+            connection_pool.put(self.scheme, self.netloc, connection)
+
+        self.requests += 1
+        self.bytes_sent += len(body or b"")
+        self.bytes_received += len(data)
+        if response.getheader("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        if response.status != 200:
+            raise OSError(f"Sync server {self.netloc} answered {response.status}: {data[:200].decode('utf-8', 'replace')}")
+        return json.loads(data)
+
+    def read_state(self, local):
+        """The server's state, listing only the buckets whose hashes differ from local's"""
+        local_root, local_buckets = merkle_summary(local)
+        summary = self.request("GET", "/v1/summary?" + urlencode({"root": local_root}))
+        if summary["root"] == local_root:
+            return dict(local)
+        remote_buckets = summary["buckets"]
+        differing = sorted(prefix for prefix in set(local_buckets) | set(remote_buckets)
+                           if local_buckets.get(prefix) != remote_buckets.get(prefix))
+        entries = self.request("POST", "/v1/buckets", {"prefixes": differing})["entries"]
+        differing = set(differing)
+        state = {note_id: entry for note_id, entry in local.items() if bucket_of(note_id) not in differing}
+        state.update((note_id, (stamp, bool(deleted))) for note_id, (stamp, deleted) in entries.items())
+        return state
+
+    def read_notes(self, wanted):
+        payloads = {}
+        wanted = list(wanted)
+        for start in range(0, len(wanted), HTTP_BATCH_SIZE):
+            batch = wanted[start:start + HTTP_BATCH_SIZE]
+            payloads.update(self.request("POST", "/v1/fetch", {"notes": batch})["notes"])
+        return payloads
+
+    def publish(self, node_id, uploads, local, remote):
+        """Push changed notes and tombstones in batches, sending only bodies the server does not have"""
+        tombstones = [{"id": note_id, "stamp": stamp, "deleted": True}
+                      for note_id, (stamp, deleted) in local.items() if deleted and remote.get(note_id) != (stamp, True)]
+        batch = []
+        for note_id, stamp, record, content in uploads:
+            batch.append(({"id": note_id, "stamp": stamp, "deleted": False, "record": record,
+                           "blob": content_hash(content)}, content))
+            if len(batch) == HTTP_BATCH_SIZE:
+                self.push(batch)
+                batch = []
+        if batch:
+            self.push(batch)
+        for start in range(0, len(tombstones), HTTP_BATCH_SIZE):
+            self.request("POST", "/v1/push", {"notes": tombstones[start:start + HTTP_BATCH_SIZE], "blobs": {}})
+
+    def push(self, batch):
+        hashes = sorted({entry["blob"] for entry, _ in batch})
+        missing = set(self.request("POST", "/v1/missing-blobs", {"hashes": hashes})["missing"])
+        blobs = {entry["blob"]: content for entry, content in batch if entry["blob"] in missing}
+        result = self.request("POST", "/v1/push", {"notes": [entry for entry, _ in batch], "blobs": blobs})
+        # A body the server said it had may have been collected before the push arrived; send those again
+        missing = set(result.get("missing", []))
+        if missing:
+            retry = [(entry, content) for entry, content in batch if entry["blob"] in missing]
+            self.request("POST", "/v1/push", {"notes": [entry for entry, _ in retry],
+                                              "blobs": {entry["blob"]: content for entry, content in retry}})
+
+
+class SyncEngine:
+    """
+    Two-way sync between a NotesStore and a FolderTarget or HttpTarget.
+    Notes carry HybridClock stamps; the base remembers the stamp both sides
+    agreed on after the last sync, so a note that changed on only one side
+    is copied across and only notes that changed are transferred. When both
+    sides changed a note, the newer stamp wins and the other version is kept
+    as a conflicted copy, except that an edit always beats a deletion. Every
+    replica reaches the same result whichever order they sync in.
+
+    The steps can run on different threads: fetch() and publish() only do
+    target I/O, while apply() and finish() touch the store. sync() runs them
+    all in a row.
+    """
+
+    def __init__(self, store, location):
+        self.store = store
+        self.key = sync_key(location)
+        self.target = make_target(location)
+
+    def base(self):
+        return dict(self.store.sync_bases.get(self.key, {}).get("notes", {}))
+
+    def local_state(self):
+        """(stamp, deleted) per note id for this replica's notes and tombstones"""
+        state = {note_id: (stamp, True) for note_id, stamp in self.store.tombstones.items()}
+        for note_id, note_data in self.store.notes.items():
+            if isinstance(note_data, dict) and note_data.get("hlc"):
+                state[note_id] = (note_data["hlc"], False)
+        return state
+
+    def fetch(self, local, base):
+        """Read the target's state and download every note version this replica has not seen yet"""
+        remote = self.target.read_state(local)
+        wanted = [(note_id, stamp) for note_id, (stamp, deleted) in remote.items()
+                  if not deleted and stamp != base.get(note_id) and stamp != local.get(note_id, (None, False))[0]]
+        return {"remote": remote, "payloads": self.target.read_notes(wanted)}
+
+    def apply(self, fetched):
+        """Merge fetched changes into the store, save it, and return what publish() should upload"""
+        store = self.store
+        remote = fetched["remote"]
+        payloads = fetched["payloads"]
+        for stamp, _ in remote.values():
+            store.clock.observe(stamp)
+        store.stamp_unstamped()
+
+        local = self.local_state()
+        base = self.base()
+        stats = {"pulled": 0, "pushed": 0, "deleted": 0, "conflicts": [], "missing": 0}
+        for note_id in sorted(set(local) | set(remote)):
+            mine = local.get(note_id)
+            theirs = remote.get(note_id)
+            if mine == theirs or theirs is None:
+                continue
+            if mine is None:
+                if not theirs[1]:
+                    self.pull(note_id, payloads, stats)
+                continue
+
+            known = base.get(note_id)
+            if theirs[0] == known:
+                continue
+            if mine[0] == known:
+                if theirs[1]:
+                    store.apply_remote_delete(note_id, theirs[0])
+                    stats["deleted"] += 1
+                else:
+                    self.pull(note_id, payloads, stats)
+            elif mine[1] and theirs[1]:
+                continue
+            elif mine[1]:
+                self.pull(note_id, payloads, stats)
+            elif theirs[1]:
+                store.touch(note_id)
+            else:
+                self.resolve_conflict(note_id, mine[0], theirs[0], payloads, stats)
+
+        # Replicas that have not updated yet still send notes under old ids
+        if any(not is_ulid(note_id) for note_id in store.notes):
+            store.migrate_ids(arrived=remote)
+        store.save()
+        local = self.local_state()
+        uploads = []
+        for note_id, (stamp, deleted) in local.items():
+            if not deleted and remote.get(note_id, (None, False))[0] != stamp:
+                uploads.append((note_id, stamp, dict(store.notes[note_id]), store.body_store.index.get(note_id)))
+        stats["pushed"] = len(uploads)
+        return {
+            "remote": remote,
+            "local": local,
+            "uploads": uploads,
+            "data_path": store.body_store.data_path,
+            "node_id": store.node_id,
+            "stats": stats
+        }
+
+    def pull(self, note_id, payloads, stats):
+        payload = payloads.get(note_id)
+        if payload is None:
+            stats["missing"] += 1
+            return
+        self.store.apply_remote(note_id, payload["record"], payload.get("content", ""))
+        stats["pulled"] += 1
+
+    def resolve_conflict(self, note_id, my_stamp, their_stamp, payloads, stats):
+        """Both sides edited the note: keep the newer version, and the older one as a conflicted copy"""
+        store = self.store
+        payload = payloads.get(note_id)
+        if payload is None:
+            stats["missing"] += 1
+            return
+        my_record = dict(store.notes[note_id])
+        my_content = store.get_content(note_id)
+        their_record = payload["record"]
+        their_content = payload.get("content", "")
+        same = ({k: v for k, v in my_record.items() if k != "hlc"} == {k: v for k, v in their_record.items() if k != "hlc"}
+                and my_content == their_content)
+        if my_stamp > their_stamp:
+            losing_record, losing_content, losing_stamp = their_record, their_content, their_stamp
+        else:
+            losing_record, losing_content, losing_stamp = my_record, my_content, my_stamp
+            store.apply_remote(note_id, their_record, their_content)
+            stats["pulled"] += 1
+        if same:
+            return
+
+        copy_id = conflict_copy_id(note_id, losing_stamp)
+        stats["conflicts"].append(losing_record.get("title") or "Untitled")
+        if copy_id in store.notes:
+            return
+        store.apply_remote(copy_id, dict(losing_record, title=f"{losing_record.get('title', '')} (conflicted copy)"),
+                           losing_content)
+        store.touch(copy_id)
+
+    def publish(self, outgoing):
+        """Upload changed notes and tombstones, reading each body only as it is sent"""
+        with BodyReader(outgoing["data_path"]) as reader:
+            uploads = ((note_id, stamp, record, reader.read(entry))
+                       for note_id, stamp, record, entry in outgoing["uploads"])
+            self.target.publish(outgoing["node_id"], uploads, outgoing["local"], outgoing["remote"])
+        return outgoing
+
+    def finish(self, outgoing):
+        """Record the stamps both sides now agree on as the base for the next sync"""
+        base = self.base()
+        remote = outgoing["remote"]
+        for note_id, (stamp, deleted) in outgoing["local"].items():
+            theirs = remote.get(note_id)
+            if theirs is None or stamp >= theirs[0]:
+                base[note_id] = stamp
+        for note_id, (stamp, deleted) in remote.items():
+            if deleted and note_id not in outgoing["local"]:
+                base[note_id] = stamp
+        self.store.sync_bases[self.key] = {"notes": base, "last_sync": datetime.now().isoformat()}
+        self.store.save_replica()
+        return outgoing["stats"]
+
+    def sync(self):
+        """Run a whole sync on the calling thread; returns the stats"""
+        fetched = self.fetch(self.local_state(), self.base())
+        return self.finish(self.publish(self.apply(fetched)))
@@ -0,0 +1,291 @@
+"""Reference sync server for AmogOS Notes, using only the standard library.
+
+Run it on any machine the others can reach, then sync each app with its URL:
+
+    python notes_sync_server.py --data ~/amogos-sync --port 8765 --token SECRET
+    python main.py cli sync "http://server:8765/?token=SECRET"
+
+The server keeps the newest version of every note (by HybridClock stamp),
+tombstones for deleted notes, and note bodies stored by content hash.
+"""
+import argparse
+import gzip
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from notes_store import atomic_write_json
+from notes_sync import bucket_of, content_hash, merkle_summary
+
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+GC_INTERVAL_SECONDS = 10 * 60
+GC_GRACE_SECONDS = 60 * 60
+
+BLOB_ID = re.compile(r"^[0-9a-f]{64}$")
+
+
+class SyncServerState:
+    """
+    Notes, tombstones and content-addressed bodies in a directory; every
+    method is safe to call from any thread. Bodies no note refers to are
+    deleted at most every GC_INTERVAL_SECONDS, and only once they have not
+    been written or reported present for GC_GRACE_SECONDS, so a push that is
+    still uploading or about to refer to a body never loses it.
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        self.state_path = os.path.join(self.directory, "state.json")
+        self.blob_dir = os.path.join(self.directory, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.last_collection = time.time()
+        self.notes = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.notes = json.load(f)
+        for note_id, entry in list(self.notes.items()):
+            if entry["blob"] is not None and not BLOB_ID.match(entry["blob"]):
+                print(f"Dropping note {note_id}: its body name {entry['blob']!r} is not a content hash")
+                del self.notes[note_id]
+        self.refresh_summary()
+
+    def refresh_summary(self):
+        self.stamps = {note_id: (entry["stamp"], entry["deleted"]) for note_id, entry in self.notes.items()}
+        self.root, self.buckets = merkle_summary(self.stamps)
+
+    def blob_path(self, blob):
+        """Where a body is kept; raises ValueError for anything but a sha256 hex digest"""
+        if not isinstance(blob, str) or not BLOB_ID.match(blob):
+            raise ValueError(f"invalid body name {blob!r}")
+        path = os.path.realpath(os.path.join(self.blob_dir, blob[:2], blob))
+        if os.path.commonpath([path, os.path.realpath(self.blob_dir)]) != os.path.realpath(self.blob_dir):
+            raise ValueError(f"invalid body name {blob!r}")
+        return path
+
+    def summary(self, client_root=None):
+        with self.lock:
+            if client_root == self.root:
+                return {"root": self.root, "buckets": {}}
+            return {"root": self.root, "buckets": self.buckets}
+
+    def bucket_entries(self, prefixes):
+        prefixes = set(prefixes)
+        with self.lock:
+            return {"entries": {note_id: list(entry) for note_id, entry in self.stamps.items()
+                                if bucket_of(note_id) in prefixes}}
+
+    def fetch(self, wanted):
+        notes = {}
+        with self.lock:
+            for note_id, _ in wanted:
+                entry = self.notes.get(note_id)
+                if entry is None or entry["deleted"]:
+                    continue
+                try:
+                    with open(self.blob_path(entry["blob"]), "r", encoding="utf-8") as f:
+                        content = f.read()
+                except (OSError, ValueError) as e:
+                    print(f"Missing body for note {note_id}: {e}")
+                    continue
+                notes[note_id] = {"id": note_id, "record": entry["record"], "content": content}
+        return {"notes": notes}
+
+    def missing_blobs(self, hashes):
+        paths = [(blob, self.blob_path(blob)) for blob in hashes]
+        missing = []
+        for blob, path in paths:
+            try:
+                # Restart the grace period: the push that follows will refer to this body
+                os.utime(path)
+            except FileNotFoundError:
+                missing.append(blob)
+        return {"missing": missing}
+
+    def push(self, notes, blobs):
+        """
+        Store uploaded bodies, then keep each uploaded note version that is
+        newer than the one held. Bodies that newer versions refer to but the
+        server does not have are listed under "missing". Raises ValueError,
+        before storing anything, for a body whose name is not the sha256 of
+        its text or a note that names a body by anything but a hash.
+        """
+        uploads = []
+        for blob, content in blobs.items():
+            path = self.blob_path(blob)
+            if content_hash(content) != blob:
+                raise ValueError(f"body {blob} does not match its content")
+            uploads.append((path, content))
+        for note in notes:
+            if not note["deleted"]:
+                self.blob_path(note["blob"])
+
+        for path, content in uploads:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                    f.write(content)
+                os.replace(f"{path}.tmp", path)
+
+        accepted = 0
+        missing = []
+        with self.lock:
+            for note in notes:
+                current = self.notes.get(note["id"])
+                if current is not None and note["stamp"] <= current["stamp"]:
+                    continue
+                if not note["deleted"] and not os.path.exists(self.blob_path(note["blob"])):
+                    missing.append(note["blob"])
+                    continue
+                self.notes[note["id"]] = {
+                    "stamp": note["stamp"],
+                    "deleted": note["deleted"],
+                    "record": None if note["deleted"] else note["record"],
+                    "blob": None if note["deleted"] else note["blob"]
+                }
+                accepted += 1
+            if accepted:
+                atomic_write_json(self.state_path, self.notes)
+                self.refresh_summary()
+            if time.time() - self.last_collection >= GC_INTERVAL_SECONDS:
+                self.collect_garbage()
+        return {"accepted": accepted, "missing": missing}
+
+    def collect_garbage(self, now=None):
+        """Delete bodies no note refers to that are past their grace period; called with the lock held"""
+        now = now or time.time()
+        self.last_collection = now
+        referenced = {entry["blob"] for entry in self.notes.values() if entry["blob"]}
+        removed = 0
+        for prefix in os.listdir(self.blob_dir):
+            prefix_dir = os.path.join(self.blob_dir, prefix)
+            for blob in os.listdir(prefix_dir):
+                if blob in referenced or blob.endswith(".tmp"):
+                    continue
+                path = os.path.join(prefix_dir, blob)
+                try:
+                    if os.path.getmtime(path) < now - GC_GRACE_SECONDS:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+class SyncRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "AmogOSNotesSync/1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        compressed = "gzip" in (self.headers.get("Accept-Encoding") or "")
+        if compressed:
+            body = gzip.compress(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def authorized(self):
+        token = self.server.token
+        if not token:
+            return True
+        supplied = (self.headers.get("Authorization") or "").removeprefix("Bearer ")
+        if hmac.compare_digest(supplied, token):
+            return True
+        self.send_json(401, {"error": "missing or wrong token"})
+        return False
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_REQUEST_BYTES:
+            raise ValueError("request too large")
+        body = self.rfile.read(length)
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return json.loads(body or b"{}")
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        parts = urlsplit(self.path)
+        if parts.path.endswith("/v1/summary"):
+            client_root = parse_qs(parts.query).get("root", [None])[0]
+            self.send_json(200, self.server.state.summary(client_root))
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self.authorized():
+            return
+        try:
+            request = self.read_json()
+        except (ValueError, OSError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        state = self.server.state
+        path = urlsplit(self.path).path
+        try:
+            if path.endswith("/v1/buckets"):
+                self.send_json(200, state.bucket_entries(request.get("prefixes", [])))
+            elif path.endswith("/v1/fetch"):
+                self.send_json(200, state.fetch(request.get("notes", [])))
+            elif path.endswith("/v1/missing-blobs"):
+                self.send_json(200, state.missing_blobs(request.get("hashes", [])))
+            elif path.endswith("/v1/push"):
+                self.send_json(200, state.push(request.get("notes", []), request.get("blobs", {})))
+            else:
+                self.send_json(404, {"error": "not found"})
+        except (KeyError, TypeError, ValueError) as e:
+            self.send_json(400, {"error": f"malformed request: {e}"})
+
+
+def make_server(directory, host="127.0.0.1", port=8765, token=None, verbose=False):
+    """A ready-to-serve sync server; port 0 picks a free port (see server.server_address)"""
+    server = ThreadingHTTPServer((host, port), SyncRequestHandler)
+    server.daemon_threads = True
+    server.state = SyncServerState(directory)
+    server.token = token
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", required=True, help="directory the server keeps its notes in")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 for every interface)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token", default=os.environ.get("AMOGOS_SYNC_TOKEN"),
+                        help="require this bearer token (default: $AMOGOS_SYNC_TOKEN)")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.data, args.host, args.port, args.token, args.verbose)
+    host, port = server.server_address[:2]
+    print(f"Serving AmogOS Notes sync on http://{host}:{port}/ from {args.data}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Requests a sync client must not be able to use to touch files outside the server's blob store."""
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notes_sync import content_hash
+from notes_sync_server import make_server
+
+
+class SyncServerBlobTests(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.server = make_server(os.path.join(self.temp.name, "server"), port=0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.outside = os.path.join(self.temp.name, "outside.txt")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp.cleanup()
+
+    def post(self, path, data):
+        host, port = self.server.server_address[:2]
+        connection = http.client.HTTPConnection(host, port)
+        try:
+            connection.request("POST", path, json.dumps(data), {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+
+    def note(self, note_id, blob):
+        return {"id": note_id, "stamp": "001", "deleted": False, "record": {"title": note_id}, "blob": blob}
+
+    def test_push_rejects_blob_names_that_are_paths(self):
+        status, _ = self.post("/v1/push", {"notes": [], "blobs": {self.outside: "owned"}})
+        self.assertEqual(status, 400)
+        self.assertFalse(os.path.exists(self.outside))
+
+        status, _ = self.post("/v1/push", {"notes": [], "blobs": {"../../outside.txt": "owned"}})
+        self.assertEqual(status, 400)
+
+    def test_notes_cannot_point_fetch_at_other_files(self):
+        with open(self.outside, "w", encoding="utf-8") as f:
+            f.write("secret")
+        status, _ = self.post("/v1/push", {"notes": [self.note("a", self.outside)], "blobs": {}})
+        self.assertEqual(status, 400)
+        status, result = self.post("/v1/fetch", {"notes": [["a", "001"]]})
+        self.assertEqual(status, 200)
+        self.assertEqual(result["notes"], {})
+
+    def test_missing_blobs_rejects_paths(self):
+        with open(self.outside, "w", encoding="utf-8") as f:
+            f.write("secret")
+        os.utime(self.outside, (0, 0))
+        status, _ = self.post("/v1/missing-blobs", {"hashes": [self.outside]})
+        self.assertEqual(status, 400)
+        self.assertEqual(os.path.getmtime(self.outside), 0)
+
+    def test_push_rejects_content_that_does_not_match_its_hash(self):
+        blob = content_hash("real text")
+        status, _ = self.post("/v1/push", {"notes": [self.note("a", blob)], "blobs": {blob: "forged text"}})
+        self.assertEqual(status, 400)
+        self.assertEqual(self.post("/v1/missing-blobs", {"hashes": [blob]})[1]["missing"], [blob])
+
+        status, result = self.post("/v1/push", {"notes": [self.note("a", blob)], "blobs": {blob: "real text"}})
+        self.assertEqual((status, result["accepted"]), (200, 1))
+        status, result = self.post("/v1/fetch", {"notes": [["a", "001"]]})
+        self.assertEqual(result["notes"]["a"]["content"], "real text")
+
+
+if __name__ == "__main__":
+    unittest.main()